@@ -1,6 +1,9 @@
 import RPi.GPIO as GPIO
 from PyQt6.QtCore import Qt
 
+import metrics
+import tracing
+
 BUTTON_PINS = {
     16: Qt.Key.Key_Up,      # GPIO 16 -> 上键
     20: Qt.Key.Key_Down,    # GPIO 20 -> 下键
@@ -21,7 +24,11 @@ def gpio_button_init(input_listener):
         
         # 创建回调函数，使用闭包捕获 key_code
         def button_callback(channel, kc=key_code, listener=input_listener):
-            listener.emit_key(kc)
+            # 回调时刻即 trace 起点（去抖在 RPi.GPIO 内部完成）
+            trace = tracing.start("gpio", kc)
+            metrics.counter("input.gpio.events").inc()
+            with metrics.timer("input.gpio.emit"):
+                listener.emit_key(kc, trace)
         
         GPIO.add_event_detect(pin, GPIO.FALLING, 
                          callback=button_callback, 
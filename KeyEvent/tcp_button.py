@@ -1,12 +1,33 @@
+"""TCP remote-button server.
+
+Remote controllers connect to PORT and send newline-terminated lines such
+as `BUTTON:code=6,action=PRESS`. A single thread serves every connection
+with `selectors`:
+
+- each connection keeps its own line buffer, so a line split across TCP
+  segments (or many lines in one segment) is parsed correctly
+- accepted sockets get TCP_NODELAY
+- backpressure: while the GUI has more than MAX_PENDING_KEYS undelivered key
+  events, client sockets are not read; their kernel buffers fill and TCP
+  flow control slows the senders down instead of queueing events unbounded
+"""
 import socket
 import re
+import selectors
 import threading
+import time
 from PyQt6.QtCore import Qt
 
+import metrics
+import tracing
+
 # 配置
 HOST = '0.0.0.0'
 PORT = 5555
 BUFFER_SIZE = 1024
+MAX_LINE_BYTES = 256    # 超过此长度仍无换行符则丢弃缓冲（非法客户端）
+MAX_PENDING_KEYS = 32   # GUI 积压超过此数时暂停读取
+POLL_INTERVAL = 0.05    # seconds; also how often a paused server re-checks the backlog
 
 PATTERN = re.compile(r'BUTTON:code=(\d+),action=PRESS')
 
@@ -17,68 +38,167 @@ CODE_TO_KEY = {
     '7': Qt.Key.Key_Return
 }
 
-def handle_client(conn, addr, input_listener):
-    """处理单个客户端连接"""
-    try:
-        while True:
-            data = conn.recv(BUFFER_SIZE)
-            if not data:
-                break
-            
-            message = data.decode('utf-8').strip()
-            #print(f"⬅️ 接收自 {addr}: {message!r}")
-
-            lines = message.split('\n')
-            for line in lines:
-                line = line.strip()
-                if not line:
-                    continue
-                
-                match = PATTERN.search(line)
-                if match:
-                    code = match.group(1)
-                    # 转换为 Qt 按键码并发送
-                    if code in CODE_TO_KEY:
-                        key_code = CODE_TO_KEY[code]
-                        input_listener.emit_key(key_code)
-                        print(f"➡️ {addr}: 按键 {code} -> {key_code}")
-                
-    except ConnectionResetError:
-        print(f"⚠️ 客户端 {addr} 异常断开。")
-    except Exception as e:
-        print(f"❌ 处理客户端 {addr} 时发生错误: {e}")
-    finally:
-        conn.close()
-
-def start_tcp_server(input_listener):
-    """启动 TCP 服务器"""
-    server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-    server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
 
+class _Connection:
+    __slots__ = ("sock", "addr", "buffer")
+
+    def __init__(self, sock, addr):
+        self.sock = sock
+        self.addr = addr
+        self.buffer = bytearray()
+
+
+class ButtonServer:
+    """Single-threaded, event-driven server for remote button controllers."""
+
+    def __init__(self, input_listener, host=HOST, port=PORT, max_pending=MAX_PENDING_KEYS):
+        self.listener = input_listener
+        self.host = host
+        self.port = port
+        self.max_pending = max_pending
+        self.address = None      # (host, port) actually bound, after start()
+        self.recv_time = 0.0     # perf_counter of the recv() whose lines are being emitted
+        self._selector = selectors.DefaultSelector()
+        self._server = None
+        self._connections = {}   # socket -> _Connection
+        self._paused = False
+        self._running = False
+
+    def start(self):
+        """Bind and listen (raises OSError if the port is taken)."""
+        server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        try:
+            server.bind((self.host, self.port))
+            server.listen(16)
+        except OSError:
+            server.close()
+            raise
+        server.setblocking(False)
+        self._selector.register(server, selectors.EVENT_READ, None)
+        self._server = server
+        self.address = server.getsockname()
+        self._running = True
+        print(f"📡 TCP 服务器已启动，正在监听 {self.address[0]}:{self.address[1]}...")
+
+    def serve_forever(self):
+        try:
+            while self._running:
+                self.poll(POLL_INTERVAL)
+        except Exception as e:
+            print(f"❌ 服务器错误: {e}")
+        finally:
+            self.close()
+
+    def stop(self):
+        self._running = False
+
+    def close(self):
+        for conn in list(self._connections.values()):
+            self._close(conn)
+        if self._server is not None:
+            self._selector.unregister(self._server)
+            self._server.close()
+            self._server = None
+        self._selector.close()
+
+    def poll(self, timeout):
+        """Wait up to `timeout` seconds and handle whatever is ready."""
+        self._update_backpressure()
+        for key, _ in self._selector.select(timeout):
+            if key.data is None:
+                self._accept()
+            else:
+                self._read(key.data)
+
+    def _update_backpressure(self):
+        backlog = getattr(self.listener, "pending", 0)
+        metrics.gauge("input.tcp.backlog").set(backlog)
+        if not self._paused and backlog > self.max_pending:
+            self._paused = True
+            metrics.counter("input.tcp.paused").inc()
+            for conn in self._connections.values():
+                self._selector.unregister(conn.sock)
+        elif self._paused and backlog <= self.max_pending // 2:
+            self._paused = False
+            for conn in self._connections.values():
+                self._selector.register(conn.sock, selectors.EVENT_READ, conn)
+
+    def _accept(self):
+        try:
+            sock, addr = self._server.accept()
+        except BlockingIOError:
+            return
+        sock.setblocking(False)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        conn = _Connection(sock, addr)
+        self._connections[sock] = conn
+        if not self._paused:
+            self._selector.register(sock, selectors.EVENT_READ, conn)
+        metrics.gauge("input.tcp.connections").set(len(self._connections))
+        print(f"🔌 客户端已连接: {addr}")
+
+    def _close(self, conn):
+        if conn.sock in self._connections:
+            del self._connections[conn.sock]
+            if not self._paused:
+                self._selector.unregister(conn.sock)
+        conn.sock.close()
+        metrics.gauge("input.tcp.connections").set(len(self._connections))
+
+    def _read(self, conn):
+        try:
+            data = conn.sock.recv(BUFFER_SIZE)
+        except (BlockingIOError, InterruptedError):
+            return
+        except ConnectionResetError:
+            print(f"⚠️ 客户端 {conn.addr} 异常断开。")
+            self._close(conn)
+            return
+        except OSError as e:
+            print(f"❌ 处理客户端 {conn.addr} 时发生错误: {e}")
+            self._close(conn)
+            return
+        if not data:
+            self._close(conn)
+            return
+
+        self.recv_time = t_recv = time.perf_counter()
+        conn.buffer += data
+        if b"\n" not in data:
+            if len(conn.buffer) > MAX_LINE_BYTES:
+                metrics.counter("input.tcp.bad_lines").inc()
+                conn.buffer.clear()
+            return
+        # 最后一段可能是不完整的行，留在缓冲中等待后续数据
+        *lines, rest = conn.buffer.split(b"\n")
+        conn.buffer = bytearray(rest)
+        for line in lines:
+            self._handle_line(line, t_recv)
+
+    def _handle_line(self, line, t_recv):
+        match = PATTERN.search(line.decode("utf-8", "replace"))
+        if not match:
+            if line.strip():
+                metrics.counter("input.tcp.bad_lines").inc()
+            return
+        key_code = CODE_TO_KEY.get(match.group(1))
+        if key_code is None:
+            return
+        # 转换为 Qt 按键码并发送
+        self.listener.emit_key(key_code, tracing.start("tcp", key_code, t_recv))
+        metrics.counter("input.tcp.events").inc()
+        metrics.observe("input.tcp.recv_to_emit", time.perf_counter() - t_recv)
+
+
+def thread_run(input_listener, host=HOST, port=PORT):
+    """Start the button server on a background thread and return it (None if it failed)."""
+    server = ButtonServer(input_listener, host, port)
     try:
-        server_socket.bind((HOST, PORT))
-        server_socket.listen(5)
-        print(f"📡 TCP 服务器已启动，正在监听 {HOST}:{PORT}...")
-        
-        while True:
-            conn, addr = server_socket.accept()
-            client_thread = threading.Thread(
-                target=handle_client, 
-                args=(conn, addr, input_listener),
-                daemon=True
-            )
-            client_thread.start()
-            
-    except Exception as e:
+        server.start()
+    except OSError as e:
         print(f"❌ 服务器错误: {e}")
-    finally:
-        server_socket.close()
-
-def thread_run(input_listener):
-    tcp_thread = threading.Thread(
-        target=start_tcp_server,
-        args=(input_listener,),
-        daemon=True
-    )
-    tcp_thread.start()
-    print("✓ TCP 服务器已启动")
\ No newline at end of file
+        return None
+    threading.Thread(target=server.serve_forever, name="tcp-buttons", daemon=True).start()
+    print("✓ TCP 服务器已启动")
+    return server
@@ -0,0 +1,255 @@
+"""Compact binary UDP protocol for remote buttons (beside the TCP text protocol).
+
+One 16-byte datagram per press, network byte order:
+
+    offset  size  field
+    0       2     magic  b"HB"
+    2       1     flags  (FLAG_ACK: echo the packet back so the sender can measure RTT)
+    3       1     key    button code, same codes as the TCP protocol (6/8/7)
+    4       4     seq    per-sender sequence number, +1 per packet, wraps at 2**32
+    8       8     sent   sender timestamp, microseconds since the epoch
+
+Per sender address the receiver keeps the highest sequence number and a
+bitmap of the last SEQ_WINDOW packets, so it counts lost packets (gaps),
+drops duplicates (e.g. a clicker that sends every press twice) and still
+delivers late, reordered presses. A sender that restarts its numbering
+(far behind, or behind after a silence) is resynced rather than dropped.
+Presses go through the same InputListener.emit_key path as every other input.
+
+Latency: `input.udp.one_way` is receive time minus the sender timestamp,
+meaningful when both clocks are NTP-synced; `input.udp.jitter` is the same
+value relative to the smallest one seen from that sender, which needs no
+clock sync.
+"""
+import socket
+import struct
+import threading
+import time
+
+import metrics
+import tracing
+from KeyEvent.tcp_button import CODE_TO_KEY
+
+HOST = '0.0.0.0'
+PORT = 5556
+try:
+    import config  # type: ignore
+    PORT = getattr(config, "UDP_BUTTON_PORT", PORT)  # None disables the UDP protocol
+except Exception:
+    pass
+
+MAGIC = b"HB"
+PACKET = struct.Struct("!2sBBIQ")
+FLAG_ACK = 0x01
+SEQ_WINDOW = 64
+SEQ_MOD = 1 << 32
+FULL_WINDOW = (1 << SEQ_WINDOW) - 1
+RCVBUF_BYTES = 256 * 1024
+RESET_GAP = 1 << 16  # 序号大幅前跳视为发送端重启
+RESTART_IDLE = 2.0   # seconds of silence after which an older sequence number means a restart
+
+
+def encode_packet(code, seq, sent_us=None, flags=0) -> bytes:
+    if sent_us is None:
+        sent_us = time.time_ns() // 1000
+    return PACKET.pack(MAGIC, flags, int(code), seq % SEQ_MOD, sent_us)
+
+
+def decode_packet(data):
+    """Return (flags, code, seq, sent_us), or None for a malformed packet."""
+    if len(data) != PACKET.size:
+        return None
+    magic, flags, code, seq, sent_us = PACKET.unpack(data)
+    if magic != MAGIC:
+        return None
+    return flags, code, seq, sent_us
+
+
+class SequenceTracker:
+    """Loss / duplicate / reorder accounting for one sender."""
+
+    def __init__(self):
+        self.last = None      # highest sequence number seen
+        self.window = 0       # bit i set: packet (last - i) was received (or predates tracking)
+        self.received = 0
+        self.lost = 0
+        self.duplicates = 0
+        self.reordered = 0
+        self.restarts = 0
+        self.last_seen = None  # monotonic time of the last packet
+        self.min_delay = None  # smallest (receive - sent) seen, seconds
+
+    def _resync(self, seq):
+        # 发送端重启（序号从 0 重新开始）或长时间离线后：从 seq 重新计数
+        if self.last is not None:
+            self.restarts += 1
+        self.last, self.window = seq, FULL_WINDOW
+        self.received += 1
+        return True
+
+    def accept(self, seq, now=None) -> bool:
+        """Record `seq`; returns False if the packet is a duplicate.
+
+        A packet SEQ_WINDOW or more behind the highest one seen, or any packet
+        not ahead of it (the same number included) after the sender was silent
+        for RESTART_IDLE seconds, means the sender restarted its numbering
+        (e.g. a clicker rebooted on the same address and port); tracking
+        restarts from it instead of dropping every press until the new
+        numbers pass the old ones.
+        """
+        now = time.monotonic() if now is None else now
+        idle = self.last_seen is not None and now - self.last_seen > RESTART_IDLE
+        self.last_seen = now
+        if self.last is None:
+            return self._resync(seq)
+        ahead = (seq - self.last) % SEQ_MOD
+        if 0 < ahead < SEQ_MOD // 2:
+            if ahead > RESET_GAP:
+                return self._resync(seq)
+            self.lost += ahead - 1
+            self.window = ((self.window << ahead) | 1) & FULL_WINDOW
+            self.last = seq
+            self.received += 1
+            return True
+        behind = (self.last - seq) % SEQ_MOD
+        if behind >= SEQ_WINDOW or idle:
+            return self._resync(seq)
+        bit = 1 << behind
+        if self.window & bit:
+            self.duplicates += 1
+            return False
+        # 迟到的包：之前被计为丢失，现在补回
+        self.window |= bit
+        self.lost -= 1
+        self.reordered += 1
+        self.received += 1
+        return True
+
+    def snapshot(self) -> dict:
+        return {"received": self.received, "lost": self.lost, "duplicates": self.duplicates,
+                "reordered": self.reordered, "restarts": self.restarts}
+
+
+class UdpButtonServer:
+    def __init__(self, input_listener, host=HOST, port=PORT):
+        self.listener = input_listener
+        self.host = host
+        self.port = port
+        self.address = None
+        self.recv_time = 0.0  # perf_counter of the packet being handled
+        self.senders = {}  # addr -> SequenceTracker
+        self._sock = None
+        self._running = False
+
+    def start(self):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        # 较大的接收缓冲，突发按键时不被内核丢弃
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, RCVBUF_BYTES)
+        try:
+            sock.bind((self.host, self.port))
+        except OSError:
+            sock.close()
+            raise
+        sock.settimeout(0.5)
+        self._sock = sock
+        self.address = sock.getsockname()
+        self._running = True
+        print(f"📡 UDP 按键服务已启动，正在监听 {self.address[0]}:{self.address[1]}...")
+
+    def serve_forever(self):
+        try:
+            while self._running:
+                try:
+                    data, addr = self._sock.recvfrom(64)
+                except socket.timeout:
+                    continue
+                self.handle_packet(data, addr, time.time_ns() // 1000)
+        except OSError as e:
+            if self._running:
+                print(f"❌ UDP 服务器错误: {e}")
+        finally:
+            self.close()
+
+    def stop(self):
+        self._running = False
+
+    def close(self):
+        self._running = False
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
+
+    def handle_packet(self, data, addr, recv_us):
+        self.recv_time = t_recv = time.perf_counter()
+        packet = decode_packet(data)
+        if packet is None:
+            metrics.counter("input.udp.malformed").inc()
+            return
+        flags, code, seq, sent_us = packet
+        if flags & FLAG_ACK and self._sock is not None:
+            try:
+                self._sock.sendto(data, addr)
+            except OSError:
+                pass
+
+        tracker = self.senders.get(addr)
+        if tracker is None:
+            tracker = self.senders[addr] = SequenceTracker()
+        lost, duplicates = tracker.lost, tracker.duplicates
+        deliver = tracker.accept(seq)
+        if tracker.lost != lost:
+            metrics.counter("input.udp.lost").inc(tracker.lost - lost)
+        if tracker.duplicates != duplicates:
+            metrics.counter("input.udp.duplicates").inc()
+        if not deliver:
+            return
+
+        delay = (recv_us - sent_us) / 1e6
+        if tracker.min_delay is None or delay < tracker.min_delay:
+            tracker.min_delay = delay
+        if delay >= 0:
+            metrics.observe("input.udp.one_way", delay)
+        metrics.observe("input.udp.jitter", delay - tracker.min_delay)
+
+        key_code = CODE_TO_KEY.get(str(code))
+        if key_code is None:
+            return
+        self.listener.emit_key(key_code, tracing.start("udp", key_code, t_recv))
+        metrics.counter("input.udp.events").inc()
+        metrics.observe("input.udp.recv_to_emit", time.perf_counter() - t_recv)
+
+
+class UdpButtonClient:
+    """Sender side, for clicker software and the input benchmark."""
+
+    def __init__(self, address, ack=False):
+        self.address = address
+        self.seq = 0
+        self.flags = FLAG_ACK if ack else 0
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+    def press(self, code, repeat=1):
+        """Send one press; `repeat` > 1 sends copies (redundancy against loss)."""
+        packet = encode_packet(code, self.seq, flags=self.flags)
+        self.seq = (self.seq + 1) % SEQ_MOD
+        for _ in range(repeat):
+            self.sock.sendto(packet, self.address)
+
+    def close(self):
+        self.sock.close()
+
+
+def thread_run(input_listener, host=HOST, port=PORT):
+    """Start the UDP button server on a background thread and return it (None if disabled or failed)."""
+    if port is None:
+        return None
+    server = UdpButtonServer(input_listener, host, port)
+    try:
+        server.start()
+    except OSError as e:
+        print(f"❌ UDP 服务器错误: {e}")
+        return None
+    threading.Thread(target=server.serve_forever, name="udp-buttons", daemon=True).start()
+    print("✓ UDP 按键服务已启动")
+    return server
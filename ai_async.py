@@ -0,0 +1,275 @@
+"""Asyncio variant of ai_client: many concurrent requests on one thread.
+
+All coroutines run on a single event loop owned by one daemon thread and
+use the SDK's AsyncOpenAI client, so an in-flight press costs a task, not a
+thread. `submit()` schedules a coroutine from any thread (e.g. the Qt GUI
+thread); results go back to Qt through signals, which Qt queues to the GUI
+thread. CPU-bound steps (hashing, encoding) and blocking camera waits run
+on a small fixed executor, so the thread count stays constant however
+bursty the input is.
+
+Cancellation: `run_cancellable(coro, token)` cancels the task when the
+ai_client.CancelToken is cancelled, which closes any open HTTP stream, and
+raises ai_client.Cancelled.
+"""
+import asyncio
+import concurrent.futures
+import functools
+import json
+import threading
+import time
+from contextlib import AsyncExitStack
+from typing import Optional
+
+import ai_client
+import metrics
+from ai_client import Cancelled, CancelToken
+
+EXECUTOR_WORKERS = 2
+
+_loop = None
+_loop_lock = threading.Lock()
+_executor = concurrent.futures.ThreadPoolExecutor(max_workers=EXECUTOR_WORKERS,
+                                                  thread_name_prefix="ai-work")
+_in_flight = 0  # only touched on the loop thread
+
+
+def get_loop() -> asyncio.AbstractEventLoop:
+    """The AI event loop, started on first use."""
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            loop = asyncio.new_event_loop()
+            loop.set_default_executor(_executor)
+            threading.Thread(target=loop.run_forever, name="ai-asyncio", daemon=True).start()
+            _loop = loop
+    return _loop
+
+
+async def _tracked(coro):
+    global _in_flight
+    _in_flight += 1
+    metrics.gauge("ai.async.in_flight").set(_in_flight)
+    try:
+        return await coro
+    finally:
+        _in_flight -= 1
+        metrics.gauge("ai.async.in_flight").set(_in_flight)
+
+
+def _report(future):
+    if future.cancelled():
+        return
+    e = future.exception()
+    if e is not None and not isinstance(e, Cancelled):
+        metrics.counter("ai.async.errors").inc()
+        print(f"AI task failed: {e!r}")
+
+
+def submit(coro) -> concurrent.futures.Future:
+    """Schedule `coro` on the AI loop from any thread; unhandled errors are printed."""
+    metrics.counter("ai.async.tasks").inc()
+    future = asyncio.run_coroutine_threadsafe(_tracked(coro), get_loop())
+    future.add_done_callback(_report)
+    return future
+
+
+async def run_blocking(fn, *args, **kwargs):
+    """Run a blocking call on the shared executor."""
+    return await asyncio.get_running_loop().run_in_executor(
+        None, functools.partial(fn, *args, **kwargs))
+
+
+async def run_cancellable(coro, token: Optional[CancelToken]):
+    """Await `coro` as its own task, cancelled (raising Cancelled) when `token` is."""
+    if token is None:
+        return await coro
+    loop = asyncio.get_running_loop()
+    task = asyncio.ensure_future(coro)
+
+    def _cancel():
+        loop.call_soon_threadsafe(task.cancel)
+
+    token.add_callback(_cancel)
+    try:
+        return await task
+    except asyncio.CancelledError:
+        if token.cancelled:
+            raise Cancelled() from None
+        raise
+    finally:
+        token.remove_callback(_cancel)
+
+
+async def analyze_frame_async(frame_rgb, on_ui_text=None, on_speech_text=None) -> dict:
+    """Async `ai_client.analyze_frame` / `analyze_frame_stream`.
+
+    With callbacks (and VISION_STREAM enabled) the response is streamed and
+    the callbacks behave as in `analyze_frame_stream`; they are called on
+    the loop thread. The whole call is bounded by VISION_DEADLINE.
+    """
+    try:
+        request = await run_blocking(ai_client._vision_request, frame_rgb)
+        t0 = time.perf_counter()
+        if ai_client.VISION_STREAM and (on_ui_text or on_speech_text):
+            return await asyncio.wait_for(
+                _stream_vision(request, t0, on_ui_text, on_speech_text), ai_client.VISION_DEADLINE)
+        else:
+            async def _call(backend, timeout):
+                return await backend.get_async_client().chat.completions.create(
+                    **ai_client._vision_args(backend, request, timeout))
+
+            resp = await asyncio.wait_for(
+                ai_client.router.call_async("vision", _call, Cancelled), ai_client.VISION_DEADLINE)
+            content = resp.choices[0].message.content
+            metrics.observe("ai.vision", time.perf_counter() - t0)
+            print("Chat GPT responses: ", content)
+            return json.loads(content)
+    except asyncio.TimeoutError:
+        metrics.counter("ai.vision_errors").inc()
+        print(f"AI Error: vision exceeded {ai_client.VISION_DEADLINE}s deadline")
+        return ai_client.error_result("vision timed out")
+    except Exception as e:
+        metrics.counter("ai.vision_errors").inc()
+        print(f"AI Error: {e}")
+        return ai_client.error_result(e)
+
+
+async def _stream_vision(request, t0, on_ui_text, on_speech_text) -> dict:
+    async def _open(backend, timeout):
+        # 取到第一个分片才算该后端成功，之后不再切换后端
+        stream = await backend.get_async_client().chat.completions.create(
+            **ai_client._vision_args(backend, request, timeout, stream=True))
+        it = stream.__aiter__()
+        try:
+            first = await it.__anext__()
+        except StopAsyncIteration:
+            first = None
+        except BaseException:
+            await stream.close()
+            raise
+        return stream, it, first
+
+    stream, it, first = await ai_client.router.call_async("vision", _open, Cancelled)
+    parser = ai_client.VisionStream(t0, on_ui_text, on_speech_text)
+    try:
+        chunk = first
+        while chunk is not None:
+            parser.feed(chunk)
+            try:
+                chunk = await it.__anext__()
+            except StopAsyncIteration:
+                chunk = None
+    finally:
+        await stream.close()
+    return parser.result()
+
+
+async def analyze_frame_cached_async(frame_rgb, on_ui_text=None, on_speech_text=None):
+    """Async `ai_client.analyze_frame_cached`; returns (result, entry, hit)."""
+    h = await run_blocking(ai_client.frame_hash, frame_rgb)
+    entry = ai_client.response_cache.lookup(h)
+    if entry is not None:
+        return entry.result, entry, True
+    result = await analyze_frame_async(frame_rgb, on_ui_text, on_speech_text)
+    if ai_client.is_error(result):
+        return result, None, False
+    return result, ai_client.response_cache.store(h, result), False
+
+
+async def generate_speech_async(text_input) -> Optional[str]:
+    """Async `ai_client.generate_speech`: path of a cached mp3, or None on error."""
+    path = ai_client._cached_speech(text_input, "mp3")
+    if path:
+        return path
+    try:
+        async def _call(backend, timeout):
+            response = await backend.get_async_client().audio.speech.create(
+                **ai_client._speech_args(backend, text_input, timeout))
+            return backend, await response.aread()
+
+        t0 = time.perf_counter()
+        backend, audio = await asyncio.wait_for(
+            ai_client.router.call_async("tts", _call), ai_client.TTS_DEADLINE)
+        path = await run_blocking(ai_client._speech_file, backend, text_input, "mp3", audio)
+        metrics.observe("ai.tts", time.perf_counter() - t0)
+        return path
+    except Exception as e:
+        metrics.counter("ai.tts_errors").inc()
+        print(f"Error generating speech: {e}")
+        return None
+
+
+async def iter_speech_async(text_input, chunk_size=4096):
+    """Async `ai_client.iter_speech`: yields raw PCM chunks as they arrive.
+
+    Cached phrases are read from disk; a completed stream is added to the
+    TTS cache. Errors are raised to the caller. TTS_DEADLINE bounds the
+    whole stream: opening it (across fallbacks) and every chunk read are
+    awaited with `asyncio.wait_for` on the time left, so a stalled server
+    raises TimeoutError on time instead of waiting for the HTTP timeout.
+    """
+    path = ai_client._cached_speech(text_input, "pcm")
+    if path:
+        data = await run_blocking(_read_file, path)
+        for i in range(0, len(data), chunk_size * 16):
+            yield data[i:i + chunk_size * 16]
+        return
+
+    async def _open(backend, timeout):
+        # 首个音频分片到达前失败或超出预算时切换到下一个后端
+        stack = AsyncExitStack()
+        try:
+            response = await stack.enter_async_context(
+                backend.get_async_client().audio.speech.with_streaming_response.create(
+                    **ai_client._speech_args(backend, text_input, timeout, "pcm")))
+            it = response.iter_bytes(chunk_size).__aiter__()
+            try:
+                first = await it.__anext__()
+            except StopAsyncIteration:
+                first = b""
+        except BaseException:
+            await stack.aclose()
+            raise
+        return backend, stack, it, first
+
+    t0 = time.perf_counter()
+    deadline = t0 + ai_client.TTS_DEADLINE
+
+    async def _within_deadline(awaitable):
+        remaining = deadline - time.perf_counter()
+        try:
+            if remaining <= 0:
+                raise asyncio.TimeoutError()
+            return await asyncio.wait_for(awaitable, remaining)
+        except asyncio.TimeoutError:
+            if asyncio.iscoroutine(awaitable):
+                awaitable.close()  # 未开始即超时：避免 "never awaited" 警告
+            raise TimeoutError(f"speech exceeded {ai_client.TTS_DEADLINE}s deadline") from None
+
+    pcm = bytearray()
+    try:
+        backend, stack, it, first = await _within_deadline(
+            ai_client.router.call_async("tts", _open, Cancelled))
+        metrics.observe("ai.tts_first_byte", time.perf_counter() - t0)
+        async with stack:
+            chunk = first
+            while chunk:
+                pcm += chunk
+                yield chunk
+                try:
+                    chunk = await _within_deadline(it.__anext__())
+                except StopAsyncIteration:
+                    chunk = None
+        metrics.observe("ai.tts", time.perf_counter() - t0)
+    except (Cancelled, asyncio.CancelledError):
+        raise
+    except Exception:
+        metrics.counter("ai.tts_errors").inc()
+        raise
+    await run_blocking(ai_client._store_speech, backend, text_input, "pcm", bytes(pcm))
+
+
+def _read_file(path) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
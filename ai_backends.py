@@ -0,0 +1,294 @@
+"""Pluggable vision/TTS backends for ai_client.
+
+Every backend speaks the OpenAI API: the cloud, an OpenAI-compatible server
+on the LAN (set `base_url`), or the deterministic offline stub in
+ai_stub.py (`kind: "stub"`). Configure them in order of preference in
+config.py, e.g.:
+
+    AI_BACKENDS = [
+        {"name": "lan", "base_url": "http://192.168.1.20:8000/v1", "api_key": "local",
+         "vision_model": "qwen2-vl", "tts_model": "kokoro", "vision_budget": 3.0},
+        {"name": "cloud"},
+        {"name": "offline", "kind": "stub"},
+    ]
+
+`BackendRouter` orders backends per stage by measured latency, pushes the
+ones that recently failed or missed their latency budget to the back, and
+ai_client falls through to the next backend when one does. Offline stubs
+are a last resort: always tried last, never ranked by latency. Clients are
+created with `max_retries=0`, so a failing backend falls through at once
+instead of being retried by the SDK.
+"""
+import os
+import threading
+import time
+from typing import Optional
+
+import metrics
+
+# OpenAI Python SDK
+try:
+    from openai import OpenAI, AsyncOpenAI
+except Exception:
+    OpenAI = AsyncOpenAI = None  # Will be checked at runtime
+
+try:
+    import httpx
+except Exception:
+    httpx = None
+
+REQUEST_TIMEOUT = 10  # seconds; network/request timeout to avoid indefinite hangs
+KEEPALIVE_EXPIRY = 120  # seconds an idle pooled connection is kept open
+FAILURE_COOLDOWN = 30.0  # seconds a failed backend is tried last
+LATENCY_SMOOTHING = 0.3
+MAX_RETRIES = 0  # SDK retries; the router's fallback replaces them
+
+
+def _trace_connections(event_name, info):
+    # httpcore trace hook: a TCP connect means the pool had no idle connection
+    if event_name == "connection.connect_tcp.complete":
+        metrics.counter("ai.http.connections_opened").inc()
+
+
+def _on_request(request):
+    metrics.counter("ai.http.requests").inc()
+    request.extensions["trace"] = _trace_connections
+
+
+def _on_response(response):
+    opened = metrics.counter("ai.http.connections_opened").value
+    total = metrics.counter("ai.http.requests").value
+    metrics.gauge("ai.http.reuse_ratio").set(1.0 - opened / total if total else 0.0)
+
+
+async def _trace_connections_async(event_name, info):
+    # httpcore 的异步接口要求 trace 回调是协程
+    _trace_connections(event_name, info)
+
+
+async def _on_request_async(request):
+    metrics.counter("ai.http.requests").inc()
+    request.extensions["trace"] = _trace_connections_async
+
+
+async def _on_response_async(response):
+    _on_response(response)
+
+
+def _make_http_client(asynchronous=False):
+    if httpx is None:
+        return None
+    limits = httpx.Limits(max_connections=8, max_keepalive_connections=4,
+                          keepalive_expiry=KEEPALIVE_EXPIRY)
+    if asynchronous:
+        # AsyncClient 的事件钩子必须是协程
+        return httpx.AsyncClient(
+            timeout=REQUEST_TIMEOUT, limits=limits,
+            event_hooks={"request": [_on_request_async], "response": [_on_response_async]},
+        )
+    return httpx.Client(
+        timeout=REQUEST_TIMEOUT, limits=limits,
+        event_hooks={"request": [_on_request], "response": [_on_response]},
+    )
+
+
+class Backend:
+    """One OpenAI-compatible endpoint with its models, budgets and deadlines.
+
+    - *_budget: latency (seconds to the first byte) above which the router
+      falls back to the next backend; used as the request timeout when a
+      fallback exists
+    - *_timeout: hard deadline for the whole stage on the last backend
+    """
+
+    def __init__(self, name, kind="openai", base_url=None, api_key=None,
+                 vision_model="gpt-4o-mini", tts_model="tts-1", tts_voice="alloy",
+                 vision_budget=6.0, tts_budget=3.0, vision_timeout=15.0, tts_timeout=15.0):
+        self.name = name
+        self.kind = kind
+        self.base_url = base_url
+        self.api_key = api_key
+        self.vision_model = vision_model
+        self.tts_model = tts_model
+        self.tts_voice = tts_voice
+        self.budgets = {"vision": vision_budget, "tts": tts_budget}
+        self.timeouts = {"vision": vision_timeout, "tts": tts_timeout}
+        self.latency = {}        # stage -> smoothed seconds
+        self.failed_at = {}      # stage -> monotonic time of last failure / budget miss
+        self._client = None
+        self._async_client = None  # bound to the ai_async event loop
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return f"Backend({self.name!r}, {self.kind}, {self.base_url or 'default'})"
+
+    @property
+    def is_stub(self) -> bool:
+        """Canned offline answers: a last resort, never preferred for being fast."""
+        return self.kind == "stub"
+
+    def _endpoint(self):
+        """(base_url, api_key) to connect to; starts the stub server if needed."""
+        if OpenAI is None:
+            print("OpenAI package not available")
+            raise RuntimeError("openai package not installed. Please `pip install openai`. ")
+        base_url = self.base_url
+        api_key = self.api_key
+        if self.kind == "stub":
+            import ai_stub
+            base_url = ai_stub.start_in_background()
+            api_key = api_key or "stub"
+        if not api_key:
+            print("API_KEY is missing")
+            raise RuntimeError("Missing OpenAI API key. Set in config.API_KEY or env OPENAI_API_KEY.")
+        return base_url, api_key
+
+    def get_client(self):
+        if self._client is not None:
+            return self._client
+        base_url, api_key = self._endpoint()
+        with self._lock:
+            if self._client is None:
+                with metrics.timer("ai.client_init"):
+                    self._client = OpenAI(api_key=api_key, base_url=base_url,
+                                          timeout=REQUEST_TIMEOUT, max_retries=MAX_RETRIES,
+                                          http_client=_make_http_client())
+        return self._client
+
+    def get_async_client(self):
+        """AsyncOpenAI client; only use it from the ai_async event loop."""
+        if self._async_client is not None:
+            return self._async_client
+        base_url, api_key = self._endpoint()
+        with self._lock:
+            if self._async_client is None:
+                with metrics.timer("ai.client_init"):
+                    self._async_client = AsyncOpenAI(api_key=api_key, base_url=base_url,
+                                                     timeout=REQUEST_TIMEOUT, max_retries=MAX_RETRIES,
+                                                     http_client=_make_http_client(asynchronous=True))
+        return self._async_client
+
+
+class BackendRouter:
+    def __init__(self, backends):
+        if not backends:
+            raise ValueError("at least one AI backend is required")
+        self.backends = list(backends)
+
+    def primary(self) -> Backend:
+        return self.backends[0]
+
+    def order(self, stage):
+        """Backends for `stage`, best first.
+
+        Healthy backends come first: measured ones by latency, then
+        unmeasured ones in configured order (they get measured when they
+        serve as a fallback; a live press is never moved onto an unknown
+        backend ahead of a known-good one). Backends that failed or missed their budget within
+        FAILURE_COOLDOWN seconds follow. Stubs always come last, in
+        configured order.
+        """
+        now = time.monotonic()
+
+        def key(item):
+            index, b = item
+            cooling = now - b.failed_at.get(stage, -FAILURE_COOLDOWN) < FAILURE_COOLDOWN
+            latency = b.latency.get(stage)
+            over = latency is not None and latency > b.budgets[stage]
+            return (cooling, over, latency is None, latency or 0.0, index)
+
+        ranked = sorted((item for item in enumerate(self.backends) if not item[1].is_stub), key=key)
+        return [b for _, b in ranked] + [b for b in self.backends if b.is_stub]
+
+    def record(self, backend, stage, seconds, ok=True):
+        metrics.observe(f"ai.backend.{backend.name}.{stage}", seconds)
+        if not ok:
+            backend.failed_at[stage] = time.monotonic()
+            metrics.counter(f"ai.backend.{backend.name}.{stage}_failures").inc()
+            return
+        prev = backend.latency.get(stage)
+        backend.latency[stage] = seconds if prev is None else prev + (seconds - prev) * LATENCY_SMOOTHING
+        if seconds > backend.budgets[stage]:
+            backend.failed_at[stage] = time.monotonic()
+            metrics.counter(f"ai.backend.{backend.name}.{stage}_over_budget").inc()
+
+    def call(self, stage, fn, cancelled=None):
+        """Run fn(backend, timeout) on each backend in order until one succeeds.
+
+        Every backend but the last gets its latency budget as timeout; the
+        last gets the full stage deadline. `cancelled` exceptions are not
+        retried. Returns fn's result; re-raises the last error if all fail.
+        """
+        backends = self.order(stage)
+        last_error = None
+        for i, backend in enumerate(backends):
+            final = i == len(backends) - 1
+            timeout = backend.timeouts[stage] if final else backend.budgets[stage]
+            t0 = time.perf_counter()
+            try:
+                result = fn(backend, timeout)
+            except Exception as e:
+                if cancelled is not None and isinstance(e, cancelled):
+                    raise
+                self.record(backend, stage, time.perf_counter() - t0, ok=False)
+                print(f"AI backend '{backend.name}' {stage} failed: {e}")
+                last_error = e
+                if not final:
+                    metrics.counter(f"ai.backend.{stage}_fallbacks").inc()
+                continue
+            self.record(backend, stage, time.perf_counter() - t0)
+            return result
+        raise last_error
+
+    async def call_async(self, stage, fn, cancelled=None):
+        """`call` for coroutines: awaits fn(backend, timeout) with the same fallback rules.
+
+        asyncio.CancelledError is never caught, so cancelling the task stops
+        the fallback chain too.
+        """
+        backends = self.order(stage)
+        last_error = None
+        for i, backend in enumerate(backends):
+            final = i == len(backends) - 1
+            timeout = backend.timeouts[stage] if final else backend.budgets[stage]
+            t0 = time.perf_counter()
+            try:
+                result = await fn(backend, timeout)
+            except Exception as e:
+                if cancelled is not None and isinstance(e, cancelled):
+                    raise
+                self.record(backend, stage, time.perf_counter() - t0, ok=False)
+                print(f"AI backend '{backend.name}' {stage} failed: {e}")
+                last_error = e
+                if not final:
+                    metrics.counter(f"ai.backend.{stage}_fallbacks").inc()
+                continue
+            self.record(backend, stage, time.perf_counter() - t0)
+            return result
+        raise last_error
+
+    def snapshot(self) -> dict:
+        return {b.name: {"latency": dict(b.latency), "base_url": b.base_url, "kind": b.kind}
+                for b in self.backends}
+
+
+def load_backends(api_key: Optional[str]):
+    """Build the backend list from config.AI_BACKENDS (default: the OpenAI cloud)."""
+    specs = None
+    try:
+        import config  # type: ignore
+        specs = getattr(config, "AI_BACKENDS", None)
+    except Exception:
+        pass
+    if os.environ.get("AI_BACKEND") == "stub":
+        specs = [{"name": "offline", "kind": "stub"}]
+    if not specs:
+        specs = [{"name": "cloud"}]
+    backends = []
+    for spec in specs:
+        spec = dict(spec)
+        if spec.get("kind", "openai") == "openai":
+            # 局域网兼容服务通常不校验密钥，但 SDK 要求非空
+            spec.setdefault("api_key", "local" if spec.get("base_url") else api_key)
+        backends.append(Backend(**spec))
+    return backends
@@ -1,110 +1,627 @@
 import os
 import base64
-import io
 import json
 from typing import Optional
 import time
-from pathlib import Path
-from PIL import Image
+import tempfile
+import threading
+import itertools
+from contextlib import ExitStack
+from collections import OrderedDict
+import numpy
 
-# OpenAI Python SDK
-try:
-    from openai import OpenAI
-except Exception:
-    OpenAI = None  # Will be checked at runtime
+import ai_backends
+import frame_encoder
+import metrics
+import tts_cache
 
 # Prefer API key from config.py if present, else env var
 API_KEY: Optional[str] = None
+VISION_STREAM = True  # stream vision tokens so ui_text can be shown as it forms
 try:
     import config  # type: ignore
     API_KEY = getattr(config, "API_KEY", None)
+    VISION_STREAM = getattr(config, "VISION_STREAM", VISION_STREAM)
 except Exception:
     API_KEY = os.environ.get("OPENAI_API_KEY")
 
-_client = None  # lazily initialized OpenAI client instance
-
-def _get_client():
-    global _client
-    if _client is not None:
-        print("_client is none")
-        time.sleep(0.7)
-        return _client
-    if OpenAI is None:
-        print("OpenAI package not available")
-        time.sleep(0.7)
-        raise RuntimeError("openai package not installed. Please `pip install openai`. ")
-    if not API_KEY:
-        print("API_KEY is missing")
-        time.sleep(0.7)
-        raise RuntimeError("Missing OpenAI API key. Set in config.API_KEY or env OPENAI_API_KEY.")
-    # Add a network/request timeout to avoid indefinite hangs
-    _client = OpenAI(api_key=API_KEY, timeout=10)
-    return _client
-
-
-def analyze_frame(frame_rgb) -> dict:
-    """Analyze a numpy RGB frame using OpenAI vision and return description text.
+WARM_UP_INTERVAL = 60  # seconds between re-warms triggered by warm_up()
+VISION_DEADLINE = 15  # seconds; whole streamed vision response, across fallbacks
+TTS_DEADLINE = 15  # seconds; whole streamed speech response, across fallbacks
 
-    - frame_rgb: numpy array in RGB shape (H, W, 3), dtype=uint8
-    Returns a dict: {'ui_text': str, 'speech_text': str}
+router = ai_backends.BackendRouter(ai_backends.load_backends(API_KEY))
+_last_warm_up = 0.0
+
+
+class Cancelled(Exception):
+    """Raised inside a request whose CancelToken was cancelled."""
+
+
+class CancelToken:
+    """Cooperative cancellation for one AI request.
+
+    Streaming calls check it between chunks and close the HTTP response;
+    blocking calls are abandoned (their result is discarded on return).
     """
-    client = _get_client()
-    # Convert numpy RGB to JPEG base64 (resize to 512x512 for cost/speed)
-    img = Image.fromarray(frame_rgb).convert("RGB")
-    img = img.resize((512, 512))
-    buffer = io.BytesIO()
-    img.save(buffer, format="JPEG", quality=85)
-    img_b64 = base64.b64encode(buffer.getvalue()).decode("utf-8")
-
-    system_prompt = (
-        "You are HoloCap vision assistance AI. The image provided is exactly what the user is seeing. Analyze the image and return a JSON object with two keys: "
-        "'ui_text' (max 10 words, concise for HUD) and "
-        "'speech_text' (natural, specific but simple, 1-2 sentences for audio)."
-    )
 
+    def __init__(self):
+        self._event = threading.Event()
+        self._callbacks = []
+        self._lock = threading.Lock()
+
+    def cancel(self):
+        with self._lock:
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for fn in callbacks:
+            fn()
+
+    def add_callback(self, fn):
+        """Call fn() (from the cancelling thread) on cancel; immediately if already cancelled."""
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(fn)
+                return
+        fn()
+
+    def remove_callback(self, fn):
+        with self._lock:
+            if fn in self._callbacks:
+                self._callbacks.remove(fn)
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def check(self):
+        if self._event.is_set():
+            raise Cancelled()
+
+
+def error_result(message) -> dict:
+    """Vision result for a failed request; `error` marks it (never cached, not spoken)."""
+    return {"ui_text": f"Error: {message}", "speech_text": "", "error": True}
+
+
+def is_error(result: dict) -> bool:
+    return bool(result.get("error"))
+
+
+def _check_deadline(t0, deadline, what):
+    if time.perf_counter() - t0 > deadline:
+        raise TimeoutError(f"{what} exceeded {deadline}s deadline")
+
+
+def warm_up(force: bool = False):
+    """Create the async clients and open pooled TLS connections on the AI loop.
+
+    Safe to call often (e.g. on app launch and whenever the AI page is shown);
+    it re-warms at most every WARM_UP_INTERVAL seconds.
+    """
+    global _last_warm_up
+    now = time.monotonic()
+    if not force and _last_warm_up and now - _last_warm_up < WARM_UP_INTERVAL:
+        return
+    _last_warm_up = now
+    import ai_async  # ai_async imports this module
+
+    async def _run():
+        # 预热 UI 实际使用的 AsyncOpenAI 连接池（同步客户端的连接池与之无关）
+        for backend in router.backends:
+            if backend.is_stub and len(router.backends) > 1:
+                # 离线替身只在其他后端都失败时才启动
+                continue
+            try:
+                client = backend.get_async_client()
+                with metrics.timer("ai.warm_up"):
+                    # Cheap authenticated request that leaves a keep-alive connection in the pool
+                    await client.models.list()
+            except Exception as e:
+                print(f"AI warm-up failed for '{backend.name}': {e}")
+
+    ai_async.submit(_run())
+
+
+def encode_frame(frame_rgb, timings: Optional[dict] = None, encoder=None) -> str:
+    """Encode a numpy RGB frame for upload and return it base64-encoded.
+
+    Uses `frame_encoder.default_encoder` unless `encoder` is given. If
+    `timings` is given, per-step durations in seconds are stored under
+    'resize', 'encode' and 'base64', and the encoded size under 'bytes'.
+    """
+    encoder = encoder or frame_encoder.default_encoder
+    step = {} if timings is None else timings
+    data = encoder.encode(frame_rgb, step)
+    t0 = time.perf_counter()
+    img_b64 = base64.b64encode(data).decode("ascii")
+    step["base64"] = time.perf_counter() - t0
+    metrics.observe("ai.encode.resize", step["resize"])
+    metrics.observe("ai.encode.codec", step["encode"])
+    metrics.gauge("ai.encoded_bytes").set(step["bytes"])
+    return img_b64
+
+
+SYSTEM_PROMPT = (
+    "You are HoloCap vision assistance AI. The image provided is exactly what the user is seeing. Analyze the image and return a JSON object with two keys: "
+    "'ui_text' (max 10 words, concise for HUD) and "
+    "'speech_text' (natural, specific but simple, 1-2 sentences for audio)."
+)
+
+
+def _vision_request(frame_rgb) -> dict:
+    """Encode the frame and build the chat.completions arguments (minus the model)."""
+    with metrics.timer("ai.encode"):
+        img_b64 = encode_frame(frame_rgb)
+    mime = frame_encoder.default_encoder.mime_type
+    metrics.gauge("ai.upload_bytes").set(len(img_b64))
     # Using chat.completions for vision per existing project style
+    return dict(
+        messages=[
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {
+                "role": "user",
+                "content": [
+                    {"type": "text", "text": "What is in my view?"},
+                    {"type": "image_url", "image_url": {"url": f"data:{mime};base64,{img_b64}"}},
+                ],
+            }
+        ],
+        response_format={"type": "json_object"},
+        max_tokens=150,
+    )
+
+
+def _vision_args(backend, request, timeout, stream=False) -> dict:
+    """chat.completions.create() arguments for `backend` (sync and async paths)."""
+    args = dict(request, model=backend.vision_model, timeout=timeout)
+    if stream:
+        args["stream"] = True
+    return args
+
+
+def _speech_args(backend, text_input, timeout, response_format=None) -> dict:
+    """audio.speech.create() arguments for `backend` (sync and async paths)."""
+    args = dict(model=backend.tts_model, voice=backend.tts_voice, input=text_input, timeout=timeout)
+    if response_format:
+        args["response_format"] = response_format
+    return args
+
+
+def _store_speech(backend, text_input, fmt, data: bytes) -> Optional[str]:
+    """Add synthesized audio to the TTS cache; returns its path, or None if the write failed."""
+    try:
+        return tts_cache.audio_cache.put(text_input, backend.tts_voice, backend.tts_model, fmt, data)
+    except OSError as e:
+        print(f"TTS cache write failed: {e}")
+        return None
+
+
+def _speech_file(backend, text_input, fmt, data: bytes) -> str:
+    """Path of playable `data`: its TTS cache entry, or a temp file if caching failed."""
+    path = _store_speech(backend, text_input, fmt, data)
+    if path is None:
+        # 缓存写入失败只跳过缓存，合成好的音频仍然返回
+        fd, path = tempfile.mkstemp(prefix="tts-", suffix=f".{fmt}")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+    return path
+
+
+def analyze_frame(frame_rgb, cancel: Optional[CancelToken] = None) -> dict:
+    """Analyze a numpy RGB frame using OpenAI vision and return description text.
+
+    - frame_rgb: numpy array in RGB shape (H, W, 3), dtype=uint8
+    - cancel: raises Cancelled if the token is cancelled before the result is used
+    Returns a dict: {'ui_text': str, 'speech_text': str}; failures also
+    carry 'error': True (see `error_result`).
+    """
     try:
-        resp = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {
-                    "role": "user",
-                    "content": [
-                        {"type": "text", "text": "What is in my view?"},
-                        {"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{img_b64}"}},
-                    ],
-                }
-            ],
-            response_format={"type": "json_object"},
-            max_tokens=150,
-        )
+        request = _vision_request(frame_rgb)
+        if cancel:
+            cancel.check()
+
+        def _call(backend, timeout):
+            return backend.get_client().chat.completions.create(**_vision_args(backend, request, timeout))
 
+        t0 = time.perf_counter()
+        resp = router.call("vision", _call, Cancelled)
+        if cancel:
+            cancel.check()
+
+        metrics.observe("ai.vision", time.perf_counter() - t0)
         content = resp.choices[0].message.content
         print("Chat GPT responses: ", content)
         return json.loads(content)
+    except Cancelled:
+        raise
+    except Exception as e:
+        metrics.counter("ai.vision_errors").inc()
+        print(f"AI Error: {e}")
+        return error_result(e)
+
+
+def _hex4(s) -> Optional[int]:
+    if len(s) != 4 or any(c not in "0123456789abcdefABCDEF" for c in s):
+        return None
+    return int(s, 16)
+
+
+def _scan_string(text, i):
+    """Decode a JSON string body starting after its opening quote.
+
+    Returns (value, index after closing quote, complete). Stops cleanly at
+    the end of `text` (complete=False) so partial input is fine, including a
+    `\\uXXXX` escape or surrogate pair cut by a chunk boundary. Malformed
+    escapes and lone surrogates decode to U+FFFD instead of raising.
+    """
+    out = []
+    n = len(text)
+    while i < n:
+        c = text[i]
+        if c == '"':
+            return "".join(out), i + 1, True
+        if c == "\\":
+            if i + 1 >= n:
+                break
+            e = text[i + 1]
+            if e == "u":
+                if i + 6 > n:
+                    break
+                code = _hex4(text[i + 2:i + 6])
+                i += 6
+                if code is None or 0xDC00 <= code <= 0xDFFF:
+                    out.append("\ufffd")
+                elif 0xD800 <= code <= 0xDBFF:
+                    # 代理对：非 BMP 字符（如 emoji）由两个 \u 转义组成
+                    rest = text[i:i + 6]
+                    if len(rest) < 6 and "\\u".startswith(rest[:2]):
+                        break
+                    low = _hex4(rest[2:]) if rest.startswith("\\u") else None
+                    if low is not None and 0xDC00 <= low <= 0xDFFF:
+                        out.append(chr(0x10000 + ((code - 0xD800) << 10) + (low - 0xDC00)))
+                        i += 6
+                    else:
+                        out.append("\ufffd")
+                else:
+                    out.append(chr(code))
+                continue
+            out.append({"n": "\n", "t": "\t", "r": "\r", "b": "\b", "f": "\f"}.get(e, e))
+            i += 2
+            continue
+        out.append(c)
+        i += 1
+    return "".join(out), n, False
+
+
+def parse_partial_json(text: str) -> dict:
+    """Extract string fields from a possibly incomplete flat JSON object.
+
+    Returns {key: (value_so_far, complete)}; the last field may be partial.
+    """
+    fields = {}
+    i = text.find("{")
+    if i < 0:
+        return fields
+    n = len(text)
+    i += 1
+    while i < n:
+        q = text.find('"', i)
+        if q < 0:
+            break
+        key, i, done = _scan_string(text, q + 1)
+        if not done:
+            break
+        while i < n and text[i] in " \t\r\n:":
+            i += 1
+        if i >= n:
+            break
+        if text[i] != '"':
+            # Non-string value: skip to the next field
+            j = min([k for k in (text.find(",", i), text.find("}", i)) if k >= 0], default=-1)
+            if j < 0:
+                break
+            i = j + 1
+            continue
+        value, i, done = _scan_string(text, i + 1)
+        fields[key] = (value, done)
+        if not done:
+            break
+    return fields
+
+
+class VisionStream:
+    """Accumulates a streamed vision response and fires the partial-JSON callbacks.
+
+    Shared by `analyze_frame_stream` and ai_async, so both paths report
+    ui_text / speech_text at exactly the same points.
+    """
+
+    def __init__(self, t0, on_ui_text=None, on_speech_text=None):
+        self.t0 = t0
+        self.on_ui_text = on_ui_text
+        self.on_speech_text = on_speech_text
+        self.content = ""
+        self._last_ui = None
+        self._speech_sent = False
+
+    def feed(self, chunk):
+        """Add one chat.completions stream chunk."""
+        delta = chunk.choices[0].delta.content if chunk.choices else None
+        if not delta:
+            return
+        if not self.content:
+            metrics.observe("ai.vision_first_token", time.perf_counter() - self.t0)
+        self.content += delta
+        fields = parse_partial_json(self.content)
+        ui = fields.get("ui_text")
+        if ui and self.on_ui_text and ui[0] != self._last_ui:
+            self._last_ui = ui[0]
+            self.on_ui_text(self._last_ui)
+        speech = fields.get("speech_text")
+        if speech and speech[1] and not self._speech_sent:
+            self._speech_sent = True
+            metrics.observe("ai.vision_speech_ready", time.perf_counter() - self.t0)
+            if self.on_speech_text:
+                self.on_speech_text(speech[0])
+
+    def result(self) -> dict:
+        metrics.observe("ai.vision", time.perf_counter() - self.t0)
+        print("Chat GPT responses: ", self.content)
+        return json.loads(self.content)
+
+
+def analyze_frame_stream(frame_rgb, on_ui_text=None, on_speech_text=None,
+                         cancel: Optional[CancelToken] = None) -> dict:
+    """Streaming variant of `analyze_frame`.
+
+    Tokens are consumed as they arrive and parsed as partial JSON:
+    - on_ui_text(text) is called each time the (possibly unfinished) ui_text grows
+    - on_speech_text(text) is called once, as soon as speech_text is complete
+    Returns the final dict, like `analyze_frame`. A cancelled token closes the
+    HTTP stream and raises Cancelled.
+    """
+    stream = None
+    try:
+        request = _vision_request(frame_rgb)
+        if cancel:
+            cancel.check()
+
+        def _open(backend, timeout):
+            # 取到第一个分片才算该后端成功，之后不再切换后端
+            s = backend.get_client().chat.completions.create(
+                **_vision_args(backend, request, timeout, stream=True))
+            it = iter(s)
+            try:
+                first = next(it, None)
+            except BaseException:
+                s.close()
+                raise
+            return s, it, first
+
+        t0 = time.perf_counter()
+        stream, it, first = router.call("vision", _open, Cancelled)
+
+        parser = VisionStream(t0, on_ui_text, on_speech_text)
+        for chunk in itertools.chain([first] if first is not None else [], it):
+            if cancel:
+                cancel.check()
+            _check_deadline(t0, VISION_DEADLINE, "vision")
+            parser.feed(chunk)
+        return parser.result()
+    except Cancelled:
+        if stream is not None:
+            stream.close()
+        raise
     except Exception as e:
+        if stream is not None:
+            stream.close()
+        metrics.counter("ai.vision_errors").inc()
         print(f"AI Error: {e}")
-        return {"ui_text": f"Error: {e}", "speech_text": ""}
+        return error_result(e)
+
+
+# ---------------------------------------------------------------------------
+# Perceptual-hash response cache: repeated presses at the same scene reuse
+# the previous answer (and its speech audio) instead of new API requests.
+# ---------------------------------------------------------------------------
+
+CACHE_MAX_ENTRIES = 32
+CACHE_TTL = 120.0  # seconds
+CACHE_MAX_DISTANCE = 6  # max Hamming distance (of 64 bits) counted as the same scene
+
+
+def frame_hash(frame_rgb, size: int = 8) -> int:
+    """64-bit dHash of a frame: compare neighbouring cells of a size x (size+1) grayscale grid."""
+    h, w = frame_rgb.shape[:2]
+    step = max(1, min(h // (size * 4), w // ((size + 1) * 4)))
+    small = frame_rgb[::step, ::step]
+    sh, sw = small.shape[:2]
+    bh, bw = sh // size, sw // (size + 1)
+    cells = small[:bh * size, :bw * (size + 1)].reshape(size, bh, size + 1, bw, -1)
+    grid = cells.mean(axis=(1, 3, 4))
+    bits = grid[:, 1:] > grid[:, :-1]
+    return int.from_bytes(numpy.packbits(bits.ravel()).tobytes(), "big")
+
+
+class CacheEntry:
+    __slots__ = ("hash", "result", "audio", "created")
+
+    def __init__(self, frame_hash_value, result):
+        self.hash = frame_hash_value
+        self.result = result
+        self.audio = None  # PCM bytes of the spoken answer, once synthesized
+        self.created = time.monotonic()
 
 
-def generate_speech(text_input, output_file="response.mp3"):
+class ResponseCache:
+    """LRU + TTL cache of vision results keyed by perceptual hash.
+
+    A lookup hits when a live entry is within `max_distance` bits of the
+    query hash; the closest one wins.
+    """
+
+    def __init__(self, max_entries=CACHE_MAX_ENTRIES, ttl=CACHE_TTL, max_distance=CACHE_MAX_DISTANCE):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_distance = max_distance
+        self._entries = OrderedDict()  # hash -> CacheEntry, oldest first
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _expire(self, now):
+        for key in [k for k, e in self._entries.items() if now - e.created > self.ttl]:
+            del self._entries[key]
+
+    def lookup(self, frame_hash_value) -> Optional[CacheEntry]:
+        with self._lock:
+            self._expire(time.monotonic())
+            best, best_dist = None, self.max_distance + 1
+            for key, entry in self._entries.items():
+                dist = bin(key ^ frame_hash_value).count("1")
+                if dist < best_dist:
+                    best, best_dist = entry, dist
+            if best is not None:
+                self._entries.move_to_end(best.hash)
+                self.hits += 1
+                metrics.counter("ai.cache.hits").inc()
+            else:
+                self.misses += 1
+                metrics.counter("ai.cache.misses").inc()
+            metrics.gauge("ai.cache.hit_rate").set(self.hit_rate)
+            return best
+
+    def store(self, frame_hash_value, result) -> CacheEntry:
+        entry = CacheEntry(frame_hash_value, result)
+        with self._lock:
+            self._entries[frame_hash_value] = entry
+            self._entries.move_to_end(frame_hash_value)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+response_cache = ResponseCache()
+
+
+def analyze_frame_cached(frame_rgb, on_ui_text=None, on_speech_text=None,
+                         cancel: Optional[CancelToken] = None):
+    """Like `analyze_frame`, but answers repeated scenes from `response_cache`.
+
+    With callbacks (and VISION_STREAM enabled) a miss is answered through
+    `analyze_frame_stream`; the callbacks are not called on a hit.
+
+    Returns (result, entry, hit). `entry.audio` holds the cached speech PCM
+    on a hit; on a miss the caller can fill it in after synthesis. Error
+    results are not cached (entry is None).
+    """
+    h = frame_hash(frame_rgb)
+    entry = response_cache.lookup(h)
+    if entry is not None:
+        return entry.result, entry, True
+    if VISION_STREAM and (on_ui_text or on_speech_text):
+        result = analyze_frame_stream(frame_rgb, on_ui_text, on_speech_text, cancel)
+    else:
+        result = analyze_frame(frame_rgb, cancel)
+    if is_error(result):
+        return result, None, False
+    return result, response_cache.store(h, result), False
+
+
+def _cached_speech(text_input, fmt) -> Optional[str]:
+    """Path of `text_input` already synthesized by any TTS backend, or None."""
+    for backend in router.order("tts"):
+        path = tts_cache.audio_cache.get(text_input, backend.tts_voice, backend.tts_model, fmt)
+        if path:
+            return path
+    return None
+
+
+def generate_speech(text_input):
     """
     Converts text to speech using OpenAI's TTS API.
+
+    Returns the path of an mp3 in the TTS cache (content-addressed, written
+    atomically), or None on error. Cached phrases cost no request.
     """
-    client = _get_client()
+    path = _cached_speech(text_input, "mp3")
+    if path:
+        return path
     try:
-        response = client.audio.speech.create(
-            model="tts-1",
-            voice="alloy",
-            input=text_input
-        )
-        
-        # Save the audio to a file
-        speech_file_path = Path(__file__).parent / output_file
-        response.stream_to_file(speech_file_path)
-        return str(speech_file_path)
-        
+        def _call(backend, timeout):
+            response = backend.get_client().audio.speech.create(**_speech_args(backend, text_input, timeout))
+            return backend, response.read()
+
+        t0 = time.perf_counter()
+        backend, audio = router.call("tts", _call)
+        path = _speech_file(backend, text_input, "mp3", audio)
+        metrics.observe("ai.tts", time.perf_counter() - t0)
+        return path
+
     except Exception as e:
+        metrics.counter("ai.tts_errors").inc()
         print(f"Error generating speech: {e}")
         return None
+
+
+def iter_speech(text_input, chunk_size=4096, cancel: Optional[CancelToken] = None):
+    """
+    Streams text to speech as raw PCM (24 kHz, 16-bit, mono) chunks.
+
+    Yields bytes as they arrive from the API, so playback can begin on the
+    first chunk. Phrases already in the TTS cache are read from disk; a
+    completed stream is added to it. Errors are raised to the caller; a
+    cancelled token closes the stream and raises Cancelled.
+    """
+    path = _cached_speech(text_input, "pcm")
+    if path:
+        with open(path, "rb") as f:
+            while True:
+                chunk = f.read(chunk_size * 16)
+                if not chunk:
+                    return
+                if cancel:
+                    cancel.check()
+                yield chunk
+
+    def _open(backend, timeout):
+        # 首个音频分片到达前失败或超出预算时切换到下一个后端
+        stack = ExitStack()
+        try:
+            response = stack.enter_context(backend.get_client().audio.speech.with_streaming_response.create(
+                **_speech_args(backend, text_input, timeout, "pcm")))
+            it = response.iter_bytes(chunk_size)
+            first = next(it, b"")
+        except BaseException:
+            stack.close()
+            raise
+        return backend, stack, it, first
+
+    t0 = time.perf_counter()
+    pcm = bytearray()
+    try:
+        backend, stack, it, first = router.call("tts", _open, Cancelled)
+        metrics.observe("ai.tts_first_byte", time.perf_counter() - t0)
+        with stack:
+            for chunk in itertools.chain([first], it):
+                if cancel:
+                    cancel.check()
+                _check_deadline(t0, TTS_DEADLINE, "speech")
+                pcm += chunk
+                yield chunk
+        metrics.observe("ai.tts", time.perf_counter() - t0)
+    except Cancelled:
+        raise
+    except Exception:
+        metrics.counter("ai.tts_errors").inc()
+        raise
+    _store_speech(backend, text_input, "pcm", bytes(pcm))
@@ -0,0 +1,168 @@
+"""Local, deterministic stand-in for the OpenAI endpoints used by ai_client.
+
+Streams canned audio for /v1/audio/speech (24 kHz 16-bit mono PCM, sent in
+timed chunks like the real service), answers /v1/chat/completions with a
+canned JSON result (as SSE token chunks when the request sets "stream")
+and /v1/models for warm-up. It backs the offline "stub" AI backend
+(`AI_BACKEND=stub python pc_main.py`), and can also be run on its own:
+
+    python ai_stub.py --port 8765 &
+    OPENAI_BASE_URL=http://127.0.0.1:8765/v1 OPENAI_API_KEY=test python pc_main.py
+"""
+import json
+import math
+import time
+import argparse
+import struct
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+PCM_RATE = 24000
+
+CANNED_RESULT = {
+    "ui_text": "Desk with laptop and coffee mug",
+    "speech_text": "You are looking at a desk with an open laptop and a coffee mug next to it.",
+}
+
+
+def make_tone(seconds, freq=440.0):
+    """Return `seconds` of a sine tone as 16-bit little-endian PCM."""
+    n = int(PCM_RATE * seconds)
+    return b"".join(struct.pack("<h", int(8000 * math.sin(2 * math.pi * freq * i / PCM_RATE)))
+                    for i in range(n))
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    audio = b""
+    chunk_bytes = 4800
+    first_delay = 0.2
+    chunk_delay = 0.05
+    vision_delay = 0.8
+    token_chars = 4
+    token_delay = 0.03
+
+    def log_message(self, fmt, *args):
+        pass
+
+    def _send_json(self, obj, status=200):
+        body = json.dumps(obj).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length", 0))
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def _write_chunk(self, data):
+        self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+        self.wfile.flush()
+
+    def do_GET(self):
+        if self.path.rstrip("/").endswith("/models"):
+            self._send_json({"object": "list", "data": [{"id": "gpt-4o-mini", "object": "model"}]})
+        else:
+            self._send_json({"error": {"message": "not found"}}, 404)
+
+    def do_POST(self):
+        path = self.path.rstrip("/")
+        req = self._read_json()
+        if path.endswith("/audio/speech"):
+            self.send_response(200)
+            self.send_header("Content-Type", "audio/pcm")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            time.sleep(self.first_delay)
+            for i in range(0, len(self.audio), self.chunk_bytes):
+                self._write_chunk(self.audio[i:i + self.chunk_bytes])
+                time.sleep(self.chunk_delay)
+            self.wfile.write(b"0\r\n\r\n")
+            self.wfile.flush()
+        elif path.endswith("/chat/completions") and req.get("stream"):
+            self._stream_completion(req)
+        elif path.endswith("/chat/completions"):
+            time.sleep(self.vision_delay)
+            self._send_json({
+                "id": "chatcmpl-standin",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": req.get("model", "gpt-4o-mini"),
+                "choices": [{
+                    "index": 0,
+                    "finish_reason": "stop",
+                    "message": {"role": "assistant", "content": json.dumps(CANNED_RESULT)},
+                }],
+            })
+        else:
+            self._send_json({"error": {"message": "not found"}}, 404)
+
+
+    def _stream_completion(self, req):
+        """Send the canned JSON a few characters per SSE chunk, like token streaming."""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        content = json.dumps(CANNED_RESULT)
+        base = {"id": "chatcmpl-standin", "object": "chat.completion.chunk",
+                "created": int(time.time()), "model": req.get("model", "gpt-4o-mini")}
+        time.sleep(self.vision_delay / 2)
+        for i in range(0, len(content), self.token_chars):
+            delta = {"content": content[i:i + self.token_chars]}
+            if i == 0:
+                delta["role"] = "assistant"
+            event = dict(base, choices=[{"index": 0, "delta": delta, "finish_reason": None}])
+            self._write_chunk(f"data: {json.dumps(event)}\n\n".encode())
+            time.sleep(self.token_delay)
+        event = dict(base, choices=[{"index": 0, "delta": {}, "finish_reason": "stop"}])
+        self._write_chunk(f"data: {json.dumps(event)}\n\n".encode())
+        self._write_chunk(b"data: [DONE]\n\n")
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+
+def serve(host="127.0.0.1", port=8765, audio_seconds=2.0):
+    StandInHandler.audio = make_tone(audio_seconds)
+    server = ThreadingHTTPServer((host, port), StandInHandler)
+    print(f"AI stand-in listening on http://{host}:{server.server_address[1]}/v1")
+    return server
+
+
+_background = None
+
+
+def start_in_background(delays=False) -> str:
+    """Start a stub server on a free localhost port (once) and return its base URL.
+
+    With delays=False it answers immediately, for an offline backend.
+    """
+    global _background
+    if _background is None:
+        if not delays:
+            StandInHandler.first_delay = StandInHandler.chunk_delay = 0.0
+            StandInHandler.vision_delay = StandInHandler.token_delay = 0.0
+        server = serve(port=0)
+        threading.Thread(target=server.serve_forever, name="ai-stub", daemon=True).start()
+        host, port = server.server_address[:2]
+        _background = f"http://{host}:{port}/v1"
+    return _background
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Local stand-in for the OpenAI API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--audio-seconds", type=float, default=2.0)
+    parser.add_argument("--first-delay", type=float, default=0.2, help="seconds before the first audio chunk")
+    parser.add_argument("--vision-delay", type=float, default=0.8, help="seconds before the vision answer")
+    args = parser.parse_args(argv)
+    StandInHandler.first_delay = args.first_delay
+    StandInHandler.vision_delay = args.vision_delay
+    serve(args.host, args.port, args.audio_seconds).serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""In-memory streaming playback of raw PCM speech through pygame.
+
+OpenAI TTS with `response_format="pcm"` returns 24 kHz, 16-bit, mono,
+little-endian samples. `StreamPlayer` turns incoming chunks into
+`pygame.mixer.Sound` objects and queues them back to back on one channel,
+so playback starts with the first chunk and nothing touches the disk.
+"""
+import queue
+import threading
+import time
+from typing import Callable, Optional
+
+import pygame
+
+import metrics
+
+PCM_RATE = 24000
+PCM_SAMPLE_BYTES = 2
+# Smallest chunk handed to the mixer (100 ms); smaller pieces cause audible gaps
+MIN_CHUNK_BYTES = PCM_RATE * PCM_SAMPLE_BYTES // 10
+
+_mixer_lock = threading.Lock()
+
+
+def init_mixer():
+    """Initialise the mixer in the TTS PCM format (mp3 playback still works).
+
+    Does nothing if it is already initialised (e.g. in the background at startup).
+    """
+    with _mixer_lock:
+        if pygame.mixer.get_init():
+            return
+        pygame.mixer.init(frequency=PCM_RATE, size=-16, channels=1)
+
+
+class StreamPlayer:
+    """Plays PCM chunks as they are fed, from a background thread.
+
+    - feed(data): append PCM bytes (any size, any thread)
+    - close(): no more data; remaining audio is flushed
+    - stop(): drop pending data and silence the channel immediately
+    - on_first_audio(): called once when the first chunk starts playing
+    """
+
+    def __init__(self, on_first_audio: Optional[Callable[[], None]] = None):
+        self.on_first_audio = on_first_audio
+        self._queue = queue.Queue()
+        self._created = time.perf_counter()
+        self.first_audio_time = None
+        self.error = None  # set to a message if playback failed
+        self._stopped = threading.Event()
+        self._channel = None
+        self._thread = threading.Thread(target=self._run, name="audio-stream", daemon=True)
+        self._thread.start()
+
+    def feed(self, data: bytes):
+        if data:
+            self._queue.put(data)
+
+    def close(self):
+        self._queue.put(None)
+
+    def stop(self):
+        self._stopped.set()
+        self._queue.put(None)
+        channel = self._channel
+        if channel is not None:
+            channel.stop()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Block until all fed audio has been handed to the mixer.
+
+        Returns False if `timeout` expired first.
+        """
+        self._thread.join(timeout)
+        return not self._thread.is_alive()
+
+    def _run(self):
+        try:
+            self._feed_loop()
+        finally:
+            if self._stopped.is_set() and self._channel is not None:
+                self._channel.stop()
+
+    def _feed_loop(self):
+        channel = None
+        playing = []  # keep Sound objects alive while the channel uses them
+        pending = bytearray()
+        closed = False
+        while not closed:
+            data = self._queue.get()
+            if self._stopped.is_set():
+                break
+            # 合并所有已到达的数据，减少 Sound 对象数量
+            while True:
+                if data is None:
+                    closed = True
+                    break
+                pending += data
+                try:
+                    data = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+            if len(pending) < MIN_CHUNK_BYTES and not closed:
+                continue
+            usable = len(pending) - len(pending) % PCM_SAMPLE_BYTES
+            if not usable:
+                continue
+
+            if channel is not None:
+                # 等待队列槽位空出（pygame 每个通道只能排队一个 Sound）
+                while channel.get_busy() and channel.get_queue() is not None:
+                    if self._stopped.is_set():
+                        return
+                    time.sleep(0.005)
+                    if not self._queue.empty() and not closed:
+                        break
+                if channel.get_busy() and channel.get_queue() is not None:
+                    continue  # more data arrived; merge it first
+
+            usable = len(pending) - len(pending) % PCM_SAMPLE_BYTES
+            try:
+                sound = pygame.mixer.Sound(buffer=bytes(pending[:usable]))
+            except Exception as e:
+                self.error = str(e)
+                print(f"Audio stream error: {e}")
+                return
+            del pending[:usable]
+
+            if self._stopped.is_set():
+                return
+            if channel is None or not channel.get_busy():
+                channel = self._channel = sound.play()
+                if channel is None:
+                    self.error = "no free mixer channel"
+                    print("Audio stream error: no free mixer channel")
+                    return
+            else:
+                channel.queue(sound)
+            playing = playing[-1:] + [sound]
+
+            if self.first_audio_time is None:
+                self.first_audio_time = time.perf_counter()
+                metrics.observe("audio.first_chunk", self.first_audio_time - self._created)
+                if self.on_first_audio:
+                    self.on_first_audio()
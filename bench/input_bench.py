@@ -0,0 +1,164 @@
+"""Remote-button load test.
+
+Starts the TCP button server on a free local port and drives it with many
+concurrent clients. Each client sends its lines split at random byte
+boundaries, so partial lines across TCP segments are exercised. Reports
+events per second, lost lines and receive-to-emit_key latency.
+
+The UDP protocol is driven by one paced sender that duplicates some
+packets; reports events/s, detected loss/duplicates and latency.
+
+Usage (from the repo root):
+    python -m bench.input_bench [--clients 50] [--events 2000] [--out bench_results/input-<commit>.json]
+"""
+import os
+import sys
+import json
+import time
+import random
+import socket
+import argparse
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import metrics
+from bench.pipeline_bench import percentiles, git_commit, peak_rss_kb
+from KeyEvent import tcp_button, udp_button
+
+CODES = ("6", "8", "7")
+
+
+class RecordingListener:
+    """Stands in for InputListener: records emit_key calls instead of queueing Qt signals."""
+
+    def __init__(self):
+        self.pending = 0
+        self.count = 0
+        self.latencies = []
+        self.server = None
+
+    def emit_key(self, key_code, trace=None):
+        self.count += 1
+        self.latencies.append(time.perf_counter() - self.server.recv_time)
+
+
+def run_client(address, events, seed, errors):
+    rng = random.Random(seed)
+    payload = b"".join(f"BUTTON:code={rng.choice(CODES)},action=PRESS\n".encode()
+                       for _ in range(events))
+    try:
+        with socket.create_connection(address) as sock:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            i = 0
+            while i < len(payload):
+                n = rng.randint(1, 64)
+                sock.sendall(payload[i:i + n])
+                i += n
+    except OSError as e:
+        errors.append(str(e))
+
+
+def bench_tcp(clients, events, timeout=60.0):
+    listener = RecordingListener()
+    server = tcp_button.ButtonServer(listener, host="127.0.0.1", port=0)
+    listener.server = server
+    server.start()
+
+    errors = []
+    threads = [threading.Thread(target=run_client, args=(server.address, events, i, errors), daemon=True)
+               for i in range(clients)]
+    expected = clients * events
+    t0 = time.perf_counter()
+    for t in threads:
+        t.start()
+    deadline = t0 + timeout
+    while listener.count < expected and time.perf_counter() < deadline:
+        server.poll(0.01)
+    elapsed = time.perf_counter() - t0
+    for t in threads:
+        t.join(1.0)
+    server.close()
+
+    return {
+        "clients": clients,
+        "events_per_client": events,
+        "sent": expected,
+        "received": listener.count,
+        "lost": expected - listener.count,
+        "client_errors": errors[:5],
+        "seconds": elapsed,
+        "events_per_s": listener.count / elapsed if elapsed else 0.0,
+        "recv_to_emit": percentiles(listener.latencies),
+    }
+
+
+def bench_udp(events, rate, duplicate_every=10, timeout=30.0):
+    listener = RecordingListener()
+    server = udp_button.UdpButtonServer(listener, host="127.0.0.1", port=0)
+    listener.server = server
+    server.start()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    client = udp_button.UdpButtonClient(server.address)
+    rng = random.Random(0)
+    interval = 1.0 / rate if rate else 0.0
+    t0 = time.perf_counter()
+    for i in range(events):
+        client.press(int(rng.choice(CODES)), repeat=2 if duplicate_every and i % duplicate_every == 0 else 1)
+        if interval:
+            # 按固定速率发送，避免本机回环缓冲区溢出
+            next_send = t0 + (i + 1) * interval
+            while time.perf_counter() < next_send:
+                pass
+    deadline = time.perf_counter() + timeout
+    while listener.count < events and time.perf_counter() < deadline:
+        time.sleep(0.01)
+    elapsed = time.perf_counter() - t0
+    client.close()
+    server.stop()
+    thread.join(1.0)
+
+    tracker = next(iter(server.senders.values()), udp_button.SequenceTracker())
+    return {
+        "sent": events,
+        "rate_per_s": rate,
+        "received": listener.count,
+        "undelivered": events - listener.count,
+        "seconds": elapsed,
+        "events_per_s": listener.count / elapsed if elapsed else 0.0,
+        "sequence": tracker.snapshot(),
+        "recv_to_emit": percentiles(listener.latencies),
+        "one_way": metrics.histogram("input.udp.one_way").snapshot(),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", type=int, default=50)
+    parser.add_argument("--events", type=int, default=2000, help="lines sent per client")
+    parser.add_argument("--udp-events", type=int, default=20000)
+    parser.add_argument("--udp-rate", type=float, default=5000.0, help="UDP packets per second (0: unpaced)")
+    parser.add_argument("--out", default=None, help="JSON output path")
+    args = parser.parse_args(argv)
+
+    results = {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "tcp": bench_tcp(args.clients, args.events),
+        "udp": bench_udp(args.udp_events, args.udp_rate),
+        "peak_rss_kb": peak_rss_kb(),
+        "metrics": metrics.snapshot(),
+    }
+
+    out = args.out or os.path.join("bench_results", f"input-{results['commit']}.json")
+    os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+    with open(out, "w") as f:
+        json.dump(results, f, indent=2)
+    print(json.dumps({k: v for k, v in results.items() if k != "metrics"}, indent=2))
+    print(f"Results written to {out}")
+
+
+if __name__ == "__main__":
+    main()
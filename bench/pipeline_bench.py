@@ -0,0 +1,230 @@
+"""Headless pipeline benchmark.
+
+Runs the preview path (capture -> QImage -> paint), the AI upload
+preprocessing (resize / encode / base64) and page transitions of
+AnimatedStackedWidget with the MockCamera under the offscreen Qt platform,
+and writes the results as JSON so runs can be compared across commits.
+
+Usage (from the repo root):
+    python -m bench.pipeline_bench [--seconds 5] [--out bench_results/<commit>.json]
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import resource
+import platform
+import subprocess
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import camera
+import metrics
+
+
+def percentiles(samples, scale=1000.0):
+    """Return count/mean/p50/p90/p99/max of `samples` (seconds) in ms."""
+    if not samples:
+        return {"count": 0}
+    s = sorted(samples)
+    n = len(s)
+
+    def pct(p):
+        return s[min(n - 1, int(round(p / 100.0 * (n - 1))))] * scale
+
+    return {
+        "count": n,
+        "mean_ms": sum(s) / n * scale,
+        "p50_ms": pct(50),
+        "p90_ms": pct(90),
+        "p99_ms": pct(99),
+        "max_ms": s[-1] * scale,
+    }
+
+
+def peak_rss_kb():
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS reports bytes, Linux reports KiB
+    return rss // 1024 if sys.platform == "darwin" else rss
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True,
+                                       stderr=subprocess.DEVNULL).strip()
+    except Exception:
+        return "unknown"
+
+
+def bench_preview(app, seconds):
+    from qt.page_camera import CameraPage
+
+    page = CameraPage()
+    page.resize(365, 320)
+    page.show()
+    # 由基准自己驱动 update_frame，避免调度器的节拍影响测量
+    page.scheduler.stop()
+    camera.add_consumer()
+
+    handoff, update = [], []
+    rendered = 0
+    cpu0 = time.process_time()
+    t_start = time.monotonic()
+    last_seq = 0
+    try:
+        while time.monotonic() - t_start < seconds:
+            frame = camera.wait_for_next(last_seq, timeout=1.0)
+            if frame is None:
+                continue
+            last_seq = frame.seq
+            t0 = time.perf_counter()
+            handoff.append(time.monotonic() - frame.timestamp)
+            if page.update_frame():
+                update.append(time.perf_counter() - t0)
+                rendered += 1
+            app.processEvents()
+    finally:
+        camera.remove_consumer()
+        page.hide()
+    wall = time.monotonic() - t_start
+    return {
+        "frames": rendered,
+        "sustained_fps": rendered / wall,
+        "cpu_seconds": time.process_time() - cpu0,
+        "cpu_percent": (time.process_time() - cpu0) / wall * 100.0,
+        "stages": {
+            "capture_to_ui": percentiles(handoff),
+            "update_frame": percentiles(update),
+        },
+        "camera_stats": camera.stats.snapshot(),
+    }
+
+
+def bench_ai_preprocess(iterations, encoder=None):
+    import ai_client
+
+    frame = None
+    with camera.consumer():
+        deadline = time.monotonic() + 5.0
+        # 首帧到达前 acquire_latest() 返回 None
+        while frame is None and time.monotonic() < deadline:
+            camera.wait_for_next(0, timeout=1.0)
+            frame = camera.acquire_latest()
+    if frame is None:
+        print("ai_preprocess: no camera frame within 5 s, skipped")
+        return {"iterations": 0, "skipped": "no camera frame"}
+    stages = {"resize": [], "encode": [], "base64": [], "total": []}
+    payload = 0
+    cpu0 = time.process_time()
+    with frame:
+        for _ in range(iterations):
+            timings = {}
+            t0 = time.perf_counter()
+            ai_client.encode_frame(frame.data, timings, encoder)
+            stages["total"].append(time.perf_counter() - t0)
+            for k in ("resize", "encode", "base64"):
+                stages[k].append(timings[k])
+            payload = timings["bytes"]
+    encoder = encoder or ai_client.frame_encoder.default_encoder
+    return {
+        "iterations": iterations,
+        "encoder": {"backend": encoder.backend, "codec": encoder.codec, "quality": encoder.quality,
+                    "max_size": encoder.max_size, "grayscale": encoder.grayscale},
+        "payload_bytes": payload,
+        "cpu_seconds": time.process_time() - cpu0,
+        "stages": {k: percentiles(v) for k, v in stages.items()},
+    }
+
+
+def bench_transitions(app, count):
+    from PyQt6.QtWidgets import QLabel
+    from qt.gui import AnimatedStackedWidget
+    from qt.page_map import MapPage
+    from qt.page_camera import CameraPage
+
+    stack = AnimatedStackedWidget()
+    for page in (MapPage(), QLabel("AI"), CameraPage()):
+        stack.addWidget(page)
+    stack.resize(365, 320)
+    stack.show()
+    app.processEvents()
+
+    durations = []
+    cpu0 = time.process_time()
+    index = 0
+    for _ in range(count):
+        index = (index + 1) % stack.count()
+        t0 = time.perf_counter()
+        stack.setCurrentIndex(index)
+        while stack.is_animating:
+            app.processEvents()
+            time.sleep(0.001)
+        durations.append(time.perf_counter() - t0)
+    cpu = time.process_time() - cpu0
+    stack.hide()
+    app.processEvents()
+    return {
+        "transitions": count,
+        "animation_ms": stack.animation_duration,
+        "cpu_seconds": cpu,
+        "cpu_ms_per_transition": cpu / max(count, 1) * 1000.0,
+        "stages": {"transition": percentiles(durations)},
+    }
+
+
+def make_encoder(args):
+    import frame_encoder
+
+    d = frame_encoder.default_encoder
+    if args.codec is None and args.quality is None and args.max_size is None and not args.grayscale:
+        return None
+    return frame_encoder.FrameEncoder(
+        max_size=args.max_size if args.max_size is not None else d.max_size,
+        codec=args.codec or d.codec,
+        quality=args.quality if args.quality is not None else d.quality,
+        grayscale=args.grayscale or d.grayscale)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--seconds", type=float, default=5.0, help="preview run length")
+    parser.add_argument("--encode-iterations", type=int, default=50)
+    parser.add_argument("--codec", default=None, help="override encoder codec (jpeg/webp/png)")
+    parser.add_argument("--quality", type=int, default=None)
+    parser.add_argument("--max-size", type=int, default=None)
+    parser.add_argument("--grayscale", action="store_true")
+    parser.add_argument("--transitions", type=int, default=12)
+    parser.add_argument("--out", default=None, help="JSON output path")
+    args = parser.parse_args(argv)
+
+    from PyQt6.QtWidgets import QApplication
+
+    camera.init_camera(False)
+    app = QApplication.instance() or QApplication(sys.argv[:1])
+
+    results = {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "qt_platform": os.environ.get("QT_QPA_PLATFORM"),
+        "frame_size": [camera.width, camera.height],
+        "preview": bench_preview(app, args.seconds),
+        "ai_preprocess": bench_ai_preprocess(args.encode_iterations, make_encoder(args)),
+        "page_transitions": bench_transitions(app, args.transitions),
+        "peak_rss_kb": peak_rss_kb(),
+        "metrics": metrics.snapshot(),
+    }
+
+    out = args.out or os.path.join("bench_results", f"{results['commit']}.json")
+    os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+    with open(out, "w") as f:
+        json.dump(results, f, indent=2)
+    print(json.dumps(results, indent=2))
+    print(f"Results written to {out}")
+
+
+if __name__ == "__main__":
+    main()
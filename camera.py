@@ -1,30 +1,386 @@
 import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Optional
 import numpy
 
+import metrics
+import startup
+
 width = 320
 height = 320
 
 __camera = None
 __camera_inited = False
+__grabber = None
+__grabber_lock = threading.Lock()
+__init_thread = None
+__init_error = None
+__mock_source = None
+__mock_fps = None
+__mock_mode = None
+
+class FrameStats:
+    """Counters for frame allocations and copies, used to check the hot path.
+
+    `snapshot()` returns totals plus per-second rates since the previous call.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.allocations = 0
+        self.copies = 0
+        self.bytes_copied = 0
+        self._last = (time.monotonic(), 0, 0)
+
+    def count_alloc(self, n=1):
+        with self._lock:
+            self.allocations += n
+
+    def count_copy(self, nbytes):
+        with self._lock:
+            self.copies += 1
+            self.bytes_copied += nbytes
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            now = time.monotonic()
+            last_t, last_allocs, last_copies = self._last
+            dt = max(now - last_t, 1e-6)
+            snap = {
+                "allocations": self.allocations,
+                "copies": self.copies,
+                "bytes_copied": self.bytes_copied,
+                "allocations_per_sec": (self.allocations - last_allocs) / dt,
+                "copies_per_sec": (self.copies - last_copies) / dt,
+            }
+            self._last = (now, self.allocations, self.copies)
+        return snap
+
+
+stats = FrameStats()
+
+
+class FrameHandle:
+    """Ref-counted, read-only view of one pooled frame buffer.
+
+    `data` is a non-writable numpy view (H, W, 3) uint8. A handle obtained from
+    `get_latest()`/`wait_for_next()` is only borrowed: the grabber may recycle
+    it (new `seq`, new pixels) as soon as the next frame is published, so use
+    it only to peek at `seq`/`timestamp`. To read `data`, use `acquire_latest()`
+    and `release()` when done; calling `retain()` on a borrowed handle cannot
+    tell whether it was recycled in between.
+    """
+
+    __slots__ = ("pool", "index", "data", "seq", "timestamp", "refcount")
+
+    def __init__(self, pool, index, view):
+        self.pool = pool
+        self.index = index
+        self.data = view
+        self.seq = 0
+        self.timestamp = 0.0
+        self.refcount = 0
+
+    def retain(self) -> bool:
+        """Take a reference. Returns False if the buffer was already recycled."""
+        return self.pool._retain(self)
+
+    def release(self):
+        self.pool._release(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+class FramePool:
+    """Fixed set of preallocated, C-contiguous uint8 frame buffers.
+
+    Free buffers are reused in FIFO order, so a buffer that was just released
+    is the last one to be overwritten. If every buffer is held the pool grows
+    by one and the allocation is counted in `stats`.
+    """
+
+    def __init__(self, shape, count=4):
+        self.shape = tuple(shape)
+        self._lock = threading.Lock()
+        self._buffers = []
+        self._handles = []
+        self._free = deque()
+        for _ in range(count):
+            self._grow()
+
+    def _grow(self):
+        buf = numpy.empty(self.shape, dtype=numpy.uint8)  # C-contiguous
+        stats.count_alloc()
+        view = buf.view()
+        view.flags.writeable = False
+        handle = FrameHandle(self, len(self._buffers), view)
+        self._buffers.append(buf)
+        self._handles.append(handle)
+        self._free.append(handle.index)
+
+    def acquire(self):
+        """Return (writable buffer, handle) with refcount 1 for the producer."""
+        with self._lock:
+            if not self._free:
+                self._grow()
+            index = self._free.popleft()
+            handle = self._handles[index]
+            handle.refcount = 1
+        return self._buffers[index], handle
+
+    def _retain(self, handle) -> bool:
+        with self._lock:
+            if handle.refcount <= 0:
+                return False
+            handle.refcount += 1
+            return True
+
+    def _release(self, handle):
+        with self._lock:
+            if handle.refcount <= 0:
+                return
+            handle.refcount -= 1
+            if handle.refcount == 0:
+                self._free.append(handle.index)
+
+
+class FrameGrabber:
+    """Single capture thread that owns the camera and publishes the latest frame.
+
+    Each frame is captured straight into a buffer from a `FramePool` via the
+    camera's `capture_into(buf)`, so the hot path makes no allocations.
+    Publishing is a single reference assignment, so `get_latest()` never takes
+    a lock; the grabber keeps one reference on the published frame and drops
+    it when the next one is published.
+
+    The thread only pulls frames while at least one consumer is registered
+    (`add_consumer()`), so hidden pages cost no capture CPU. The grabber may
+    be created before its camera (consumers register while a background init
+    runs); it publishes nothing until `attach()`.
+    """
+
+    POOL_SIZE = 4
+    INTERVAL_SMOOTHING = 0.1
+
+    def __init__(self, cam=None):
+        self.cam = None
+        self.pool = None
+        self._latest = None  # FrameHandle, replaced atomically
+        self._cond = threading.Condition()
+        self._running = False
+        self._thread = None
+        self._consumers = 0
+        self._consumers_lock = threading.Lock()
+        self._wake = threading.Event()
+        self.frame_interval = 0.0  # smoothed seconds between captured frames
+        self._capture_hist = metrics.histogram("camera.capture")
+        self._interval_gauge = metrics.gauge("camera.frame_interval_ms")
+        if cam is not None:
+            self.attach(cam)
+
+    def attach(self, cam):
+        """Set the camera to capture from (once, before `start()`)."""
+        self.pool = FramePool((cam.height, cam.width, 3), self.POOL_SIZE)
+        self.cam = cam
+
+    def add_consumer(self):
+        with self._consumers_lock:
+            self._consumers += 1
+            self._wake.set()
+
+    def remove_consumer(self):
+        with self._consumers_lock:
+            self._consumers = max(0, self._consumers - 1)
+            if self._consumers == 0:
+                self._wake.clear()
+
+    def start(self):
+        if self._running or self.cam is None:
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="camera-capture", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._running = False
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+            self._thread = None
+
+    def _run(self):
+        seq = 0
+        last_ts = None
+        while self._running:
+            if not self._wake.is_set():
+                # 没有消费者：暂停取帧，恢复后重新计算帧间隔
+                self._wake.wait()
+                last_ts = None
+                continue
+            buf, handle = self.pool.acquire()
+            t0 = time.perf_counter()
+            try:
+                self.cam.capture_into(buf)
+            except Exception as e:
+                handle.release()
+                metrics.counter("camera.errors").inc()
+                print(f"Camera capture error: {e}")
+                time.sleep(0.1)
+                continue
+
+            self._capture_hist.observe(time.perf_counter() - t0)
+            seq += 1
+            handle.seq = seq
+            handle.timestamp = time.monotonic()
+            if last_ts is not None:
+                dt = handle.timestamp - last_ts
+                if self.frame_interval == 0.0:
+                    self.frame_interval = dt
+                else:
+                    self.frame_interval += (dt - self.frame_interval) * self.INTERVAL_SMOOTHING
+                self._interval_gauge.set(self.frame_interval * 1000.0)
+            last_ts = handle.timestamp
+            old = self._latest
+            self._latest = handle
+            if old is not None:
+                old.release()
+            with self._cond:
+                self._cond.notify_all()
+
+    def get_latest(self) -> Optional[FrameHandle]:
+        """Return the newest frame without blocking, or None before the first frame.
+
+        The handle is borrowed and only valid until the next publish; read
+        `data` through `acquire_latest()` instead.
+        """
+        return self._latest
+
+    def acquire_latest(self) -> Optional[FrameHandle]:
+        """Like `get_latest()` but returns a retained handle the caller must release."""
+        while True:
+            frame = self._latest
+            if frame is None:
+                return None
+            seq = frame.seq
+            if not frame.retain():
+                continue
+            # 句柄可能在读取与 retain 之间被回收并重新发布（ABA）：
+            # 只有仍是当前帧且序号未变时，引用才指向我们读到的那一帧
+            if frame is self._latest and frame.seq == seq:
+                return frame
+            frame.release()
+
+    def wait_for_next(self, after_seq: int, timeout: Optional[float] = None) -> Optional[FrameHandle]:
+        """Block until a frame newer than `after_seq` is published.
+
+        Returns None if `timeout` seconds pass without a new frame.
+        """
+        frame = self._latest
+        if frame is not None and frame.seq > after_seq:
+            return frame
+        with self._cond:
+            ok = self._cond.wait_for(
+                lambda: self._latest is not None and self._latest.seq > after_seq,
+                timeout=timeout)
+        return self._latest if ok else None
+
 
 def get_camera():
-    global __camera, __camera_inited
-    if not __camera_inited:
+    """The camera; None while a background init runs or after it failed.
+
+    Never blocks on a background init (callers run on the GUI thread) and
+    never replaces a failed one with the mock camera.
+    """
+    if not __camera_inited and __init_thread is None:
         print("Warning! camera accessed before inited")
         init_camera(False)
     return __camera
 
+def _grabber() -> FrameGrabber:
+    global __grabber
+    with __grabber_lock:
+        if __grabber is None:
+            __grabber = FrameGrabber()
+        return __grabber
+
+def get_grabber() -> FrameGrabber:
+    """The frame grabber; it publishes no frames until the camera is ready."""
+    get_camera()
+    return _grabber()
+
+def get_latest() -> Optional[FrameHandle]:
+    """Latest published frame (borrowed, see FrameHandle); never blocks on camera I/O."""
+    return get_grabber().get_latest()
+
+def acquire_latest() -> Optional[FrameHandle]:
+    """Latest frame with a reference taken; call `release()` when done."""
+    return get_grabber().acquire_latest()
+
+def add_consumer():
+    """Register interest in frames; capture runs only while consumers exist."""
+    get_grabber().add_consumer()
+
+def remove_consumer():
+    get_grabber().remove_consumer()
+
+@contextmanager
+def consumer():
+    """Keep the capture thread running for the duration of a `with` block."""
+    add_consumer()
+    try:
+        yield
+    finally:
+        remove_consumer()
+
+def wait_for_next(after_seq: int = 0, timeout: Optional[float] = None) -> Optional[FrameHandle]:
+    """Wait for a frame with seq > after_seq (see FrameGrabber.wait_for_next)."""
+    return get_grabber().wait_for_next(after_seq, timeout)
+
+def _init_in_background(real):
+    global __init_error
+    try:
+        init_camera(real)
+    except Exception as e:
+        __init_error = e
+        metrics.counter("camera.init_failures").inc()
+        raise
+
+def init_camera_async(real = False):
+    """Run init_camera(real) on a background thread.
+
+    Until it finishes, consumers can register but no frames are published;
+    poll `is_ready()` / `init_error()` for the outcome.
+    """
+    global __init_thread
+    __init_thread = startup.run_in_background("camera", _init_in_background, real)
+    return __init_thread
+
+def is_ready() -> bool:
+    return __camera_inited
+
+def init_error() -> Optional[Exception]:
+    """Why the background init failed (the camera is unavailable), or None."""
+    return __init_error
+
 def init_camera(real = False):
     global __camera, __camera_inited
     if real:
-        from picamera2 import Picamera2
+        from picamera2 import Picamera2, MappedArray
         from libcamera import Transform
-        import cv2
         import numpy as np
-        
+
         class Camera:
 
             def __init__(self):
+                self.width = width
+                self.height = height
                 self.camera = Picamera2()
                 config = self.camera.create_video_configuration(
                         main={"size": (width, height)},
@@ -32,54 +388,82 @@ def init_camera(real = False):
                 self.camera.configure(config)
                 self.camera.start()
 
+            def capture_into(self, buf):
+                """把传感器帧直接拷贝进调用方提供的 (H, W, 3) uint8 缓冲区。
+
+                请求缓冲区是 DMA 内存、会被相机回收，所以这里的一次拷贝不可避免；
+                去掉了原来的 RGB->BGR->RGB 与 UMat 往返。
+                """
+                with self.camera.captured_request() as request:
+                    with MappedArray(request, "main") as m:
+                        src = m.array[:self.height, :self.width, :3]
+                        np.copyto(buf, src)
+                stats.count_copy(buf.nbytes)
+                return buf
+
             def capture_Image(self):
-                frame = self.camera.capture_array()  # 获取numpy数组 (RGB)
-                # 使用OpenCV转换色彩空间并确保内存连续
-                frame_bgr = cv2.cvtColor(frame, cv2.COLOR_RGB2BGR)
-                frame_rgb = cv2.cvtColor(frame_bgr, cv2.COLOR_BGR2RGB)
-                frame_rgb = cv2.UMat(frame_rgb).get()  # 确保内存连续
-                return frame_rgb
+                return self.capture_raw()
 
             def capture_raw(self):
-                """快速获取原始RGB帧（不进行额外颜色空间转换）。"""
-                frame = self.camera.capture_array()  # RGB
-                if not frame.flags['C_CONTIGUOUS']:
-                    frame = np.ascontiguousarray(frame)
-                return frame
+                """快速获取原始RGB帧（新分配数组，热路径请使用 capture_into）。"""
+                buf = np.empty((self.height, self.width, 3), dtype=np.uint8)
+                stats.count_alloc()
+                return self.capture_into(buf)
         __camera = Camera()
     else:
-        from PIL import Image
-        # Hardcoded mock image path
-        mock_path = os.path.join(".", "MockCam", "test1.png")
-        
+        import mock_source
+        source = (__mock_source or os.environ.get("CAMERA_MOCK_SOURCE")
+                  or os.environ.get("CAMERA_MOCK_IMAGE")
+                  or os.path.join(os.path.dirname(os.path.abspath(__file__)), "MockCam"))
+        fps = __mock_fps or (float(os.environ["CAMERA_MOCK_FPS"]) if os.environ.get("CAMERA_MOCK_FPS") else None)
+        mode = __mock_mode or os.environ.get("CAMERA_MOCK_MODE", mock_source.MODE_LOOP)
+
         class MockCamera:
-            def __init__(self, width=320, height=320):
+            def __init__(self, width=320, height=320, fps=30, source=None,
+                         playback_fps=None, mode=mock_source.MODE_LOOP):
                 self.width = width
                 self.height = height
-                # Try to load hardcoded mock image, fallback to random
-                if Image is not None and os.path.isfile(mock_path):
-                    try:
-                        img = Image.open(mock_path).convert("RGB")
-                        img = img.resize((self.width, self.height))
-                        self.mock_frame = numpy.array(img, dtype=numpy.uint8)
-                        print(f"MockCamera: loaded mock image from {mock_path}")
-                    except Exception as e:
-                        print(f"MockCamera: failed to load, using random: {e}")
-                        numpy.random.seed(42)
-                        self.mock_frame = numpy.random.randint(0, 256, (height, width, 3), dtype=numpy.uint8)
-                else:
+                # 模拟传感器帧间隔，使采集线程的节奏与真实相机一致
+                self.frame_interval = 1.0 / fps
+                self._next_frame_time = 0.0
+                self.source = None
+                try:
+                    self.source = mock_source.MockSource(source, width, height, fps=playback_fps, mode=mode)
+                    print(f"MockCamera: playing {len(self.source)} frames from {source} "
+                          f"at {self.source.fps} fps ({mode})")
+                except Exception as e:
                     # Fallback to random noise
+                    print(f"MockCamera: failed to load {source}, using random: {e}")
                     numpy.random.seed(42)
                     self.mock_frame = numpy.random.randint(0, 256, (height, width, 3), dtype=numpy.uint8)
 
+            def _wait_frame(self):
+                now = time.monotonic()
+                if self._next_frame_time > now:
+                    time.sleep(self._next_frame_time - now)
+                    now = self._next_frame_time
+                self._next_frame_time = now + self.frame_interval
+
+            def capture_into(self, buf):
+                """把当前模拟帧拷贝进调用方提供的缓冲区（无分配）。"""
+                self._wait_frame()
+                frame = self.source.current() if self.source is not None else self.mock_frame
+                numpy.copyto(buf, frame)
+                stats.count_copy(buf.nbytes)
+                return buf
+
             def capture_Image(self):
-                """返回固定的随机RGB数组"""
-                return self.mock_frame.copy()
+                return self.capture_raw()
 
             def capture_raw(self):
-                """返回固定的随机RGB数组（快速路径）。"""
-                return self.mock_frame.copy()
-        __camera = MockCamera()
+                """返回当前模拟帧（新分配数组）。"""
+                buf = numpy.empty((self.height, self.width, 3), dtype=numpy.uint8)
+                stats.count_alloc()
+                return self.capture_into(buf)
+        __camera = MockCamera(width, height, source=source, playback_fps=fps, mode=mode)
+    grabber = _grabber()
+    grabber.attach(__camera)
+    grabber.start()
     __camera_inited = True
 
 def set_mock_image(path: str):
@@ -88,5 +472,16 @@ def set_mock_image(path: str):
     - Call before first access to `get_camera()` or `init_camera(False)`.
     - Alternatively, set environment `CAMERA_MOCK_IMAGE`.
     """
-    global __mock_image_path
-    __mock_image_path = path
+    set_mock_source(path)
+
+def set_mock_source(source, fps: Optional[float] = None, mode: Optional[str] = None):
+    """Set the mock playback source: a directory, image list, .npy/.raw frame file or video.
+
+    - Call before first access to `get_camera()` or `init_camera(False)`.
+    - Alternatively, set environment `CAMERA_MOCK_SOURCE`, `CAMERA_MOCK_FPS`
+      and `CAMERA_MOCK_MODE` (loop / pingpong / once).
+    """
+    global __mock_source, __mock_fps, __mock_mode
+    __mock_source = source
+    __mock_fps = fps
+    __mock_mode = mode
@@ -0,0 +1,135 @@
+"""Image encoder for vision uploads.
+
+Encodes a numpy RGB frame (e.g. a pooled camera buffer) straight to
+JPEG/WebP/PNG bytes using the fastest backend available:
+simplejpeg (libjpeg-turbo) -> OpenCV -> PIL. Frames are only ever
+downscaled to `max_size`, never upscaled.
+
+Defaults can be overridden in config.py with ENCODE_MAX_SIZE,
+ENCODE_CODEC, ENCODE_QUALITY and ENCODE_GRAYSCALE.
+"""
+import io
+import time
+from typing import Optional
+import numpy
+
+try:
+    import simplejpeg
+except Exception:
+    simplejpeg = None
+
+try:
+    import cv2
+except Exception:
+    cv2 = None
+
+try:
+    from PIL import Image
+except Exception:
+    Image = None
+
+MIME_TYPES = {"jpeg": "image/jpeg", "webp": "image/webp", "png": "image/png"}
+
+
+def _config(name, default):
+    try:
+        import config  # type: ignore
+        return getattr(config, name, default)
+    except Exception:
+        return default
+
+
+class FrameEncoder:
+    """Resize (down only), optionally grayscale, and encode a frame.
+
+    - max_size: longest side in pixels after resizing (None keeps the size)
+    - codec: 'jpeg', 'webp' or 'png'
+    - quality: 1-100 for lossy codecs
+    - grayscale: send a single-channel image (smaller, often enough for text/objects)
+    - backend: 'simplejpeg', 'cv2' or 'pil'; None picks the fastest available
+    """
+
+    def __init__(self, max_size: Optional[int] = 512, codec: str = "jpeg", quality: int = 80,
+                 grayscale: bool = False, backend: Optional[str] = None):
+        if codec not in MIME_TYPES:
+            raise ValueError(f"unsupported codec {codec!r}")
+        self.max_size = max_size
+        self.codec = codec
+        self.quality = quality
+        self.grayscale = grayscale
+        self.backend = backend or self._pick_backend()
+
+    @property
+    def mime_type(self):
+        return MIME_TYPES[self.codec]
+
+    def _pick_backend(self):
+        if self.codec == "jpeg" and simplejpeg is not None:
+            return "simplejpeg"
+        if cv2 is not None:
+            return "cv2"
+        return "pil"
+
+    def _resize(self, frame):
+        h, w = frame.shape[:2]
+        if not self.max_size or max(h, w) <= self.max_size:
+            return frame
+        scale = self.max_size / max(h, w)
+        size = (max(1, round(w * scale)), max(1, round(h * scale)))
+        if cv2 is not None:
+            return cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+        return numpy.asarray(Image.fromarray(frame).resize(size, Image.BILINEAR))
+
+    @staticmethod
+    def _to_gray(frame):
+        if cv2 is not None:
+            return cv2.cvtColor(frame, cv2.COLOR_RGB2GRAY)
+        # ITU-R 601 luma with integer weights (sum 256)
+        f = frame.astype(numpy.uint16)
+        return ((f[..., 0] * 77 + f[..., 1] * 150 + f[..., 2] * 29) >> 8).astype(numpy.uint8)
+
+    def _encode(self, frame) -> bytes:
+        gray = frame.ndim == 2
+        if self.backend == "simplejpeg":
+            if gray:
+                frame = frame[..., None]
+            return simplejpeg.encode_jpeg(numpy.ascontiguousarray(frame), quality=self.quality,
+                                          colorspace="GRAY" if gray else "RGB")
+        if self.backend == "cv2":
+            img = frame if gray else cv2.cvtColor(frame, cv2.COLOR_RGB2BGR)
+            if self.codec == "jpeg":
+                params = [cv2.IMWRITE_JPEG_QUALITY, self.quality]
+            elif self.codec == "webp":
+                params = [cv2.IMWRITE_WEBP_QUALITY, self.quality]
+            else:
+                params = []
+            ok, buf = cv2.imencode("." + self.codec, img, params)
+            if not ok:
+                raise RuntimeError(f"cv2 failed to encode {self.codec}")
+            return buf.tobytes()
+        buffer = io.BytesIO()
+        Image.fromarray(frame).save(buffer, format=self.codec.upper(), quality=self.quality)
+        return buffer.getvalue()
+
+    def encode(self, frame_rgb, timings: Optional[dict] = None) -> bytes:
+        """Encode an (H, W, 3) uint8 RGB array. Fills `timings` with
+        'resize' and 'encode' seconds and 'bytes' when given."""
+        t0 = time.perf_counter()
+        frame = self._resize(frame_rgb)
+        if self.grayscale:
+            frame = self._to_gray(frame)
+        t1 = time.perf_counter()
+        data = self._encode(frame)
+        if timings is not None:
+            timings["resize"] = t1 - t0
+            timings["encode"] = time.perf_counter() - t1
+            timings["bytes"] = len(data)
+        return data
+
+
+default_encoder = FrameEncoder(
+    max_size=_config("ENCODE_MAX_SIZE", 512),
+    codec=_config("ENCODE_CODEC", "jpeg"),
+    quality=_config("ENCODE_QUALITY", 80),
+    grayscale=_config("ENCODE_GRAYSCALE", False),
+)
@@ -7,6 +7,17 @@ sudo systemctl daemon-reload
 # 启用服务（开机自启）
 sudo systemctl enable pi_holo_cam.service
 
+# 以下缓存在启动服务之前生成，服务不会在冷缓存上启动，也不会与预热任务争抢 CPU 与网络
+
+# 预先合成系统提示语音（写入 TTS 缓存，播放时无需联网）
+python3 tts_cache.py --warm || true
+
+# 预先生成按显示尺寸缩放好的图标与地图像素缓存
+QT_QPA_PLATFORM=offscreen python3 -m qt.asset_cache --warm || true
+
+# 预先生成地图瓦片金字塔（首次打开地图页时无需切片）
+python3 map_tiles.py --warm || true
+
 # 启动服务
 sudo systemctl start pi_holo_cam.service
 
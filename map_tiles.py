@@ -0,0 +1,231 @@
+"""Tile pyramids for large map images.
+
+A source map (PNG/JPEG, any size) is decoded once and sliced into
+TILE_SIZE x TILE_SIZE tiles at every zoom level: level 0 is full
+resolution, each further level is a 2x2 box-filtered half of the previous
+one, down to the first level that fits in a single tile. Each level is a
+`.npy` array of shape (rows, cols, TILE_SIZE, TILE_SIZE, 4) under
+CACHE_DIR/<key>/, where the key covers the source path, size, mtime and
+tile size; building a new pyramid for a source removes the ones built
+from earlier versions of it. Pixels are stored as BGRA, i.e. the byte order of
+QImage.Format_RGB32 on little-endian machines, so a tile is copied into a
+QImage without any conversion.
+
+The levels are opened with mmap, so a viewer only ever reads the tiles it
+shows; nothing is decoded at run time.
+
+Pre-build the app's maps (run by install.sh):
+    python3 map_tiles.py --warm
+    python3 map_tiles.py campus.png other.jpg
+"""
+import os
+import json
+import shutil
+import hashlib
+import tempfile
+import threading
+from typing import List, Optional, Tuple
+import numpy
+
+try:
+    from PIL import Image
+except Exception:
+    Image = None
+
+import metrics
+
+TILE_SIZE = 256
+FORMAT_VERSION = 1
+BACKGROUND = (0, 0, 0, 255)  # BGRA; fills the tiles past the right/bottom edge
+
+CACHE_DIR = os.environ.get(
+    "MAP_TILE_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache", "map_tiles"))
+MAP_SOURCES = [os.path.join(os.path.dirname(os.path.abspath(__file__)), "qt", "resources", "icons", "uoft.png")]
+try:
+    import config  # type: ignore
+    MAP_SOURCES = getattr(config, "MAP_SOURCES", MAP_SOURCES)
+except Exception:
+    pass
+
+_build_lock = threading.Lock()
+
+
+def _cache_key(source, tile_size) -> str:
+    st = os.stat(source)
+    h = hashlib.sha1()
+    h.update(f"{os.path.abspath(source)}:{st.st_size}:{st.st_mtime_ns};".encode())
+    h.update(f"{tile_size}:v{FORMAT_VERSION}".encode())
+    return h.hexdigest()[:16]
+
+
+def _decode(source):
+    """(H, W, 4) uint8 BGRA pixels of `source`."""
+    if Image is None:
+        raise RuntimeError("Pillow is required to build map tiles")
+    with Image.open(source) as img:
+        rgb = numpy.asarray(img.convert("RGB"), dtype=numpy.uint8)
+    out = numpy.empty(rgb.shape[:2] + (4,), dtype=numpy.uint8)
+    out[..., 0] = rgb[..., 2]
+    out[..., 1] = rgb[..., 1]
+    out[..., 2] = rgb[..., 0]
+    out[..., 3] = 255
+    return out
+
+
+def _half(pixels):
+    """2x2 box filter; odd edges are padded by repeating the last row/column."""
+    h, w = pixels.shape[:2]
+    if h % 2 or w % 2:
+        pixels = numpy.pad(pixels, ((0, h % 2), (0, w % 2), (0, 0)), mode="edge")
+    acc = pixels[0::2, 0::2].astype(numpy.uint16)
+    acc += pixels[1::2, 0::2]
+    acc += pixels[0::2, 1::2]
+    acc += pixels[1::2, 1::2]
+    acc += 2
+    return (acc >> 2).astype(numpy.uint8)
+
+
+def _write_level(path, pixels, tile_size):
+    h, w = pixels.shape[:2]
+    rows = -(-h // tile_size)
+    cols = -(-w // tile_size)
+    out = numpy.lib.format.open_memmap(path, mode="w+", dtype=numpy.uint8,
+                                       shape=(rows, cols, tile_size, tile_size, 4))
+    out[...] = BACKGROUND
+    # 按行写入：每行瓦片在文件中连续，读取单个瓦片也只触及一段连续页
+    for r in range(rows):
+        band = pixels[r * tile_size:(r + 1) * tile_size]
+        for c in range(cols):
+            block = band[:, c * tile_size:(c + 1) * tile_size]
+            out[r, c, :block.shape[0], :block.shape[1]] = block
+    out.flush()
+    del out
+    return cols, rows
+
+
+def build_pyramid(source, directory, tile_size=TILE_SIZE):
+    """Slice `source` into a tile pyramid in `directory` (written atomically)."""
+    parent = os.path.dirname(directory)
+    os.makedirs(parent, exist_ok=True)
+    tmp = tempfile.mkdtemp(dir=parent, suffix=".tmp")
+    try:
+        with metrics.timer("map.tiles.build"):
+            pixels = _decode(source)
+            levels = []
+            while True:
+                h, w = pixels.shape[:2]
+                cols, rows = _write_level(os.path.join(tmp, f"level{len(levels)}.npy"), pixels, tile_size)
+                levels.append({"width": w, "height": h, "cols": cols, "rows": rows})
+                if max(w, h) <= tile_size:
+                    break
+                pixels = _half(pixels)
+        meta = {"version": FORMAT_VERSION, "source": os.path.abspath(source),
+                "tile_size": tile_size, "levels": levels}
+        with open(os.path.join(tmp, "meta.json"), "w") as f:
+            json.dump(meta, f, indent=2)
+        try:
+            os.replace(tmp, directory)
+        except OSError:
+            # 另一个进程已生成同一金字塔
+            if not os.path.isfile(os.path.join(directory, "meta.json")):
+                raise
+            shutil.rmtree(tmp, ignore_errors=True)
+    except BaseException:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+    print(f"Map tiles: {os.path.basename(source)} -> {len(levels)} levels of {tile_size}px tiles")
+
+
+class TilePyramid:
+    """Read-only view of a pyramid built by `build_pyramid`."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        with open(os.path.join(directory, "meta.json")) as f:
+            meta = json.load(f)
+        if meta.get("version") != FORMAT_VERSION:
+            raise ValueError(f"unsupported map tile format in {directory}")
+        self.source = meta["source"]
+        self.tile_size = meta["tile_size"]
+        self.levels = meta["levels"]
+        self._arrays = [None] * len(self.levels)
+
+    @property
+    def width(self) -> int:
+        return self.levels[0]["width"]
+
+    @property
+    def height(self) -> int:
+        return self.levels[0]["height"]
+
+    @property
+    def level_count(self) -> int:
+        return len(self.levels)
+
+    def grid(self, level) -> Tuple[int, int]:
+        """(cols, rows) of tiles at `level`."""
+        info = self.levels[level]
+        return info["cols"], info["rows"]
+
+    def _level(self, level):
+        arr = self._arrays[level]
+        if arr is None:
+            arr = self._arrays[level] = numpy.load(
+                os.path.join(self.directory, f"level{level}.npy"), mmap_mode="r")
+        return arr
+
+    def tile(self, level, col, row) -> Optional[numpy.ndarray]:
+        """(TILE_SIZE, TILE_SIZE, 4) BGRA view into the memmap, or None outside the grid."""
+        if not 0 <= level < len(self.levels):
+            return None
+        cols, rows = self.grid(level)
+        if not (0 <= col < cols and 0 <= row < rows):
+            return None
+        return self._level(level)[row, col]
+
+
+def _purge_superseded(source, directory):
+    # 源图改动（mtime/大小变化）或换了瓦片尺寸后，旧金字塔不会再被打开
+    source = os.path.abspath(source)
+    parent = os.path.dirname(directory)
+    for name in os.listdir(parent):
+        path = os.path.join(parent, name)
+        if path == directory or name.endswith(".tmp"):
+            continue
+        try:
+            with open(os.path.join(path, "meta.json")) as f:
+                if json.load(f).get("source") != source:
+                    continue
+        except (OSError, ValueError):
+            continue
+        shutil.rmtree(path, ignore_errors=True)
+
+
+def open_pyramid(source, tile_size=TILE_SIZE, cache_dir=CACHE_DIR) -> TilePyramid:
+    """The tile pyramid for `source`, building it first if it is not cached."""
+    directory = os.path.join(cache_dir, _cache_key(source, tile_size))
+    with _build_lock:
+        if not os.path.isfile(os.path.join(directory, "meta.json")):
+            build_pyramid(source, directory, tile_size)
+            _purge_superseded(source, directory)
+    return TilePyramid(directory)
+
+
+def warm(sources: Optional[List[str]] = None):
+    """Build pyramids for `sources` (default: MAP_SOURCES)."""
+    for source in (sources or MAP_SOURCES):
+        try:
+            pyramid = open_pyramid(source)
+            print(f"Map tiles: {source} ({pyramid.width}x{pyramid.height}, {pyramid.level_count} levels)")
+        except Exception as e:
+            print(f"Map tiles: failed to build {source}: {e}")
+
+
+if __name__ == "__main__":
+    import sys
+
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    if "--warm" in sys.argv or args:
+        warm(args or None)
+    else:
+        print(__doc__)
@@ -0,0 +1,215 @@
+"""Lightweight in-process metrics: counters, gauges and fixed-bucket histograms.
+
+Cheap enough for the 30 fps preview loop: recording a value is a dict lookup,
+a short lock and a bisect. Durations are recorded in seconds and reported in
+milliseconds.
+
+    import metrics
+    with metrics.timer("ai.vision"):
+        ...
+    metrics.counter("input.keys").inc()
+    metrics.dump("metrics.json")
+"""
+import json
+import sys
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+# Histogram bucket upper bounds in milliseconds (last bucket is +inf)
+DEFAULT_BUCKETS_MS = (1, 2, 5, 10, 20, 33, 50, 100, 200, 500, 1000, 2000, 5000, 10000, 20000)
+
+
+class Counter:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.value = 0
+
+    def inc(self, n=1):
+        with self._lock:
+            self.value += n
+
+    def snapshot(self):
+        return self.value
+
+
+class Gauge:
+    def __init__(self):
+        self.value = 0.0
+
+    def set(self, value):
+        self.value = value
+
+    def snapshot(self):
+        return self.value
+
+
+class Histogram:
+    def __init__(self, buckets_ms=DEFAULT_BUCKETS_MS):
+        self._lock = threading.Lock()
+        self.bounds = tuple(buckets_ms)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.min = float("inf")
+        self.max = 0.0
+
+    def observe(self, seconds):
+        ms = seconds * 1000.0
+        i = bisect_left(self.bounds, ms)
+        with self._lock:
+            self.counts[i] += 1
+            self.count += 1
+            self.total += ms
+            if ms < self.min:
+                self.min = ms
+            if ms > self.max:
+                self.max = ms
+
+    def _quantile(self, q):
+        # 取第一个累计计数达到 q 的桶上限（最后一个桶用 max）
+        target = q * self.count
+        acc = 0
+        for i, c in enumerate(self.counts):
+            acc += c
+            if acc >= target and c:
+                return self.bounds[i] if i < len(self.bounds) else self.max
+        return self.max
+
+    def snapshot(self):
+        with self._lock:
+            if not self.count:
+                return {"count": 0}
+            return {
+                "count": self.count,
+                "mean_ms": self.total / self.count,
+                "min_ms": self.min,
+                "max_ms": self.max,
+                "p50_ms": self._quantile(0.5),
+                "p90_ms": self._quantile(0.9),
+                "p99_ms": self._quantile(0.99),
+                "buckets_ms": {("+inf" if i == len(self.bounds) else str(self.bounds[i])): c
+                               for i, c in enumerate(self.counts) if c},
+            }
+
+
+class Registry:
+    def __init__(self):
+        # 可重入：SIGUSR1 处理函数可能在主线程持有锁（_get 中）时调用 snapshot()
+        self._lock = threading.RLock()
+        self._metrics = {}
+        self.started = time.time()
+
+    def _get(self, name, cls):
+        m = self._metrics.get(name)
+        if m is None:
+            with self._lock:
+                m = self._metrics.get(name)
+                if m is None:
+                    m = cls()
+                    self._metrics[name] = m
+        if type(m) is not cls:
+            raise TypeError(f"metric {name!r} is a {type(m).__name__}, not a {cls.__name__}")
+        return m
+
+    def counter(self, name) -> Counter:
+        return self._get(name, Counter)
+
+    def gauge(self, name) -> Gauge:
+        return self._get(name, Gauge)
+
+    def histogram(self, name) -> Histogram:
+        return self._get(name, Histogram)
+
+    def snapshot(self) -> dict:
+        out = {"uptime_s": time.time() - self.started,
+               "counters": {}, "gauges": {}, "histograms": {}}
+        # 其他线程可能正在注册新指标，先在锁内复制
+        with self._lock:
+            items = sorted(self._metrics.items())
+        for name, m in items:
+            kind = ("counters" if isinstance(m, Counter)
+                    else "gauges" if isinstance(m, Gauge) else "histograms")
+            out[kind][name] = m.snapshot()
+        return out
+
+    def reset(self):
+        with self._lock:
+            self._metrics.clear()
+            self.started = time.time()
+
+
+registry = Registry()
+
+
+def counter(name) -> Counter:
+    return registry.counter(name)
+
+
+def gauge(name) -> Gauge:
+    return registry.gauge(name)
+
+
+def histogram(name) -> Histogram:
+    return registry.histogram(name)
+
+
+def observe(name, seconds):
+    registry.histogram(name).observe(seconds)
+
+
+@contextmanager
+def timer(name):
+    """Record the duration of a `with` block into histogram `name`."""
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        registry.histogram(name).observe(time.perf_counter() - t0)
+
+
+def snapshot() -> dict:
+    return registry.snapshot()
+
+
+def snapshot_json(indent=2) -> str:
+    return json.dumps(registry.snapshot(), indent=indent)
+
+
+def dump(path="metrics.json"):
+    """Write the current snapshot to `path` as JSON and return the path."""
+    with open(path, "w") as f:
+        f.write(snapshot_json())
+    return path
+
+
+def defer_from_signal(fn):
+    """Run `fn` soon, outside the signal handler that calls this.
+
+    A Python signal handler runs on the main thread between two bytecodes,
+    possibly while that thread holds a metric or trace lock, so it must not
+    take those locks itself. Under Qt, `fn` runs from the event loop once the
+    handler has returned (`gui.run`'s signal wake-up gets it there while the
+    app is idle); without a Qt application it runs on a short-lived thread.
+    """
+    qt = sys.modules.get("PyQt6.QtCore")
+    if qt is not None and qt.QCoreApplication.instance() is not None:
+        qt.QTimer.singleShot(0, fn)
+    else:
+        threading.Thread(target=fn, name="signal-dump", daemon=True).start()
+
+
+def install_dump_signal(path="metrics.json"):
+    """Dump a snapshot to `path` whenever the process receives SIGUSR1.
+
+    The handler only schedules the dump (see `defer_from_signal`).
+    """
+    import signal
+    if not hasattr(signal, "SIGUSR1"):
+        return
+
+    def _dump():
+        print(f"Metrics written to {dump(path)}")
+
+    signal.signal(signal.SIGUSR1, lambda s, f: defer_from_signal(_dump))
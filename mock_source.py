@@ -0,0 +1,192 @@
+"""Mock camera frame sources for PC simulation.
+
+A source can be a directory of images (e.g. MockCam/test1..test3.png), a list
+of image paths, a `.npy` array of frames (N, H, W, 3), a raw RGB file of
+back-to-back H*W*3 frames, or a video file (needs opencv). Frames are decoded
+and resized once into a memory-mapped uint8 cache under `MockCam/.cache`, so
+playback only indexes into the memmap.
+"""
+import os
+import hashlib
+import struct
+import time
+from typing import List, Optional, Sequence, Union
+import numpy
+
+try:
+    from PIL import Image
+except Exception:
+    Image = None
+
+try:
+    import cv2
+except Exception:
+    cv2 = None  # Video sources are unavailable without opencv
+
+IMAGE_EXTS = (".png", ".jpg", ".jpeg", ".bmp")
+VIDEO_EXTS = (".mp4", ".avi", ".mov", ".mkv", ".h264")
+RAW_EXTS = (".raw", ".rgb")
+
+MODE_LOOP = "loop"
+MODE_PINGPONG = "pingpong"
+MODE_ONCE = "once"
+
+NPY_MAGIC = b"\x93NUMPY\x01\x00"
+NPY_HEADER_BYTES = 128  # 64 字节对齐
+
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "MockCam", ".cache")
+
+
+def _resolve_paths(source) -> List[str]:
+    if isinstance(source, (list, tuple)):
+        return [str(p) for p in source]
+    source = str(source)
+    if os.path.isdir(source):
+        names = sorted(n for n in os.listdir(source) if n.lower().endswith(IMAGE_EXTS))
+        return [os.path.join(source, n) for n in names]
+    return [source]
+
+
+def _cache_key(paths: Sequence[str], width: int, height: int) -> str:
+    h = hashlib.sha1()
+    for p in paths:
+        st = os.stat(p)
+        h.update(f"{os.path.abspath(p)}:{st.st_size}:{st.st_mtime_ns};".encode())
+    h.update(f"{width}x{height}".encode())
+    return h.hexdigest()[:16]
+
+
+def _resize(frame, width: int, height: int):
+    if frame.shape[0] == height and frame.shape[1] == width:
+        return frame
+    if cv2 is not None:
+        return cv2.resize(frame, (width, height), interpolation=cv2.INTER_AREA)
+    return numpy.asarray(Image.fromarray(frame).resize((width, height)))
+
+
+def _decode_frames(paths: Sequence[str], width: int, height: int):
+    """Yield (H, W, 3) uint8 RGB frames for the given source paths."""
+    for path in paths:
+        ext = os.path.splitext(path)[1].lower()
+        if ext == ".npy":
+            arr = numpy.load(path, mmap_mode="r")
+            if arr.ndim == 3:
+                arr = arr[None]
+            for f in arr:
+                yield _resize(numpy.ascontiguousarray(f[..., :3], dtype=numpy.uint8), width, height)
+        elif ext in RAW_EXTS:
+            # 原始文件按相机分辨率逐帧存放
+            arr = numpy.memmap(path, dtype=numpy.uint8, mode="r")
+            frame_bytes = width * height * 3
+            for i in range(arr.size // frame_bytes):
+                yield arr[i * frame_bytes:(i + 1) * frame_bytes].reshape(height, width, 3)
+        elif ext in VIDEO_EXTS:
+            if cv2 is None:
+                raise RuntimeError("opencv is required for video mock sources")
+            cap = cv2.VideoCapture(path)
+            try:
+                while True:
+                    ok, bgr = cap.read()
+                    if not ok:
+                        break
+                    yield _resize(cv2.cvtColor(bgr, cv2.COLOR_BGR2RGB), width, height)
+            finally:
+                cap.release()
+        else:
+            img = Image.open(path).convert("RGB")
+            img = img.resize((width, height))
+            yield numpy.asarray(img, dtype=numpy.uint8)
+
+
+def _npy_header(count: int, width: int, height: int) -> bytes:
+    """Fixed-size .npy (v1.0) header for a (count, height, width, 3) uint8 array.
+
+    The size does not depend on `count`, so the header can be rewritten in
+    place once the number of streamed frames is known.
+    """
+    info = "{'descr': '|u1', 'fortran_order': False, 'shape': (%d, %d, %d, 3), }" % (count, height, width)
+    body = info.encode("latin1")
+    pad = NPY_HEADER_BYTES - len(NPY_MAGIC) - 2 - len(body) - 1
+    if pad < 0:
+        raise ValueError("frame shape too large for the .npy header")
+    return NPY_MAGIC + struct.pack("<H", NPY_HEADER_BYTES - len(NPY_MAGIC) - 2) + body + b" " * pad + b"\n"
+
+
+def load_frames(source, width: int, height: int):
+    """Return a read-only memmap (N, H, W, 3) of preconverted frames for `source`.
+
+    The decoded frames are written once to the cache directory and reused by
+    later runs as long as the source files are unchanged.
+    """
+    paths = _resolve_paths(source)
+    if not paths:
+        raise FileNotFoundError(f"no frames found in mock source {source!r}")
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    cache_path = os.path.join(CACHE_DIR, _cache_key(paths, width, height) + ".npy")
+    if os.path.isfile(cache_path):
+        return numpy.load(cache_path, mmap_mode="r")
+
+    # 边解码边写入，整段视频不会同时驻留内存；帧数在写完后回填到文件头
+    tmp_path = cache_path + f".{os.getpid()}.tmp.npy"
+    count = 0
+    try:
+        with open(tmp_path, "wb") as f:
+            f.write(_npy_header(0, width, height))
+            for frame in _decode_frames(paths, width, height):
+                if frame.shape != (height, width, 3):
+                    raise ValueError(f"mock frame has shape {frame.shape}, expected {(height, width, 3)}")
+                f.write(numpy.ascontiguousarray(frame, dtype=numpy.uint8).data)
+                count += 1
+            if not count:
+                raise ValueError(f"mock source {source!r} contains no frames")
+            f.seek(0)
+            f.write(_npy_header(count, width, height))
+        os.replace(tmp_path, cache_path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+    print(f"MockSource: cached {count} frames -> {cache_path}")
+    return numpy.load(cache_path, mmap_mode="r")
+
+
+class MockSource:
+    """Plays a cached frame sequence at `fps` in loop, ping-pong or once mode.
+
+    The frame index is derived from wall time, so playback speed does not
+    depend on how often frames are pulled.
+    """
+
+    def __init__(self, source: Union[str, Sequence[str]], width: int, height: int,
+                 fps: Optional[float] = None, mode: str = MODE_LOOP):
+        self.frames = load_frames(source, width, height)
+        if fps is None:
+            # 静态图片序列默认 1fps，视频/帧文件默认 30fps
+            paths = _resolve_paths(source)
+            stills = all(p.lower().endswith(IMAGE_EXTS) for p in paths)
+            fps = 1.0 if stills else 30.0
+        self.fps = fps
+        self.mode = mode
+        self._start = time.monotonic()
+
+    def __len__(self):
+        return len(self.frames)
+
+    def index_at(self, t: float) -> int:
+        n = len(self.frames)
+        i = int((t - self._start) * self.fps)
+        if n <= 1:
+            return 0
+        if self.mode == MODE_PINGPONG:
+            period = 2 * (n - 1)
+            i %= period
+            return i if i < n else period - i
+        if self.mode == MODE_ONCE:
+            return min(i, n - 1)
+        return i % n
+
+    def current(self):
+        """Return the (H, W, 3) frame for the current time (a memmap view)."""
+        return self.frames[self.index_at(time.monotonic())]
@@ -1,17 +1,42 @@
+import startup
 import signal
-import qt.gui as gui
+with startup.phase("import.gui"):
+    import qt.gui as gui
+import metrics
+import tracing
 import qt.InputListener as InputListener
 import KeyEvent.tcp_button as tcp_button
+import KeyEvent.udp_button as udp_button
 
 signal.signal(signal.SIGINT, lambda s, f: exit(0))
 
 # -----------------------------
-# Config Camera
+# 首帧绘制之后在后台初始化相机、音频并预热 OpenAI 连接
 # -----------------------------
-import camera
-camera.init_camera(False)
+def _start_camera():
+    import camera  # numpy 等在首帧之后才导入
+    return camera.init_camera_async(False)
+
+def _init_audio():
+    import audio_player
+    audio_player.init_mixer()
+
+def _warm_up_ai():
+    import ai_client
+    ai_client.warm_up()
+
+AFTER_FIRST_PAINT = [
+    _start_camera,
+    lambda: startup.run_in_background("audio", _init_audio),
+    lambda: startup.run_in_background("ai", _warm_up_ai),
+]
 
 if __name__ == "__main__":
+    # kill -USR1 <pid> writes a metrics snapshot to metrics.json
+    metrics.install_dump_signal()
+    # kill -USR2 <pid> writes input-to-photon traces to traces.json
+    tracing.install_dump_signal()
     input_listener = InputListener.InputListener()
     tcp_button.thread_run(input_listener)
-    gui.run(input_listener)
\ No newline at end of file
+    udp_button.thread_run(input_listener)
+    gui.run(input_listener, AFTER_FIRST_PAINT)
\ No newline at end of file
@@ -1,12 +1,32 @@
+import threading
+
 from PyQt6.QtCore import (QObject, pyqtSignal)
 
+import metrics
+import tracing
+
 class InputListener(QObject):
-    key_pressed = pyqtSignal(int)
+    # (key code, tracing.Trace)
+    key_pressed = pyqtSignal(int, object)
     
     def __init__(self):
         super().__init__()
         self.running = True
+        # 已发出但 GUI 线程尚未处理的按键数，供输入源做背压
+        self.pending = 0
+        self._pending_lock = threading.Lock()
+        self.key_pressed.connect(self._delivered)
     
-    def emit_key(self, key_code):
-        """发送按键事件"""
-        self.key_pressed.emit(key_code)
\ No newline at end of file
+    def emit_key(self, key_code, trace=None):
+        """发送按键事件；trace 为输入源创建的 tracing.Trace（没有则在此创建）"""
+        if trace is None:
+            trace = tracing.start("unknown", key_code)
+        trace.mark("emit")
+        metrics.counter("input.keys").inc()
+        with self._pending_lock:
+            self.pending += 1
+        self.key_pressed.emit(key_code, trace)
+
+    def _delivered(self, key_code, trace):
+        with self._pending_lock:
+            self.pending -= 1
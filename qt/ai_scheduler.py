@@ -0,0 +1,89 @@
+import time
+from PyQt6.QtCore import QObject, QTimer, pyqtSignal
+
+import ai_client
+import metrics
+
+
+class AIRequestScheduler(QObject):
+    """
+    AI 请求调度器：最新请求优先
+
+    - submit(): 每次按键生成新的 generation id，并取消正在进行的请求（CancelToken）
+    - 短时间内的连续按键合并为一次请求，使用最新的帧
+    - 结果回到 UI 时用 is_current(gen) 过滤，过期结果直接丢弃
+    - 看门狗超时后取消请求，之后到达的结果同样被视为过期
+    """
+    # (generation, CancelToken): 开始一次新的请求
+    start_request = pyqtSignal(int, object)
+    # generation: 该请求超时
+    timed_out = pyqtSignal(int)
+
+    COALESCE_MS = 150
+    WATCHDOG_MS = 20000  # capture + vision
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.generation = 0
+        self.active_generation = None  # 正在等待结果的请求
+        self.token = None
+        self.press_time = 0.0
+        self._coalesce = QTimer(self)
+        self._coalesce.setSingleShot(True)
+        self._coalesce.timeout.connect(self._fire)
+        self._watchdog = QTimer(self)
+        self._watchdog.setSingleShot(True)
+        self._watchdog.timeout.connect(self._on_watchdog)
+
+    @property
+    def pending(self) -> bool:
+        return self._coalesce.isActive() or self.active_generation is not None
+
+    def submit(self):
+        """Request an analysis; supersedes anything pending or in flight."""
+        metrics.counter("ai.sched.presses").inc()
+        if self._coalesce.isActive():
+            metrics.counter("ai.sched.coalesced").inc()
+        self.cancel()
+        self.generation += 1
+        self.press_time = time.perf_counter()
+        self._coalesce.start(self.COALESCE_MS)
+
+    def cancel(self):
+        """Cancel the in-flight request, if any."""
+        if self.token is not None and not self.token.cancelled:
+            self.token.cancel()
+            if self.active_generation is not None:
+                metrics.counter("ai.sched.cancelled").inc()
+        self.active_generation = None
+        self._watchdog.stop()
+
+    def is_current(self, generation: int) -> bool:
+        return generation == self.active_generation
+
+    def finish(self, generation: int):
+        """Vision result for `generation` was applied; speech may still run on its token."""
+        if self.is_current(generation):
+            self.active_generation = None
+            self._watchdog.stop()
+
+    def drop_stale(self, generation: int) -> bool:
+        """True (and counted) if a result for `generation` should be ignored."""
+        if self.is_current(generation):
+            return False
+        metrics.counter("ai.sched.stale_dropped").inc()
+        return True
+
+    def _fire(self):
+        self.token = ai_client.CancelToken()
+        self.active_generation = self.generation
+        self._watchdog.start(self.WATCHDOG_MS)
+        self.start_request.emit(self.generation, self.token)
+
+    def _on_watchdog(self):
+        generation = self.active_generation
+        if generation is None:
+            return
+        metrics.counter("ai.sched.timeouts").inc()
+        self.cancel()
+        self.timed_out.emit(generation)
@@ -0,0 +1,241 @@
+"""Pre-scaled image cache for icons.
+
+Source images (PNG, any size, including the 1024px variants) are decoded,
+smooth-scaled to the size they are shown at and converted to premultiplied
+ARGB32 once; the raw pixels are stored under CACHE_DIR/v<CACHE_VERSION>/,
+keyed by the sha256 of the source file and the target size. Later launches
+read the raw pixels straight into a QImage: no PNG decode, no scaling and
+no format conversion before painting.
+
+Source hashes are remembered per (mtime, size), so a hit does not even
+read the source file. Bumping CACHE_VERSION discards older caches, and entries for
+a source hash no longer in the index (the file changed) are removed.
+
+Large maps are shown through map_tiles' tile pyramid; this cache only
+holds their MAP_OVERVIEW_SIZE overview, painted while the pyramid opens.
+
+Pre-build the app's assets (run by install.sh):
+    QT_QPA_PLATFORM=offscreen python3 -m qt.asset_cache --warm
+"""
+import os
+import json
+import struct
+import shutil
+import hashlib
+import tempfile
+import threading
+from PyQt6.QtCore import Qt, QSize
+from PyQt6.QtGui import QImage, QPixmap
+
+import metrics
+
+CACHE_VERSION = 1
+CACHE_DIR = os.environ.get(
+    "ASSET_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "cache", "assets"))
+ICON_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "resources", "icons")
+
+# magic, version, reserved, width, height, bytes per line, source width, source height
+HEADER = struct.Struct("<4sHHIIIII")
+MAGIC = b"QPXM"
+FORMAT = QImage.Format.Format_ARGB32_Premultiplied
+
+MAP_OVERVIEW_SIZE = 320  # MapPage 在瓦片金字塔打开前显示的缩略图
+
+# (file, size) pairs the UI uses; pre-built by --warm
+APP_ASSETS = [
+    ("map.png", 96), ("ai.png", 96), ("cam.png", 96),
+    ("uoft.png", MAP_OVERVIEW_SIZE),
+]
+
+
+class AssetCache:
+    def __init__(self, directory=CACHE_DIR, version=CACHE_VERSION):
+        self.root = directory
+        self.directory = os.path.join(directory, f"v{version}")
+        self.hits = 0
+        self.misses = 0
+        self.memory_saved = 0  # bytes: decoded sources minus the pixmaps actually kept
+        self._lock = threading.Lock()
+        self._index_path = os.path.join(self.directory, "sources.json")
+        self._hashes = self._load_index()  # path -> [mtime_ns, size, sha256]
+        self._purged = False
+
+    def _load_index(self):
+        try:
+            with open(self._index_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_index(self):
+        self._write_atomic(self._index_path, json.dumps(self._hashes).encode("utf-8"))
+
+    def _write_atomic(self, path, data: bytes):
+        os.makedirs(self.directory, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+        except BaseException:
+            try:
+                os.unlink(tmp)
+            except OSError:
+                pass
+            raise
+
+    def _purge_old_versions(self):
+        # 只保留当前版本目录
+        if self._purged:
+            return
+        self._purged = True
+        try:
+            names = os.listdir(self.root)
+        except OSError:
+            return
+        for name in names:
+            path = os.path.join(self.root, name)
+            if name.startswith("v") and path != self.directory and os.path.isdir(path):
+                shutil.rmtree(path, ignore_errors=True)
+        self._purge_stale()
+
+    def _purge_stale(self):
+        # 源文件改动后旧哈希已从索引中替换，对应的 .argb 不会再被读取
+        with self._lock:
+            current = {entry[2][:24] for entry in self._hashes.values()}
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return
+        for name in names:
+            if name.endswith(".argb") and name.split("_", 1)[0] not in current:
+                try:
+                    os.unlink(os.path.join(self.directory, name))
+                except OSError:
+                    pass
+
+    def source_hash(self, path) -> str:
+        path = os.path.abspath(path)
+        st = os.stat(path)
+        with self._lock:
+            known = self._hashes.get(path)
+            if known and known[0] == st.st_mtime_ns and known[1] == st.st_size:
+                return known[2]
+        h = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 16), b""):
+                h.update(block)
+        digest = h.hexdigest()
+        with self._lock:
+            self._hashes[path] = [st.st_mtime_ns, st.st_size, digest]
+            self._save_index()
+        return digest
+
+    def path_for(self, source, width, height) -> str:
+        return os.path.join(self.directory, f"{self.source_hash(source)[:24]}_{width}x{height}.argb")
+
+    def load_image(self, source, size) -> QImage:
+        """`source` scaled to fit `size` (QSize or int) as a premultiplied ARGB32 QImage.
+
+        Returns a null QImage if the source cannot be read.
+        """
+        if isinstance(size, int):
+            size = QSize(size, size)
+        try:
+            path = self.path_for(source, size.width(), size.height())
+        except OSError:
+            return QImage()
+        image = self._read(path)
+        if image is not None:
+            return image
+        return self._build(source, size, path)
+
+    def load_pixmap(self, source, size, device_pixel_ratio: float = 1.0) -> QPixmap:
+        """Like `load_image`, as a QPixmap; `size` is in logical pixels."""
+        if isinstance(size, int):
+            size = QSize(size, size)
+        if device_pixel_ratio != 1.0:
+            size = QSize(round(size.width() * device_pixel_ratio), round(size.height() * device_pixel_ratio))
+        pixmap = QPixmap.fromImage(self.load_image(source, size))
+        pixmap.setDevicePixelRatio(device_pixel_ratio)
+        return pixmap
+
+    def _read(self, path):
+        try:
+            with open(path, "rb") as f:
+                header = f.read(HEADER.size)
+                pixels = f.read()
+        except OSError:
+            return None
+        if len(header) != HEADER.size:
+            return None
+        magic, version, _, width, height, bpl, src_w, src_h = HEADER.unpack(header)
+        if magic != MAGIC or len(pixels) != bpl * height:
+            return None
+        # 原始像素直接构造 QImage，copy() 使其脱离 pixels 缓冲区
+        image = QImage(pixels, width, height, bpl, FORMAT).copy()
+        self._count(hit=True, source_bytes=src_w * src_h * 4, kept_bytes=bpl * height)
+        return image
+
+    def _build(self, source, size, path):
+        with metrics.timer("assets.build"):
+            src = QImage(source)
+            if src.isNull():
+                print(f"警告：无法读取图片：{source}")
+                return QImage()
+            image = src
+            if src.width() > size.width() or src.height() > size.height():
+                image = src.scaled(size, Qt.AspectRatioMode.KeepAspectRatio,
+                                   Qt.TransformationMode.SmoothTransformation)
+            image = image.convertToFormat(FORMAT)
+            nbytes = image.bytesPerLine() * image.height()
+            header = HEADER.pack(MAGIC, CACHE_VERSION, 0, image.width(), image.height(),
+                                 image.bytesPerLine(), src.width(), src.height())
+            try:
+                self._purge_old_versions()
+                self._write_atomic(path, header + image.constBits().asstring(nbytes))
+            except OSError as e:
+                print(f"Asset cache write failed: {e}")
+        self._count(hit=False, source_bytes=src.width() * src.height() * 4, kept_bytes=nbytes)
+        return image
+
+    def _count(self, hit, source_bytes, kept_bytes):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+            self.memory_saved += max(0, source_bytes - kept_bytes)
+        metrics.counter("assets.hits" if hit else "assets.misses").inc()
+        metrics.gauge("assets.memory_saved_bytes").set(self.memory_saved)
+
+    def report(self) -> str:
+        text = (f"Asset cache: {self.hits} hits, {self.misses} misses, "
+                f"{self.memory_saved / 1024:.0f} KiB saved vs. full-size decodes")
+        print(text)
+        return text
+
+
+asset_cache = AssetCache()
+
+
+def icon_path(name) -> str:
+    return os.path.join(ICON_DIR, name)
+
+
+def warm():
+    """Pre-build APP_ASSETS into the cache."""
+    for name, size in APP_ASSETS:
+        image = asset_cache.load_image(icon_path(name), size)
+        print(f"Asset cache: {name} -> {image.width()}x{image.height()}")
+    asset_cache.report()
+
+
+if __name__ == "__main__":
+    import sys
+
+    if "--warm" in sys.argv:
+        warm()
+    else:
+        print(__doc__)
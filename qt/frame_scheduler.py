@@ -0,0 +1,81 @@
+import time
+from PyQt6.QtCore import QObject, QTimer, Qt
+
+import camera
+
+
+class FrameScheduler(QObject):
+    """
+    自适应预览帧调度器
+
+    - 只在页面可见时运行（由页面在 showEvent/hideEvent 中调用 start/stop）
+    - 根据测得的相机帧间隔和渲染耗时调整节拍：不比相机快，也不让渲染占满 UI 线程
+    - 每次只取最新帧，旧帧直接丢弃，不排队
+    - tick 回调返回 True 表示渲染了一帧，用于统计实际帧率
+    """
+    RENDER_BUDGET = 0.5  # 渲染最多占用帧间隔的一半
+
+    def __init__(self, tick, parent=None, min_fps=5.0, max_fps=30.0):
+        super().__init__(parent)
+        self.tick = tick
+        self.min_fps = min_fps
+        self.max_fps = max_fps
+        self.target_fps = max_fps
+        self.achieved_fps = 0.0
+        self.render_cost = 0.0  # 平滑后的单次渲染耗时（秒）
+        self._timer = QTimer(self)
+        self._timer.setTimerType(Qt.TimerType.PreciseTimer)
+        self._timer.timeout.connect(self._on_timeout)
+        self._rendered = 0
+        self._window_start = 0.0
+
+    @property
+    def active(self):
+        return self._timer.isActive()
+
+    def start(self):
+        if self.active:
+            return
+        camera.add_consumer()
+        self._rendered = 0
+        self._window_start = time.monotonic()
+        self._apply_rate(self.max_fps)
+        self._timer.start()
+
+    def stop(self):
+        if not self.active:
+            return
+        self._timer.stop()
+        camera.remove_consumer()
+        self.achieved_fps = 0.0
+
+    def _on_timeout(self):
+        t0 = time.perf_counter()
+        rendered = self.tick()
+        if rendered:
+            cost = time.perf_counter() - t0
+            self.render_cost += (cost - self.render_cost) * 0.2
+            self._rendered += 1
+
+        now = time.monotonic()
+        elapsed = now - self._window_start
+        if elapsed >= 1.0:
+            self.achieved_fps = self._rendered / elapsed
+            self._rendered = 0
+            self._window_start = now
+            self._adapt()
+
+    def _adapt(self):
+        # 相机出帧间隔决定上限；渲染耗时超过预算时降低节拍
+        interval = 1.0 / self.max_fps
+        cam_interval = camera.get_grabber().frame_interval
+        if cam_interval > 0:
+            interval = max(interval, cam_interval)
+        interval = max(interval, self.render_cost / self.RENDER_BUDGET)
+        self._apply_rate(min(self.max_fps, max(self.min_fps, 1.0 / interval)))
+
+    def _apply_rate(self, fps):
+        self.target_fps = fps
+        interval_ms = max(1, int(round(1000.0 / fps)))
+        if self._timer.interval() != interval_ms:
+            self._timer.setInterval(interval_ms)
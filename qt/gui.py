@@ -1,26 +1,40 @@
 import sys
 import os
-from PyQt6.QtCore import (Qt, QPropertyAnimation, QRect, QEasingCurve, QSize)
+from PyQt6.QtCore import (Qt, QPropertyAnimation, QRect, QEasingCurve, QSize, QObject, QEvent,
+                          QTimer, pyqtSignal)
 from PyQt6.QtWidgets import (QApplication, QMainWindow, QWidget, QHBoxLayout,
                              QListWidget, QListWidgetItem, QStackedWidget, 
                              QLabel)
 from PyQt6.QtGui import QIcon, QKeyEvent, QCursor
 
+import startup
+
 # ----------------- 动画 Stacked Widget 类 (保持不变) -----------------
 
 class AnimatedStackedWidget(QStackedWidget):
     """
     重写 QStackedWidget，实现垂直平移动画 (Vertical Slide Animation)
     """
+    # 动画结束，参数为新页面索引
+    animation_finished = pyqtSignal(int)
+
     def __init__(self, parent=None):
         super().__init__(parent)
         self.animation_duration = 300 # 动画时长 300ms
         self.current_index = 0
         self.is_animating = False
 
-    def setCurrentIndex(self, index):
+    def setCurrentIndex(self, index, duration=None):
+        """Slide to page `index` over `duration` ms (default animation_duration; 0 switches at once)."""
         if self.is_animating or index == self.current_index:
             return
+        if duration is None:
+            duration = self.animation_duration
+        if duration <= 0:
+            self.current_index = index
+            super().setCurrentIndex(index)
+            self.widget(index).setGeometry(self.rect())
+            return
 
         old_index = self.current_index
         
@@ -48,7 +62,7 @@ class AnimatedStackedWidget(QStackedWidget):
         
         # 旧窗口动画：向相反方向垂直移出
         self.anim_old = QPropertyAnimation(old_widget, b"geometry")
-        self.anim_old.setDuration(self.animation_duration)
+        self.anim_old.setDuration(duration)
         self.anim_old.setStartValue(old_widget.geometry())
         # 移出屏幕 (y 坐标变化)
         self.anim_old.setEndValue(old_widget.geometry().translated(0, self.height() * direction))
@@ -56,7 +70,7 @@ class AnimatedStackedWidget(QStackedWidget):
 
         # 新窗口动画：从屏幕外垂直移入
         self.anim_new = QPropertyAnimation(new_widget, b"geometry")
-        self.anim_new.setDuration(self.animation_duration)
+        self.anim_new.setDuration(duration)
         self.anim_new.setStartValue(new_widget.geometry())
         self.anim_new.setEndValue(self.rect()) # 移到正常位置 (0, 0)
         self.anim_new.setEasingCurve(QEasingCurve.Type.InOutQuad)
@@ -77,15 +91,56 @@ class AnimatedStackedWidget(QStackedWidget):
         old_widget.hide()
         super().setCurrentIndex(final_index)
         old_widget.setGeometry(self.rect())
+        self.animation_finished.emit(final_index)
 
 # ----------------- 主应用窗口类 (路径处理、美化和按键切换) -----------------
-from .page_ai import AIPage
-from .page_map import MapPage
-from .page_camera import CameraPage
+from .input_dispatcher import InputDispatcher
+from .asset_cache import asset_cache
+from .lazy_page import LazyPage
+
+# 页面工厂：页面模块（及其依赖的 pygame / OpenAI SDK 等）在构建时才导入
+def _make_map_page():
+    from .page_map import MapPage
+    return MapPage()
+
+def _make_ai_page():
+    from .page_ai import AIPage
+    return AIPage()
+
+def _make_camera_page():
+    from .page_camera import CameraPage
+    return CameraPage()
+
+PAGE_FACTORIES = [("map", _make_map_page), ("ai", _make_ai_page), ("cam", _make_camera_page)]
+
+def _import_pages():
+    # 后台预先导入页面模块，之后在 GUI 线程构建页面时不再阻塞
+    from . import page_map, page_ai, page_camera  # noqa: F401
+
+
+class _StartupBridge(QObject):
+    """后台启动任务全部结束后，在 GUI 线程发出 finished"""
+    finished = pyqtSignal()
+
+    def wait_for(self, threads):
+        def _join():
+            for thread in threads:
+                thread.join()
+            self.finished.emit()
+        startup.run_in_background("join", _join)
 
 class MainApplication(QMainWindow):
-    def __init__(self):
+    def __init__(self, after_first_paint=()):
+        """
+        after_first_paint: callables run on the GUI thread once the first frame
+        is painted (e.g. starting camera/audio init); a returned thread is
+        waited for before the remaining pages are pre-built.
+        """
         super().__init__()
+        self._after_first_paint = list(after_first_paint)
+        self._first_paint_seen = False
+        self._startup = _StartupBridge(self)
+        self._startup.finished.connect(self._prebuild_pages)
         self.setWindowTitle("Raspberry Pi Embedded UI (PyQt6/Qt6)")
 
         central_widget = QWidget()
@@ -140,8 +195,10 @@ class MainApplication(QMainWindow):
             full_icon_path = os.path.join(self.ICON_PATH, icon_file)
             
             if os.path.exists(full_icon_path):
-                icon = QIcon(full_icon_path)
-                item.setIcon(icon) 
+                # 预缩放到显示尺寸的缓存像素图，启动时无需解码 PNG
+                icon = QIcon(asset_cache.load_pixmap(full_icon_path, self.menu_list.iconSize(),
+                                                     self.devicePixelRatioF()))
+                item.setIcon(icon)
             else:
                 print(f"警告：找不到图标文件：{full_icon_path}")
 
@@ -150,19 +207,19 @@ class MainApplication(QMainWindow):
         # --- 右侧内容区 (AnimatedStackedWidget) ---
         self.stacked_widget = AnimatedStackedWidget()
         
-        # 添加内容页面
-        pages = [MapPage(), AIPage(), CameraPage()]
-        for page in pages:
-            self.stacked_widget.addWidget(page)
+        # 添加内容页面（占位，首帧之后才构建）
+        for name, factory in PAGE_FACTORIES:
+            self.stacked_widget.addWidget(LazyPage(name, factory))
             
         #for i, (name, _) in enumerate(items_data):
         #    page = QLabel(f"这是 {name} 页面", alignment=Qt.AlignmentFlag.AlignCenter)
         #    page.setStyleSheet(f"background-color: {'#000000'}; color: #34495E; font-size: 24px;")
         #    self.stacked_widget.addWidget(page)
             
-        # 关联菜单点击事件和页面切换
-        self.menu_list.currentRowChanged.connect(self.stacked_widget.setCurrentIndex)
-        self.menu_list.setCurrentRow(0) 
+        # 菜单与页面的切换统一经过 InputDispatcher，动画期间的按键排队重放
+        self.menu_list.setCurrentRow(0)
+        self.dispatcher = InputDispatcher(self.stacked_widget, self.menu_list, self._apply_key, self)
+        self.menu_list.currentRowChanged.connect(self.dispatcher.goto)
 
         # --- 组合布局 ---
         main_layout.addWidget(self.menu_list)
@@ -170,56 +227,129 @@ class MainApplication(QMainWindow):
         
         # 确保 QMainWindow 接收按键事件，而不是 QListWidget
         self.setFocusPolicy(Qt.FocusPolicy.StrongFocus)
+        self.installEventFilter(self)
+
+    def eventFilter(self, obj, event):
+        if obj is self and not self._first_paint_seen and event.type() == QEvent.Type.Paint:
+            self._first_paint_seen = True
+            self.removeEventFilter(self)
+            # 等本次绘制完成后再开始其余初始化
+            QTimer.singleShot(0, self._on_first_paint)
+        return False
 
-    def _handle_input_key(self, key_code):
-        """将 GPIO/TCP 指令转换为 Qt 按键事件"""
-        event = QKeyEvent(
-            QKeyEvent.Type.KeyPress, 
-            key_code, 
-            Qt.KeyboardModifier.NoModifier
-        )
-        self.keyPressEvent(event)
+    def _on_first_paint(self):
+        startup.mark("first_paint")
+        threads = [startup.run_in_background("import.pages", _import_pages)]
+        for fn in self._after_first_paint:
+            thread = fn()
+            if thread is not None:
+                threads.append(thread)
+        LazyPage.enabled = True
+        self.stacked_widget.currentWidget().ensure()
+        self._startup.wait_for(threads)
+
+    def _prebuild_pages(self):
+        # 每次事件循环只构建一个页面，避免长时间阻塞按键处理
+        for i in range(self.stacked_widget.count()):
+            lazy = self.stacked_widget.widget(i)
+            if lazy.page is None:
+                lazy.ensure()
+                QTimer.singleShot(0, self._prebuild_pages)
+                return
+        startup.mark("pages_ready")
+        startup.report()
+        asset_cache.report()
+
+    def _current_page(self):
+        """The real page at the committed row, or None if it is not built yet."""
+        return self.stacked_widget.widget(self.dispatcher.row).page
+
+    def _handle_input_key(self, key_code, trace=None):
+        """GPIO/TCP/UDP 按键，连同其 trace 交给 InputDispatcher"""
+        self.dispatcher.submit(key_code, trace)
 
     def keyPressEvent(self, event: QKeyEvent):
         """
-        处理按键事件，用于菜单切换
+        处理按键事件：交给 InputDispatcher 排队（上/下键切换菜单，循环）
         """
-        current_row = self.menu_list.currentRow()
-        total_rows = self.menu_list.count()
-        new_row = current_row
+        self.dispatcher.submit(event.key())
+        # 调用父类的 keyPressEvent 以处理其他默认按键行为
+        super().keyPressEvent(event)
 
-        if event.key() == Qt.Key.Key_Up:
-            # 向上切换，使用 % 实现循环 (0-1 = -1, -1 % 4 = 3)
-            new_row = (current_row - 1) % total_rows
-            
-        elif event.key() == Qt.Key.Key_Down:
-            # 向下切换，使用 % 实现循环
-            new_row = (current_row + 1) % total_rows
-        elif event.key() == Qt.Key.Key_Return:
-            # 在 Blank 页面按下 Enter 触发拍照与分析
-            current_page = self.stacked_widget.widget(current_row)
-            if isinstance(current_page, AIPage):
-                current_page.capture_and_analyze()
-            
-        elif event.key() == Qt.Key.Key_Q:
+    def _apply_key(self, key, traces=()):
+        """非导航按键，作用于当前页面（由 InputDispatcher 在页面静止时调用）"""
+        current_page = self._current_page()
+        page_handle_key = getattr(current_page, "handle_key", None)
+        if page_handle_key is not None and page_handle_key(key):
+            # 页面自行处理的按键（地图缩放/平移），下一次重绘结束 trace
+            self.dispatcher.paint_tracer.expect(current_page, traces, "paint", "page")
+            return
+        is_ai_page = hasattr(current_page, "capture_and_analyze")
+        if key == Qt.Key.Key_Return and is_ai_page:
+            # 在 Blank 页面按下 Enter 触发拍照与分析；首次重绘（"Capturing frame..."）结束 trace
+            for trace in traces:
+                trace.mark("capture")
+            current_page.capture_and_analyze()
+            self.dispatcher.paint_tracer.expect(current_page, traces, "paint", "capture")
+            return
+        for trace in traces:
+            trace.finish("key")
+
+        if key == Qt.Key.Key_C:
+            # C 键切换 AI 页面的连续分析模式
+            if is_ai_page:
+                current_page.set_continuous(not current_page.continuous)
+
+        elif key == Qt.Key.Key_Q:
             # 添加 Q 键作为退出应用的快捷键，方便调试
             QApplication.instance().quit()
 
-        # 如果新的行索引有变化，则更新 QListWidget
-        if new_row != current_row:
-            # 设置新行，这会自动触发 currentRowChanged 信号，从而执行页面动画切换
-            self.menu_list.setCurrentRow(new_row)
-        
-        # 调用父类的 keyPressEvent 以处理其他默认按键行为
-        super().keyPressEvent(event)
+def _install_signal_wakeup(app):
+    """
+    让 Python 信号处理函数（SIGUSR1/SIGUSR2 导出指标与 trace）在 Qt 事件循环空闲时也能执行
+
+    Python 只在主线程执行字节码时运行信号处理函数，而 app.exec() 空闲时一直停在 C++ 中。
+    set_wakeup_fd 让信号到达时向 socketpair 写入一个字节，QSocketNotifier 随即唤醒事件循环，
+    槽函数返回 Python 后处理函数即被调用。处理函数只用 QTimer 安排导出
+    （metrics.defer_from_signal），导出在处理函数返回、主线程释放指标锁之后执行。
+    """
+    import signal
+    import socket
+    from PyQt6.QtCore import QSocketNotifier
+
+    rsock, wsock = socket.socketpair()
+    rsock.setblocking(False)
+    wsock.setblocking(False)
+    try:
+        signal.set_wakeup_fd(wsock.fileno())
+    except (ValueError, OSError) as e:
+        print(f"Signal wake-up unavailable: {e}")
+        rsock.close()
+        wsock.close()
+        return
+
+    def _drain():
+        try:
+            while rsock.recv(64):
+                pass
+        except OSError:
+            pass
+
+    notifier = QSocketNotifier(rsock.fileno(), QSocketNotifier.Type.Read, app)
+    notifier.activated.connect(_drain)
+    app._signal_wakeup = (rsock, wsock, notifier)  # 保持引用
+
 
-def run(input_listener):
-    app = QApplication(sys.argv)
-    app.setOverrideCursor(QCursor(Qt.CursorShape.BlankCursor))
-    window = MainApplication()
-    input_listener.key_pressed.connect(window._handle_input_key)
-    window.show()
-    window.resize(480, 320)
+def run(input_listener, after_first_paint=()):
+    with startup.phase("qt.app"):
+        app = QApplication(sys.argv)
+        app.setOverrideCursor(QCursor(Qt.CursorShape.BlankCursor))
+        _install_signal_wakeup(app)
+    with startup.phase("window"):
+        window = MainApplication(after_first_paint)
+        input_listener.key_pressed.connect(window._handle_input_key)
+        window.show()
+        window.resize(480, 320)
     print("window: ", window.width(), " ", window.height())
     sys.exit(app.exec())
 
@@ -0,0 +1,178 @@
+import time
+from collections import deque
+from PyQt6.QtCore import QObject, Qt
+
+import metrics
+import tracing
+from .paint_tracer import PaintTracer
+
+
+class InputDispatcher(QObject):
+    """
+    按键分发器：位于 InputListener.emit_key / 键盘事件与主窗口之间
+
+    - 页面切换动画进行中到达的按键进入队列，动画结束后按顺序重放
+    - 连续的上/下键合并为净位移（上下抵消），Enter 等按键作为分隔，保持先后顺序
+    - 连发按键（间隔 < BURST_MS）时缩短动画；队列中还有待处理按键时直接跳转，不播放动画
+    - 菜单行与页面只在这里一起更新，静止时两者始终一致
+    - 当前页面 captures_navigation 为真时（如地图的缩放/平移模式），上/下键交给页面处理，不切换页面
+    - 每个按键携带的 tracing.Trace 在出队、切换、首帧与最终绘制时打点
+    """
+    BURST_MS = 200
+    FAST_ANIMATION_MS = 120
+    MAX_QUEUE = 64
+
+    NAV_KEYS = {Qt.Key.Key_Up: -1, Qt.Key.Key_Down: 1}
+
+    def __init__(self, stack, menu, handle_key, parent=None):
+        """
+        - stack: AnimatedStackedWidget showing the pages
+        - menu: QListWidget whose rows match the pages
+        - handle_key(key, traces): applies a non-navigation key to the current page
+          and finishes (or hands on) its traces
+        """
+        super().__init__(parent)
+        self.stack = stack
+        self.menu = menu
+        self.handle_key = handle_key
+        self.row = menu.currentRow()  # 已提交的页面索引
+        self._queue = deque()         # [kind, value, enqueue time, traces]; kind 'nav' | 'goto' | 'key'
+        self._animating_traces = []
+        self._carry = []  # traces of pages skipped without being painted
+        self.paint_tracer = PaintTracer(self)
+        self._last_key = 0.0
+        self._burst = False
+        self._draining = False
+        stack.animation_finished.connect(self._on_animation_finished)
+
+    def submit(self, key, trace=None):
+        """Queue one key press (GUI thread)."""
+        now = time.perf_counter()
+        if trace is None:
+            trace = tracing.start("keyboard", key, now)
+        trace.mark("gui", now)
+        self._burst = (now - self._last_key) * 1000 < self.BURST_MS
+        self._last_key = now
+        metrics.counter("input.dispatch.keys").inc()
+
+        delta = self.NAV_KEYS.get(key)
+        if delta is not None:
+            if self._queue and self._queue[-1][0] == "nav":
+                # 与队尾的导航合并为净位移
+                self._queue[-1][1] += delta
+                self._queue[-1][3].append(trace)
+                metrics.counter("input.dispatch.coalesced").inc()
+            else:
+                self._enqueue(["nav", delta, now, [trace]])
+        else:
+            self._enqueue(["key", key, now, [trace]])
+        self._drain()
+
+    def goto(self, row):
+        """Switch to page `row` (e.g. the menu was clicked), after any queued input."""
+        if row < 0 or (row == self.row and not self._queue):
+            return
+        self._enqueue(["goto", row, time.perf_counter(), []])
+        self._drain()
+
+    def _enqueue(self, item):
+        if len(self._queue) >= self.MAX_QUEUE:
+            metrics.counter("input.dispatch.dropped").inc()
+            for trace in item[3]:
+                trace.finish("dropped")
+            return
+        self._queue.append(item)
+        if self.stack.is_animating:
+            metrics.counter("input.dispatch.queued").inc()
+        metrics.gauge("input.dispatch.depth").set(len(self._queue))
+
+    def _on_animation_finished(self, index):
+        traces, self._animating_traces = self._animating_traces, []
+        for trace in traces:
+            trace.mark("animation_done")
+        # 动画最后一帧的绘制即页面到位的时刻
+        self.paint_tracer.expect(self._page_widget(index), traces, "paint", "nav")
+        self._drain()
+
+    def _drain(self):
+        if self._draining:
+            return
+        self._draining = True
+        try:
+            while self._queue and not self.stack.is_animating:
+                kind, value, queued_at, traces = self._queue.popleft()
+                now = time.perf_counter()
+                metrics.observe("input.dispatch.wait", now - queued_at)
+                for trace in traces:
+                    trace.mark("apply", now)
+                if kind == "key":
+                    self._flush_carry()
+                    self.handle_key(value, traces)
+                    continue
+                if kind == "nav" and getattr(self._page_widget(self.row), "captures_navigation", False):
+                    # 出队时才判断，Enter 切换模式前后排队的上/下键各自按当时的模式处理
+                    self._flush_carry()
+                    self._apply_nav_keys(value, traces)
+                    continue
+                count = self.stack.count()
+                row = (self.row + value) % count if kind == "nav" else value
+                if row != self.row:
+                    self._switch(row, traces)
+                else:
+                    # 上下抵消，画面无变化
+                    for trace in traces:
+                        trace.finish("nav")
+            if not self._queue:
+                self._flush_carry()
+        finally:
+            self._draining = False
+            metrics.gauge("input.dispatch.depth").set(len(self._queue))
+
+    def _apply_nav_keys(self, delta, traces):
+        if delta == 0:
+            for trace in traces:
+                trace.finish("nav")
+            return
+        key = Qt.Key.Key_Up if delta < 0 else Qt.Key.Key_Down
+        # 合并后的净位移按次数重放；trace 随第一次结束
+        for i in range(abs(delta)):
+            self.handle_key(key, traces if i == 0 else ())
+
+    def _page_widget(self, row):
+        # 懒加载页面绘制的是其中的真实页面
+        widget = self.stack.widget(row)
+        return getattr(widget, "page", None) or widget
+
+    def _flush_carry(self):
+        if self._carry:
+            self.paint_tracer.expect(self._page_widget(self.row), self._carry, "paint", "nav")
+            self._carry = []
+
+    def _switch(self, row, traces=()):
+        if self._queue:
+            # 后面还有按键：跳过动画，直接到位
+            duration = 0
+            metrics.counter("input.dispatch.skipped_animations").inc()
+        elif self._burst:
+            duration = min(self.FAST_ANIMATION_MS, self.stack.animation_duration)
+        else:
+            duration = None
+        self.row = row
+        self.menu.blockSignals(True)
+        self.menu.setCurrentRow(row)
+        self.menu.blockSignals(False)
+        for trace in traces:
+            trace.mark("switch")
+        self.stack.setCurrentIndex(row, duration)
+        if duration == 0 and self._queue:
+            # 被跳过的页面不会绘制，其 trace 随下一次可见的切换结束
+            self._carry.extend(traces)
+            return
+        traces = self._carry + list(traces)
+        self._carry = []
+        page = self._page_widget(row)
+        if self.stack.is_animating:
+            self._animating_traces.extend(traces)
+            self.paint_tracer.expect(page, traces, "first_paint")
+        else:
+            self.paint_tracer.expect(page, traces, "paint", "nav")
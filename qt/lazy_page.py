@@ -0,0 +1,41 @@
+from PyQt6.QtCore import Qt
+from PyQt6.QtWidgets import QWidget, QVBoxLayout
+
+import startup
+
+
+class LazyPage(QWidget):
+    """
+    占位页面：真实页面（及其依赖的重量级模块）在第一次需要时才由 factory 构建
+
+    - 首帧绘制前 LazyPage.enabled 为 False，占位页只画黑色背景
+    - 之后页面显示时自动构建；也可调用 ensure() 在空闲时预先构建
+    """
+    enabled = False
+
+    def __init__(self, name, factory, parent=None):
+        super().__init__(parent)
+        self.name = name
+        self.factory = factory
+        self.page = None
+        # 普通 QWidget 需要此属性才会绘制样式表背景
+        self.setAttribute(Qt.WidgetAttribute.WA_StyledBackground, True)
+        self.setStyleSheet("background-color: #000000;")
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.setSpacing(0)
+
+    def ensure(self):
+        """Build the real page if needed and return it."""
+        if self.page is None:
+            with startup.phase(f"page.{self.name}"):
+                self.page = self.factory()
+                self.layout().addWidget(self.page)
+                if self.isVisible():
+                    self.page.show()
+        return self.page
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        if LazyPage.enabled:
+            self.ensure()
@@ -0,0 +1,321 @@
+import math
+import time
+from collections import OrderedDict
+import numpy
+from PyQt6.QtWidgets import QWidget
+from PyQt6.QtCore import Qt, QRect, QRectF, QTimer, QVariantAnimation, QEasingCurve
+from PyQt6.QtGui import QImage, QPainter, QColor
+
+import metrics
+
+TILE_FORMAT = QImage.Format.Format_RGB32  # 与 map_tiles 的 BGRA 字节序一致
+
+
+class TileCache:
+    """
+    LRU 瓦片缓存：(level, col, row) -> QImage
+
+    - 未命中时从 TilePyramid 的 memmap 中复制一块瓦片到 QImage（只读取这一块）
+    - 超过 capacity 时淘汰最久未使用的瓦片
+    """
+
+    def __init__(self, pyramid, capacity=64):
+        self.pyramid = pyramid
+        self.capacity = capacity
+        self._tiles = OrderedDict()
+
+    def __contains__(self, key):
+        return key in self._tiles
+
+    def peek(self, key):
+        """Cached tile or None, without loading it."""
+        image = self._tiles.get(key)
+        if image is not None:
+            self._tiles.move_to_end(key)
+        return image
+
+    def get(self, key):
+        """Tile for `key`, loading it on a miss; None outside the pyramid."""
+        image = self.peek(key)
+        if image is not None:
+            metrics.counter("map.tiles.hits").inc()
+            return image
+        metrics.counter("map.tiles.misses").inc()
+        return self.load(key)
+
+    def load(self, key):
+        tile = self.pyramid.tile(*key)
+        if tile is None:
+            return None
+        start = time.perf_counter()
+        size = self.pyramid.tile_size
+        image = QImage(size, size, TILE_FORMAT)
+        bits = image.bits()
+        bits.setsize(image.sizeInBytes())
+        dst = numpy.frombuffer(bits, dtype=numpy.uint8).reshape(size, image.bytesPerLine())
+        dst[:, :size * 4] = tile.reshape(size, size * 4)
+        metrics.observe("map.tiles.load", time.perf_counter() - start)
+        self._tiles[key] = image
+        while len(self._tiles) > self.capacity:
+            self._tiles.popitem(last=False)
+            metrics.counter("map.tiles.evictions").inc()
+        return image
+
+
+class MapView(QWidget):
+    """
+    瓦片地图视图：只绘制可见瓦片
+
+    - 视图状态为中心点（第 0 层像素坐标）与缩放比例（屏幕像素 / 第 0 层像素）
+    - 按缩放比例选择金字塔层级，瓦片按需从 TileCache 取出
+    - 平移/缩放过程中缺失的瓦片先用已缓存的上一层瓦片放大代替，空闲时再补齐
+    - 每次绘制后在空闲时预取可见区域周围一圈瓦片以及相邻层级的瓦片
+    - 帧耗时按动作记录为 map.frame.<pan|zoom|idle>，动画帧间隔记录为 map.frame_interval.<pan|zoom>
+    """
+    ANIMATION_MS = 150
+    ZOOM_STEP = 2.0
+    MAX_SCALE = 2.0
+    PAN_FRACTION = 0.25  # 每次平移视口的比例
+    PREFETCH_PER_SLICE = 2  # 每次事件循环最多预取的瓦片数
+
+    def __init__(self, pyramid=None, cache_capacity=64, parent=None):
+        super().__init__(parent)
+        self.setAttribute(Qt.WidgetAttribute.WA_OpaquePaintEvent)
+        self.pyramid = None
+        self.cache = None
+        self.cx = self.cy = 0.0
+        self.scale = 1.0
+        self.motion = None  # 'pan' | 'zoom' while animating
+        self._fitted = False
+        self._last_frame = 0.0
+        self._visible_level = 0
+        self._prefetch_queue = []
+        self._prefetch_timer = QTimer(self)
+        self._prefetch_timer.setSingleShot(True)
+        self._prefetch_timer.timeout.connect(self._prefetch_slice)
+        self._animation = QVariantAnimation(self)
+        self._animation.setEasingCurve(QEasingCurve.Type.OutCubic)
+        self._animation.valueChanged.connect(self._on_animation_step)
+        self._animation.finished.connect(self._on_animation_finished)
+        self._from = self._to = None
+        if pyramid is not None:
+            self.set_pyramid(pyramid, cache_capacity)
+
+    def set_pyramid(self, pyramid, cache_capacity=64):
+        self.pyramid = pyramid
+        self.cache = TileCache(pyramid, cache_capacity)
+        self._fitted = False
+        self.update()
+
+    # --- 视图状态 ---
+
+    def min_scale(self) -> float:
+        if self.pyramid is None or self.width() <= 0 or self.height() <= 0:
+            return 1.0
+        return min(self.width() / self.pyramid.width, self.height() / self.pyramid.height, 1.0)
+
+    def fit(self):
+        """Show the whole map, centred."""
+        if self.pyramid is None:
+            return
+        self._animation.stop()
+        self.scale = self.min_scale()
+        self.cx, self.cy = self.pyramid.width / 2.0, self.pyramid.height / 2.0
+        self.motion = None
+        self.update()
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        if self.pyramid is None:
+            return
+        if not self._fitted:
+            self._fitted = True
+            self.fit()
+        else:
+            self.cx, self.cy, self.scale = self._clamp(self.cx, self.cy, self.scale)
+
+    def _clamp(self, cx, cy, scale):
+        scale = max(self.min_scale(), min(self.MAX_SCALE, scale))
+        half_w = self.width() / (2.0 * scale)
+        half_h = self.height() / (2.0 * scale)
+        w, h = self.pyramid.width, self.pyramid.height
+        # 地图小于视口时居中，否则不允许移出地图边缘
+        cx = w / 2.0 if 2 * half_w >= w else max(half_w, min(w - half_w, cx))
+        cy = h / 2.0 if 2 * half_h >= h else max(half_h, min(h - half_h, cy))
+        return cx, cy, scale
+
+    def pan(self, dx, dy):
+        """Move the view by (dx, dy) viewport fractions."""
+        if self.pyramid is None:
+            return
+        cx, cy, scale = self._target()
+        self._animate_to(cx + dx * self.width() / scale, cy + dy * self.height() / scale, scale, "pan")
+
+    def zoom(self, steps):
+        """Zoom in (steps > 0) or out by ZOOM_STEP per step, around the view centre."""
+        if self.pyramid is None:
+            return
+        cx, cy, scale = self._target()
+        self._animate_to(cx, cy, scale * self.ZOOM_STEP ** steps, "zoom")
+
+    def _target(self):
+        # 动画进行中时以目标状态为基准，连续按键可以累积
+        if self._animation.state() == QVariantAnimation.State.Running and self._to is not None:
+            return self._to
+        return self.cx, self.cy, self.scale
+
+    def _animate_to(self, cx, cy, scale, motion):
+        target = self._clamp(cx, cy, scale)
+        if all(abs(a - b) < 1e-6 for a, b in zip(target, (self.cx, self.cy, self.scale))):
+            metrics.counter(f"map.{motion}.at_limit").inc()
+            return
+        self._animation.stop()
+        self._from = (self.cx, self.cy, self.scale)
+        self._to = target
+        self.motion = motion
+        self._last_frame = 0.0
+        metrics.counter(f"map.{motion}").inc()
+        self._animation.setStartValue(0.0)
+        self._animation.setEndValue(1.0)
+        self._animation.setDuration(self.ANIMATION_MS)
+        self._animation.start()
+
+    def _on_animation_step(self, t):
+        if self._from is None:
+            return
+        (x0, y0, s0), (x1, y1, s1) = self._from, self._to
+        self.cx = x0 + (x1 - x0) * t
+        self.cy = y0 + (y1 - y0) * t
+        # 缩放按对数插值，视觉上匀速
+        self.scale = math.exp(math.log(s0) + (math.log(s1) - math.log(s0)) * t)
+        self.update()
+
+    def _on_animation_finished(self):
+        self.cx, self.cy, self.scale = self._to
+        self._from = None
+        self.motion = None
+        # 最后一帧用平滑缩放并补齐缺失瓦片
+        self.update()
+
+    # --- 绘制 ---
+
+    def level_for(self, scale) -> int:
+        """Pyramid level whose resolution is closest to (not below) the screen's."""
+        device_scale = scale * self.devicePixelRatioF()
+        level = int(math.floor(math.log2(1.0 / device_scale))) if device_scale < 1.0 else 0
+        return max(0, min(self.pyramid.level_count - 1, level))
+
+    def _visible_tiles(self, level, margin=0):
+        ts = self.pyramid.tile_size * (1 << level)  # 该层一块瓦片覆盖的第 0 层像素
+        x0 = self.cx - self.width() / (2.0 * self.scale)
+        y0 = self.cy - self.height() / (2.0 * self.scale)
+        x1 = self.cx + self.width() / (2.0 * self.scale)
+        y1 = self.cy + self.height() / (2.0 * self.scale)
+        cols, rows = self.pyramid.grid(level)
+        c0 = max(0, int(x0 // ts) - margin)
+        r0 = max(0, int(y0 // ts) - margin)
+        c1 = min(cols - 1, int(math.ceil(x1 / ts)) - 1 + margin)
+        r1 = min(rows - 1, int(math.ceil(y1 / ts)) - 1 + margin)
+        return [(c, r) for r in range(r0, r1 + 1) for c in range(c0, c1 + 1)]
+
+    def _tile_rect(self, level, col, row) -> QRect:
+        ts = self.pyramid.tile_size * (1 << level)
+        ox = self.width() / 2.0 - self.cx * self.scale
+        oy = self.height() / 2.0 - self.cy * self.scale
+        # 以取整后的相邻边界定位，避免瓦片之间出现缝隙
+        left = round(ox + col * ts * self.scale)
+        top = round(oy + row * ts * self.scale)
+        right = round(ox + (col + 1) * ts * self.scale)
+        bottom = round(oy + (row + 1) * ts * self.scale)
+        return QRect(left, top, right - left, bottom - top)
+
+    def paintEvent(self, event):
+        start = time.perf_counter()
+        painter = QPainter(self)
+        painter.fillRect(self.rect(), QColor(0, 0, 0))
+        if self.pyramid is not None:
+            self._paint_tiles(painter)
+        self.paint_overlay(painter)
+        painter.end()
+
+        end = time.perf_counter()
+        motion = self.motion or "idle"
+        metrics.observe(f"map.frame.{motion}", end - start)
+        if self.motion is not None:
+            if self._last_frame:
+                metrics.observe(f"map.frame_interval.{motion}", start - self._last_frame)
+            self._last_frame = start
+        self._schedule_prefetch()
+
+    def _paint_tiles(self, painter):
+        level = self.level_for(self.scale)
+        self._visible_level = level
+        moving = self.motion is not None
+        # 运动中用最近邻缩放保证帧率，静止时平滑缩放
+        painter.setRenderHint(QPainter.RenderHint.SmoothPixmapTransform, not moving)
+        viewport = self.rect()
+        for col, row in self._visible_tiles(level):
+            target = self._tile_rect(level, col, row)
+            if not target.intersects(viewport):
+                continue
+            key = (level, col, row)
+            if moving and key not in self.cache and self._paint_from_parent(painter, target, level, col, row):
+                # 本层瓦片稍后在空闲时加载
+                self._prefetch_queue.append(key)
+                continue
+            image = self.cache.get(key)
+            if image is not None:
+                painter.drawImage(target, image)
+
+    def _paint_from_parent(self, painter, target, level, col, row) -> bool:
+        parent_level = level + 1
+        while parent_level < self.pyramid.level_count:
+            shift = parent_level - level
+            parent = self.cache.peek((parent_level, col >> shift, row >> shift))
+            if parent is not None:
+                part = self.pyramid.tile_size >> shift
+                sx = (col - ((col >> shift) << shift)) * part
+                sy = (row - ((row >> shift) << shift)) * part
+                painter.drawImage(QRectF(target), parent, QRectF(sx, sy, part, part))
+                metrics.counter("map.tiles.fallback").inc()
+                return True
+            parent_level += 1
+        return False
+
+    def paint_overlay(self, painter):
+        """Hook for subclasses to draw on top of the map."""
+
+    # --- 预取 ---
+
+    def _schedule_prefetch(self):
+        # 动画期间不预取，避免与绘制争抢主线程；动画结束的那一帧再统一安排
+        if self.pyramid is None or self.motion is not None:
+            return
+        level = self._visible_level
+        visible = self._visible_tiles(level)
+        wanted = list(self._prefetch_queue)
+        wanted += [(level, c, r) for c, r in self._visible_tiles(level, margin=1)]
+        for near in (level + 1, level - 1):
+            if 0 <= near < self.pyramid.level_count:
+                wanted += [(near, c, r) for c, r in self._visible_tiles(near)]
+        queue = []
+        for key in wanted:
+            if key not in self.cache and key not in queue:
+                queue.append(key)
+        # 预取不能挤掉当前可见的瓦片
+        self._prefetch_queue = queue[:max(0, self.cache.capacity - len(visible))]
+        if self._prefetch_queue and not self._prefetch_timer.isActive():
+            self._prefetch_timer.start(0)
+
+    def _prefetch_slice(self):
+        if self.motion is not None:
+            return
+        loaded = 0
+        while self._prefetch_queue and loaded < self.PREFETCH_PER_SLICE:
+            key = self._prefetch_queue.pop(0)
+            if key not in self.cache:
+                self.cache.load(key)
+                metrics.counter("map.tiles.prefetched").inc()
+                loaded += 1
+        if self._prefetch_queue:
+            self._prefetch_timer.start(0)
@@ -1,75 +1,331 @@
 from PyQt6.QtWidgets import QLabel
 from PyQt6.QtCore import Qt, QTimer, pyqtSignal
-import threading
-import pygame
+import asyncio
+import time
 
 import camera
+import ai_async
 import ai_client
+import audio_player
+import metrics
+import tts_cache
+from scene_detector import SceneChangeDetector, block_means
+from .ai_scheduler import AIRequestScheduler
+
+try:
+    import config  # type: ignore
+    CONTINUOUS_ANALYSIS = getattr(config, "CONTINUOUS_ANALYSIS", False)
+except Exception:
+    CONTINUOUS_ANALYSIS = False
 
 
 class AIPage(QLabel):
-    # Signal to deliver analysis result back to UI thread
-    result_ready = pyqtSignal(str)
+    # Signals to deliver analysis results back to the UI thread; the first
+    # argument is the request generation so stale results can be dropped.
+    result_ready = pyqtSignal(int, str)
+    # Per-stage completion: (generation, stage, error message or "")
+    stage_finished = pyqtSignal(int, str, str)
+    # Partial ui_text while the vision response is still streaming
+    partial_text = pyqtSignal(int, str)
+    # Speech to start, queued to the UI thread:
+    # (generation, text, press time, speech CancelToken, cache entry or None)
+    speech_requested = pyqtSignal(int, str, float, object, object)
+    # Block-mean grid of a successfully analyzed frame: the scene detector's new reference
+    scene_analyzed = pyqtSignal(object)
     def __init__(self):
         super().__init__(alignment=Qt.AlignmentFlag.AlignCenter)
         self.setStyleSheet("background-color: #000000; color: #ECF0F1; font-size: 26px;")
         self.setWordWrap(True)
-        self.busy = False
-        self._timeout_timer = None
+        self._emit_time = 0.0
+        self._speech_token = None
+        # 请求调度：最新按键优先，过期结果丢弃
+        self.scheduler = AIRequestScheduler(self)
+        self.scheduler.start_request.connect(self._start_request)
+        self.scheduler.timed_out.connect(self._on_timeout)
         # Connect signal to UI slot
         self.result_ready.connect(self._apply_result)
+        self.stage_finished.connect(self._on_stage_finished)
+        self.partial_text.connect(self._apply_partial)
+        self.speech_requested.connect(self._begin_speech)
+        self.scene_analyzed.connect(self._on_scene_analyzed)
         self.setText("Blank Page\n\nPress Enter to capture and analyze the camera frame.")
 
+        # 连续模式：画面变化并稳定后自动分析（受速率与预算限制）
+        self.continuous = False
+        self.detector = SceneChangeDetector()
+        self._scene_seq = 0
+        self._scene_timer = QTimer(self)
+        self._scene_timer.timeout.connect(self._check_scene)
+        self.set_continuous(CONTINUOUS_ANALYSIS)
+
         # Initialize pygame mixer for audio
         try:
-            pygame.mixer.init()
+            audio_player.init_mixer()
         except Exception as e:
             print(f"Warning: Could not initialize audio: {e}")
 
-    def capture_and_analyze(self):
+    @property
+    def busy(self) -> bool:
+        return self.scheduler.pending
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        # 进入 AI 页面时预热连接，按下确认键时无需再建立 TLS
+        ai_client.warm_up()
+        if self.continuous:
+            self._start_scene_watch()
+
+    def hideEvent(self, event):
+        super().hideEvent(event)
+        self._stop_scene_watch()
+
+    def set_continuous(self, enabled: bool):
+        """Turn hands-free continuous analysis on or off."""
+        self.continuous = enabled
+        if enabled and self.isVisible():
+            self._start_scene_watch()
+        elif not enabled:
+            self._stop_scene_watch()
+        if not self.busy and self.isVisible():
+            self.setText("Continuous mode ON" if enabled else "Continuous mode OFF")
+
+    def _start_scene_watch(self):
+        if self._scene_timer.isActive():
+            return
+        camera.add_consumer()
+        # 保留上次分析的参考画面：回到本页时场景未变就不会重新分析
+        self.detector.resume()
+        self._scene_timer.start(200)  # 5 Hz is enough to see the view settle
+
+    def _stop_scene_watch(self):
+        if not self._scene_timer.isActive():
+            return
+        self._scene_timer.stop()
+        camera.remove_consumer()
+
+    def _check_scene(self):
         if self.busy:
             return
-        self.busy = True
+        latest = camera.get_latest()
+        if latest is None or latest.seq == self._scene_seq:
+            return
+        frame = camera.acquire_latest()
+        if frame is None:
+            return
+        with frame:
+            self._scene_seq = frame.seq
+            with metrics.timer("ai.scene_detect"):
+                trigger = self.detector.update(frame.data)
+        metrics.gauge("ai.scene_motion").set(self.detector.motion)
+        if trigger:
+            metrics.counter("ai.scene_triggers").inc()
+            self.capture_and_analyze()
+
+    def capture_and_analyze(self):
+        # 新的按键总是取代正在进行的请求；短时间内的连按合并为一次
+        self._stop_speech()
+        self.scheduler.submit()
         self.setText("Capturing frame...\nPlease wait.")
-        
-        # Start watchdog timeout
-        if self._timeout_timer is None:
-            self._timeout_timer = QTimer(self)
-            self._timeout_timer.setSingleShot(True)
-            self._timeout_timer.timeout.connect(lambda: self._apply_result("Error: analysis timed out"))
-        self._timeout_timer.start(20000)  # 20s timeout
-
-        def _worker():
+
+    def _start_request(self, generation, token):
+        # 请求以协程方式运行在 ai_async 的事件循环上，不再每次按键新建线程
+        ai_async.submit(self._vision_task(generation, token, self.scheduler.press_time))
+
+    @staticmethod
+    def _grab_frame():
+        # Hold a reference on the newest pooled frame while it is
+        # encoded, so the grabber cannot recycle it (no copy needed).
+        if camera.init_error() is not None:
+            return None
+        with metrics.timer("ai.capture"), camera.consumer():
+            latest = camera.get_latest()
+            camera.wait_for_next(latest.seq if latest else 0, timeout=2.0)
+            return camera.acquire_latest()
+
+    async def _vision_task(self, generation, token, press_time):
+        """Capture + vision. Emits the HUD text as soon as vision returns and
+        starts speech as its own task, so the text never waits for TTS."""
+        stage = "capture"
+        early_speech = []  # speech tokens started from the partial response
+        try:
+            # 不可取消：执行器中的取帧总会完成，取消时需释放帧引用
+            frame = await ai_async.run_blocking(self._grab_frame)
+            if frame is None:
+                error = camera.init_error()
+                raise RuntimeError(f"camera unavailable: {error}" if error else "no camera frame available")
+            if token.cancelled:
+                frame.release()
+                raise ai_client.Cancelled()
+            self.stage_finished.emit(generation, "capture", "")
+            stage = "vision"
+            # 流式提前开始的语音：缓存条目在整个响应解析后才存在，用 future 交给语音任务
+            entry_ready = asyncio.get_running_loop().create_future()
+
+            def _on_speech_text(text):
+                # speech_text 完整后立即开始合成，不等待整个响应结束
+                early_speech.append(self._start_speech(generation, text, press_time, token, entry_ready))
+
             try:
-                # Use fast path: no extra color conversions
-                cam = camera.get_camera()
-                frame_rgb = cam.capture_raw()
-                result = ai_client.analyze_frame(frame_rgb)
-                
-                ui_text = result.get("ui_text", "Error parsing response")
-                speech_text = result.get("speech_text", "")
-
-                # Generate and play audio
-                if speech_text:
-                    audio_path = ai_client.generate_speech(speech_text)
-                    if audio_path:
-                        try:
-                            pygame.mixer.music.load(audio_path)
-                            pygame.mixer.music.play()
-                        except Exception as e:
-                            print(f"Audio playback error: {e}")
-
-                # Emit signal to update UI on the main thread
-                self.result_ready.emit(ui_text)
-            except Exception as e:
-                # Emit error via signal
-                self.result_ready.emit(f"Error: {e}")
-
-        threading.Thread(target=_worker, daemon=True).start()
-
-    def _apply_result(self, text: str):
-        # Stop timeout if still active
-        if self._timeout_timer and self._timeout_timer.isActive():
-            self._timeout_timer.stop()
+                with frame:
+                    result, entry, hit = await ai_async.run_cancellable(
+                        ai_async.analyze_frame_cached_async(
+                            frame.data,
+                            on_ui_text=lambda text: self.partial_text.emit(generation, text),
+                            on_speech_text=_on_speech_text),
+                        token)
+                    if not ai_client.is_error(result):
+                        # 本次分析的画面（手动或自动）成为场景检测的参考
+                        self.scene_analyzed.emit(block_means(frame.data, self.detector.grid))
+                entry_ready.set_result(entry)
+            finally:
+                if not entry_ready.done():
+                    entry_ready.set_result(None)
+            token.check()
+        except ai_client.Cancelled:
+            # 已被更新的按键或超时取代，结果丢弃
+            metrics.counter("ai.worker_cancelled").inc()
+            return
+        except Exception as e:
+            # Emit error via signal
+            metrics.counter("ai.worker_errors").inc()
+            self.stage_finished.emit(generation, stage, str(e))
+            self._emit_time = time.perf_counter()
+            self.result_ready.emit(generation, f"Error: {e}")
+            self._speak_error(generation, "no_camera" if stage == "capture" else "analysis_error",
+                              press_time, token, early_speech)
+            return
+
+        ui_text = result.get("ui_text", "Error parsing response")
+        speech_text = result.get("speech_text", "")
+        self.stage_finished.emit(generation, "vision", "")
+        if hit:
+            print("AI cache hit: reusing previous answer for this scene")
+
+        # Emit signal to update UI on the main thread
+        self._emit_time = time.perf_counter()
+        self.result_ready.emit(generation, ui_text)
+
+        if ai_client.is_error(result) or "ui_text" not in result:
+            self._speak_error(generation, "analysis_error", press_time, token, early_speech)
+        elif speech_text and not early_speech:
+            self._start_speech(generation, speech_text, press_time, token, entry)
+
+    def _speak_error(self, generation, phrase_key, press_time, token, early_speech=()):
+        # 部分 JSON 已开始播报但最终解析失败：先停止那段语音，再播报错误提示
+        for speech_token in early_speech:
+            speech_token.cancel()
+        self._speak_system(generation, phrase_key, press_time, token)
+
+    def _start_speech(self, generation, speech_text, press_time, token, entry=None):
+        """Start speech for request `generation` (any thread).
+
+        Speech gets its own CancelToken, cancelled along with the request's
+        `token`; it is returned so the caller can stop just the speech.
+        """
+        speech_token = ai_client.CancelToken()
+        token.add_callback(speech_token.cancel)
+        # _speech_token 只在 UI 线程读写：经信号排队到 UI 线程后再开始
+        self.speech_requested.emit(generation, speech_text, press_time, speech_token, entry)
+        return speech_token
+
+    def _begin_speech(self, generation, speech_text, press_time, speech_token, entry):
+        if generation != self.scheduler.generation or speech_token.cancelled:
+            # 期间又有新的按键：过期请求的语音不再播放
+            speech_token.cancel()
+            metrics.counter("ai.speech_stale_dropped").inc()
+            return
+        self._speech_token = speech_token
+        ai_async.submit(self._speech_task(generation, speech_text, press_time, speech_token, entry))
+
+    def _speak_system(self, generation, phrase_key, press_time, token=None):
+        """Speak one of the pre-synthesized system phrases (played from the TTS cache)."""
+        return self._start_speech(generation, tts_cache.SYSTEM_PHRASES[phrase_key], press_time,
+                                  token or ai_client.CancelToken())
+
+    def _stop_speech(self):
+        if self._speech_token is not None:
+            self._speech_token.cancel()
+            self._speech_token = None
+
+    def _on_timeout(self, generation):
+        self.setText("Error: analysis timed out")
+        self._speak_system(generation, "timeout", time.perf_counter())
+
+    async def _speech_task(self, generation, speech_text, press_time, token, entry=None):
+        """TTS streaming and playback run concurrently: chunks are played as they arrive.
+
+        Audio cached on `entry` (a response-cache hit) is played directly;
+        otherwise the streamed audio is stored on `entry` for the next hit.
+        Speech started from a still-streaming response gets a future that
+        resolves to the entry (or None) once the response is complete.
+        Cancelling `token` stops both the stream and the playback.
+        """
+        player = audio_player.StreamPlayer(
+            on_first_audio=lambda: metrics.observe(
+                "ai.press_to_audio", time.perf_counter() - press_time))
+        tts_error = ""
+        try:
+            if isinstance(entry, ai_client.CacheEntry) and entry.audio:
+                player.feed(entry.audio)
+            else:
+                async def _stream():
+                    pcm = bytearray()
+                    async for chunk in ai_async.iter_speech_async(speech_text):
+                        player.feed(chunk)
+                        pcm += chunk
+                    return pcm
+
+                pcm = await ai_async.run_cancellable(_stream(), token)
+                if isinstance(entry, asyncio.Future):
+                    entry = await ai_async.run_cancellable(asyncio.shield(entry), token)
+                if entry is not None:
+                    entry.audio = bytes(pcm)
+        except ai_client.Cancelled:
+            player.stop()
+            return
+        except Exception as e:
+            tts_error = str(e)
+            print(f"Error generating speech: {e}")
+        finally:
+            player.close()
+        self.stage_finished.emit(generation, "tts", tts_error)
+        while not player.wait(0):
+            if token.cancelled:
+                player.stop()
+                return
+            await asyncio.sleep(0.1)
+        self.stage_finished.emit(generation, "playback", player.error or "")
+
+    def _on_scene_analyzed(self, grid):
+        self.detector.set_reference(grid)
+
+    def _on_stage_finished(self, generation: int, stage: str, error: str):
+        if not error:
+            metrics.counter(f"ai.stage.{stage}.ok").inc()
+            return
+        metrics.counter(f"ai.stage.{stage}.errors").inc()
+        print(f"AI stage '{stage}' failed: {error}")
+        if (stage in ("tts", "playback") and not self.busy
+                and generation == self.scheduler.generation):
+            # 文字结果已显示，只提示语音不可用
+            self.setText(f"{self.text()}\n(audio unavailable)")
+
+    def _apply_partial(self, generation: int, text: str):
+        # 流式显示尚未完成的 ui_text；最终结果仍由 _apply_result 设置
+        if self.scheduler.is_current(generation) and text:
+            self.setText(text)
+
+    def _apply_result(self, generation: int, text: str):
+        # 只显示最近一次按键的结果
+        if self.scheduler.drop_stale(generation):
+            return
+        self.scheduler.finish(generation)
+        t0 = time.perf_counter()
         self.setText(text)
-        self.busy = False
\ No newline at end of file
+        if self._emit_time:
+            # 信号排队 + 界面更新耗时
+            metrics.observe("ui.apply", time.perf_counter() - self._emit_time)
+            self._emit_time = 0.0
+        else:
+            metrics.observe("ui.apply", time.perf_counter() - t0)
+        metrics.observe("ai.press_to_text", time.perf_counter() - self.scheduler.press_time)
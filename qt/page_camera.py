@@ -1,24 +1,18 @@
-from PyQt6.QtWidgets import QLabel
-from PyQt6.QtCore import Qt, QTimer
-from PyQt6.QtGui import QPixmap, QImage
+from .preview_widget import FramePreview
+from .frame_scheduler import FrameScheduler
 
-import camera
-
-class CameraPage(QLabel):
+class CameraPage(FramePreview):
     def __init__(self):
-        super().__init__(alignment=Qt.AlignmentFlag.AlignCenter)
+        super().__init__()
         self.setStyleSheet("background-color: #000000;")
-        self.timer = QTimer(self)
-        self.timer.timeout.connect(self.update_frame)
-        self.timer.start(30)  # 约30fps
+        # 页面可见时才采集和渲染（约30fps，按实际帧间隔自适应）
+        self.scheduler = FrameScheduler(self.update_frame, self)
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        self.scheduler.start()
 
-    def update_frame(self):
-        #h, w = frame_rgb.shape[:2]
-        #bytes_per_line = 3 * w
-        
-        frame_rgb = camera.get_camera().capture_Image()
-        img = QImage(frame_rgb.data, camera.width, camera.height, camera.height*3, QImage.Format.Format_RGB888)
-        self.setPixmap(QPixmap.fromImage(img).scaled(
-            320, 320, Qt.AspectRatioMode.KeepAspectRatio,
-            Qt.TransformationMode.SmoothTransformation
-        ))
\ No newline at end of file
+    def hideEvent(self, event):
+        super().hideEvent(event)
+        self.scheduler.stop()
+        self.clear_frame()
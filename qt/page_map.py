@@ -1,22 +1,124 @@
-from PyQt6.QtWidgets import QLabel
-from PyQt6.QtGui import QPixmap
-from PyQt6.QtCore import Qt
+from PyQt6.QtCore import Qt, QRect, QPoint, pyqtSignal
+from PyQt6.QtGui import QColor, QFont
 import os
+import threading
+
+from .asset_cache import asset_cache, MAP_OVERVIEW_SIZE
+from .map_view import MapView
+
+try:
+    import config  # type: ignore
+    MAP_TILE_CACHE = getattr(config, "MAP_TILE_CACHE", 64)  # 瓦片数，每块 256KB
+except Exception:
+    MAP_TILE_CACHE = 64
+
+
+class MapPage(MapView):
+    """
+    地图页面：瓦片金字塔 + 三键操作
+
+    - Enter 依次切换模式：浏览（上/下键切换页面）-> 缩放 -> 南北平移 -> 东西平移 -> 浏览
+    - 非浏览模式下上/下键由本页处理（InputDispatcher 通过 captures_navigation 判断）
+    - 金字塔在后台线程打开（首次运行时切片生成），完成前显示 asset_cache 中的缩略图
+    """
+    MODES = (None, "zoom", "pan_y", "pan_x")
+    HINTS = {
+        None: "Enter: 操作地图",
+        "zoom": "缩放  ↑放大 ↓缩小",
+        "pan_y": "平移  ↑北 ↓南",
+        "pan_x": "平移  ↑西 ↓东",
+    }
+    pyramid_ready = pyqtSignal(object, str)  # (TilePyramid or None, error message)
 
-class MapPage(QLabel):
     def __init__(self):
         super(MapPage, self).__init__()
-        self.setAlignment(Qt.AlignmentFlag.AlignCenter)
-        self.setStyleSheet("background-color: #000000;")
+        self.mode = None
+        self._error = ""
         # 获取图片路径
         base_dir = os.path.dirname(os.path.abspath(__file__))
         img_path = os.path.join(base_dir, "resources", "icons", "uoft.png")
         if not os.path.exists(img_path):
             # 兼容直接从qt目录运行
             img_path = os.path.join(base_dir, "..", "qt", "resources", "icons", "uoft.png")
-        pixmap = QPixmap(img_path)
-        if not pixmap.isNull():
-            pixmap = pixmap.scaled(320, 320, Qt.AspectRatioMode.KeepAspectRatio, Qt.TransformationMode.SmoothTransformation)
-            self.setPixmap(pixmap)
+        # 缩略图由 asset_cache --warm 预先生成，金字塔就绪后不再使用
+        self._overview = asset_cache.load_pixmap(img_path, MAP_OVERVIEW_SIZE, self.devicePixelRatioF())
+        self.pyramid_ready.connect(self._on_pyramid_ready)
+        threading.Thread(target=self._open_pyramid, args=(img_path,),
+                         name="map-tiles", daemon=True).start()
+
+    def _open_pyramid(self, img_path):
+        try:
+            import map_tiles
+            self.pyramid_ready.emit(map_tiles.open_pyramid(img_path), "")
+        except FileNotFoundError:
+            print(f"地图图片未找到: {img_path}")
+            self.pyramid_ready.emit(None, f"图片未找到: {os.path.basename(img_path)}")
+        except Exception as e:
+            print(f"地图瓦片加载失败: {e}")
+            self.pyramid_ready.emit(None, f"地图加载失败: {e}")
+
+    def _on_pyramid_ready(self, pyramid, error):
+        self._error = error
+        if pyramid is not None:
+            self._overview = None
+            self.set_pyramid(pyramid, MAP_TILE_CACHE)
+            if self.width() > 0:
+                self._fitted = True
+                self.fit()
+        self.update()
+
+    @property
+    def captures_navigation(self) -> bool:
+        return self.mode is not None
+
+    def handle_key(self, key) -> bool:
+        """Apply `key` to the map; False if the page does not use it."""
+        if self.pyramid is None:
+            return False
+        if key == Qt.Key.Key_Return:
+            self.mode = self.MODES[(self.MODES.index(self.mode) + 1) % len(self.MODES)]
+        elif self.mode is None or key not in (Qt.Key.Key_Up, Qt.Key.Key_Down):
+            return False
         else:
-            self.setText("图片未找到: uoft.png")
\ No newline at end of file
+            step = -1 if key == Qt.Key.Key_Up else 1
+            if self.mode == "zoom":
+                self.zoom(-step)
+            elif self.mode == "pan_y":
+                self.pan(0, step * self.PAN_FRACTION)
+            else:
+                self.pan(step * self.PAN_FRACTION, 0)
+        # 到达边界时画面不变，仍重绘一次提示，按键 trace 随之结束
+        self.update()
+        return True
+
+    def hideEvent(self, event):
+        # 离开页面时回到浏览模式，上/下键重新用于切换页面
+        self.mode = None
+        super().hideEvent(event)
+
+    def paint_overlay(self, painter):
+        painter.setPen(QColor("#ECF0F1"))
+        if self._error:
+            painter.setFont(QFont(painter.font().family(), 16))
+            painter.drawText(self.rect(), Qt.AlignmentFlag.AlignCenter, self._error)
+            return
+        if self.pyramid is None:
+            self._paint_overview(painter)
+            return
+        bar = QRect(0, self.height() - 28, self.width(), 28)
+        painter.fillRect(bar, QColor(0, 0, 0, 160))
+        painter.setFont(QFont(painter.font().family(), 12))
+        painter.drawText(bar.adjusted(8, 0, -8, 0), Qt.AlignmentFlag.AlignVCenter | Qt.AlignmentFlag.AlignLeft,
+                         self.HINTS[self.mode])
+        painter.drawText(bar.adjusted(8, 0, -8, 0), Qt.AlignmentFlag.AlignVCenter | Qt.AlignmentFlag.AlignRight,
+                         f"×{self.scale:.2f}")
+
+    def _paint_overview(self, painter):
+        if self._overview is None or self._overview.isNull():
+            return
+        size = (self._overview.size() / self._overview.devicePixelRatio()).scaled(
+            self.size(), Qt.AspectRatioMode.KeepAspectRatio)
+        target = QRect(QPoint(0, 0), size)
+        target.moveCenter(self.rect().center())
+        painter.setRenderHint(painter.RenderHint.SmoothPixmapTransform)
+        painter.drawPixmap(target, self._overview)
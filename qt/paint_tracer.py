@@ -0,0 +1,57 @@
+import time
+from PyQt6.QtCore import QObject, QEvent, QTimer
+
+import metrics
+
+
+class PaintTracer(QObject):
+    """
+    绘制探针：在目标控件的下一次 Paint 事件上给 trace 打点
+
+    - expect(widget, traces, stage, kind): 下一次绘制时记录 stage；给出 kind 时同时结束 trace
+    - 超过 TIMEOUT_MS 仍未绘制（内容未变化等）则直接结束，并计数
+    """
+    TIMEOUT_MS = 200
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._pending = {}  # widget -> [(traces, stage, kind)]
+
+    def expect(self, widget, traces, stage, kind=None):
+        if not traces:
+            return
+        entry = (list(traces), stage, kind)
+        waiting = self._pending.get(widget)
+        if waiting is None:
+            waiting = self._pending[widget] = []
+            widget.installEventFilter(self)
+        waiting.append(entry)
+        QTimer.singleShot(self.TIMEOUT_MS, lambda: self._expire(widget, entry))
+
+    def eventFilter(self, obj, event):
+        if event.type() == QEvent.Type.Paint:
+            waiting = self._pending.pop(obj, None)
+            if waiting:
+                obj.removeEventFilter(self)
+                t = time.perf_counter()
+                for traces, stage, kind in waiting:
+                    for trace in traces:
+                        trace.mark(stage, t)
+                        if kind:
+                            trace.finish(kind)
+        return False
+
+    def _expire(self, widget, entry):
+        waiting = self._pending.get(widget)
+        if not waiting or entry not in waiting:
+            return
+        waiting.remove(entry)
+        if not waiting:
+            del self._pending[widget]
+            widget.removeEventFilter(self)
+        metrics.counter("trace.paint_timeouts").inc()
+        traces, stage, kind = entry
+        if kind:
+            for trace in traces:
+                trace.mark("no_paint")
+                trace.finish(kind)
@@ -0,0 +1,104 @@
+import time
+from PyQt6.QtWidgets import QWidget
+from PyQt6.QtCore import Qt, QRect
+from PyQt6.QtGui import QImage, QPainter, QColor
+
+import camera
+import metrics
+
+
+class FramePreview(QWidget):
+    """
+    相机预览控件：直接绘制采集线程发布的池化帧
+
+    - 每个池缓冲区只创建一次 QImage（直接引用 numpy 内存，不拷贝）
+    - paintEvent 中居中绘制，帧尺寸与显示尺寸一致时不做任何缩放
+    - 帧序号未变化时不触发重绘
+    - 相机初始化失败时显示“相机不可用”，不会改用模拟画面
+    """
+    REPORT_INTERVAL = 10.0  # 秒，打印一次 UI 线程耗时
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setAttribute(Qt.WidgetAttribute.WA_OpaquePaintEvent)
+        self._images = {}      # pool buffer index -> QImage
+        self._frame = None     # 当前显示帧（已 retain）
+        self._last_seq = 0
+        self._unavailable = False  # 已显示相机不可用
+        self._ui_time = 0.0
+        self._ui_frames = 0
+        self._report_time = time.monotonic()
+        self.last_ui_ms = 0.0
+        self._ui_hist = metrics.histogram("ui.preview_frame")
+        self._latency_hist = metrics.histogram("ui.capture_to_paint")
+
+    def _image_for(self, frame):
+        img = self._images.get(frame.index)
+        if img is None:
+            data = frame.data
+            h, w = data.shape[:2]
+            img = QImage(data.data, w, h, data.strides[0], QImage.Format.Format_RGB888)
+            self._images[frame.index] = img
+        return img
+
+    def update_frame(self):
+        """从采集线程取最新帧；帧序号没有前进时直接返回 False。"""
+        t0 = time.perf_counter()
+        latest = camera.get_latest()
+        if latest is None and not self._unavailable and camera.init_error() is not None:
+            self._unavailable = True
+            self.update()
+        if latest is None or latest.seq == self._last_seq:
+            return False
+        frame = camera.acquire_latest()
+        if frame is None:
+            return False
+        if self._frame is not None:
+            self._frame.release()
+        self._frame = frame
+        self._last_seq = frame.seq
+        self.repaint()
+        self._latency_hist.observe(time.monotonic() - frame.timestamp)
+        self._account(time.perf_counter() - t0)
+        return True
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        frame = self._frame
+        if frame is None:
+            painter.fillRect(self.rect(), QColor(0, 0, 0))
+            if self._unavailable:
+                painter.setPen(QColor("#ECF0F1"))
+                painter.drawText(self.rect(), Qt.AlignmentFlag.AlignCenter,
+                                 f"相机不可用\n{camera.init_error()}")
+            return
+        img = self._image_for(frame)
+        target = QRect(0, 0, img.width(), img.height())
+        target.moveCenter(self.rect().center())
+        # 只清除图像以外的区域
+        painter.setClipRegion(self.visibleRegion().subtracted(target))
+        painter.fillRect(self.rect(), QColor(0, 0, 0))
+        painter.setClipping(False)
+        painter.drawImage(target.topLeft(), img)
+
+    def _account(self, dt):
+        self._ui_hist.observe(dt)
+        self.last_ui_ms = dt * 1000.0
+        self._ui_time += dt
+        self._ui_frames += 1
+        now = time.monotonic()
+        if now - self._report_time >= self.REPORT_INTERVAL:
+            elapsed = now - self._report_time
+            print(f"Preview: {self._ui_frames / elapsed:.1f} fps, "
+                  f"UI thread {self._ui_time / max(self._ui_frames, 1) * 1000.0:.2f} ms/frame")
+            self._ui_time = 0.0
+            self._ui_frames = 0
+            self._report_time = now
+
+    def clear_frame(self):
+        """释放当前帧引用（页面隐藏时调用）。"""
+        if self._frame is not None:
+            self._frame.release()
+            self._frame = None
+        self._last_seq = 0
+        self._unavailable = False  # 已显示相机不可用
@@ -0,0 +1,121 @@
+"""Cheap NumPy scene-change detector for hands-free continuous analysis.
+
+Each preview frame is reduced to a small grid of grayscale block means.
+Consecutive grids give the motion level; once motion stays below
+`stable_threshold` for `settle_time` seconds the view is "settled", and if
+the settled grid differs from the one last analyzed by more than
+`change_threshold` a trigger fires. The reference grid is set with
+`mark_analyzed()` after every successful analysis, manual or automatic. A
+`RateLimiter` caps how often triggers may turn into API requests.
+"""
+import time
+from collections import deque
+from typing import Optional
+import numpy
+
+
+LUMA_WEIGHTS = numpy.array([0.299, 0.587, 0.114], dtype=numpy.float32)  # BT.601
+
+
+def block_means(frame_rgb, grid: int = 16):
+    """Return a (grid, grid) float32 array of mean luma per block."""
+    h, w = frame_rgb.shape[:2]
+    # 先按步长抽样到约 4*grid 像素，再做分块平均
+    step = max(1, min(h, w) // (grid * 4))
+    small = frame_rgb[::step, ::step]
+    sh, sw = small.shape[:2]
+    bh, bw = sh // grid, sw // grid
+    cells = small[:bh * grid, :bw * grid].reshape(grid, bh, grid, bw, -1)
+    means = cells.mean(axis=(1, 3), dtype=numpy.float32)  # (grid, grid, channels)
+    if means.shape[-1] == 3:
+        # 亮度是通道均值的线性组合，先平均再加权，只需对 grid*grid 个值计算
+        return means @ LUMA_WEIGHTS
+    return means.mean(axis=-1)
+
+
+def grid_difference(a, b) -> float:
+    """Mean absolute difference of two block-mean grids, in luma levels (0-255)."""
+    return float(numpy.abs(a - b).mean())
+
+
+class RateLimiter:
+    """Minimum spacing between requests plus a budget of `max_requests` per `window` seconds."""
+
+    def __init__(self, min_interval: float = 8.0, max_requests: int = 30, window: float = 3600.0):
+        self.min_interval = min_interval
+        self.max_requests = max_requests
+        self.window = window
+        self._times = deque()
+
+    def allow(self, now: Optional[float] = None) -> bool:
+        now = time.monotonic() if now is None else now
+        while self._times and now - self._times[0] > self.window:
+            self._times.popleft()
+        if self._times and now - self._times[-1] < self.min_interval:
+            return False
+        if len(self._times) >= self.max_requests:
+            return False
+        self._times.append(now)
+        return True
+
+    @property
+    def remaining(self) -> int:
+        return max(0, self.max_requests - len(self._times))
+
+
+class SceneChangeDetector:
+    def __init__(self, grid: int = 16, change_threshold: float = 12.0,
+                 stable_threshold: float = 3.0, settle_time: float = 0.8,
+                 limiter: Optional[RateLimiter] = None):
+        self.grid = grid
+        self.change_threshold = change_threshold
+        self.stable_threshold = stable_threshold
+        self.settle_time = settle_time
+        self.limiter = limiter or RateLimiter()
+        self.reset()
+
+    def reset(self):
+        """Forget everything, including the last analyzed view."""
+        self._reference = None   # grid of the last analyzed view
+        self.resume()
+
+    def resume(self):
+        """Restart motion tracking (e.g. when the page is shown again), keeping the reference."""
+        self._prev = None
+        self._stable_since = None
+        self.motion = 0.0
+        self.change = 0.0
+
+    def update(self, frame_rgb, now: Optional[float] = None) -> bool:
+        """Feed one frame; returns True when an analysis should be triggered."""
+        now = time.monotonic() if now is None else now
+        grid = block_means(frame_rgb, self.grid)
+        prev, self._prev = self._prev, grid
+        if prev is None:
+            return False
+
+        self.motion = grid_difference(grid, prev)
+        if self.motion > self.stable_threshold:
+            self._stable_since = None
+            return False
+        if self._stable_since is None:
+            self._stable_since = now
+        if now - self._stable_since < self.settle_time:
+            return False
+
+        # 画面已稳定：与上次分析的画面比较
+        self.change = grid_difference(grid, self._reference) if self._reference is not None else float("inf")
+        if self.change < self.change_threshold:
+            return False
+        if not self.limiter.allow(now):
+            return False
+        # 参考画面在分析成功后由 mark_analyzed()/set_reference() 更新，失败时可再次触发
+        return True
+
+    def mark_analyzed(self, frame_rgb):
+        """Use `frame_rgb` as the reference view after a successful analysis (manual or automatic)."""
+        self.set_reference(block_means(frame_rgb, self.grid))
+
+    def set_reference(self, grid):
+        """Like `mark_analyzed`, with the grid already computed by `block_means`."""
+        self._reference = grid
@@ -0,0 +1,97 @@
+"""Startup phase timing.
+
+Import this first in the entry script; T0 is taken at import. Phases are
+timed with `phase()` (from any thread), instants with `mark()`, and
+`report()` prints a timeline showing which phases ran before the first
+frame was painted:
+
+    import startup
+    with startup.phase("import.gui"):
+        import qt.gui
+    startup.mark("first_paint")
+    startup.report()
+
+Every phase is also exported as a `startup.<name>` histogram.
+"""
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import metrics
+
+T0 = time.perf_counter()
+
+_lock = threading.Lock()
+_phases = []  # (name, start, end, thread name); seconds since T0
+_marks = {}   # name -> seconds since T0
+
+
+def _process_age() -> float:
+    """Seconds since the process was exec'd (Linux), i.e. interpreter start-up before T0."""
+    try:
+        with open("/proc/self/stat") as f:
+            start_ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+        return max(0.0, uptime - start_ticks / os.sysconf("SC_CLK_TCK"))
+    except (OSError, ValueError, IndexError):
+        return 0.0
+
+
+PROCESS_AGE_AT_T0 = _process_age()
+
+
+@contextmanager
+def phase(name):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        end = time.perf_counter()
+        with _lock:
+            _phases.append((name, start - T0, end - T0, threading.current_thread().name))
+        metrics.observe(f"startup.{name}", end - start)
+
+
+def mark(name):
+    """Record an instant (first occurrence wins)."""
+    t = time.perf_counter() - T0
+    with _lock:
+        _marks.setdefault(name, t)
+    metrics.observe(f"startup.{name}", t + PROCESS_AGE_AT_T0)
+
+
+def run_in_background(name, fn, *args):
+    """Run fn(*args) as phase `name` on a daemon thread; returns the thread."""
+    def _run():
+        try:
+            with phase(name):
+                fn(*args)
+        except Exception as e:
+            print(f"Startup task '{name}' failed: {e}")
+
+    thread = threading.Thread(target=_run, name=f"startup-{name}", daemon=True)
+    thread.start()
+    return thread
+
+
+def report() -> str:
+    """Print (and return) the startup timeline, relative to process start."""
+    offset = PROCESS_AGE_AT_T0
+    with _lock:
+        phases = sorted(_phases, key=lambda p: p[1])
+        marks = dict(_marks)
+    first_paint = marks.get("first_paint")
+    lines = [f"Startup (ms since process start; interpreter before T0: {offset * 1000:.0f})"]
+    for name, start, end, thread in phases:
+        before = first_paint is not None and end <= first_paint
+        flag = "*" if before else " "
+        lines.append(f" {flag} {(start + offset) * 1000:8.1f} {(end - start) * 1000:8.1f}  {name}"
+                     f"{'' if thread == 'MainThread' else f'  [{thread}]'}")
+    for name, t in sorted(marks.items(), key=lambda m: m[1]):
+        lines.append(f"   {(t + offset) * 1000:8.1f}        -  {name}")
+    lines.append(" * finished before the first frame")
+    text = "\n".join(lines)
+    print(text)
+    return text
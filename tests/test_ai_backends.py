@@ -0,0 +1,28 @@
+import asyncio
+
+import pytest
+
+httpx = pytest.importorskip("httpx")
+
+import ai_backends
+import ai_stub
+import metrics
+
+
+def test_async_client_request_against_stub():
+    base_url = ai_stub.start_in_background()
+    opened = metrics.counter("ai.http.connections_opened").value
+
+    async def fetch():
+        async with ai_backends._make_http_client(asynchronous=True) as client:
+            return await client.get(f"{base_url}/models")
+
+    response = asyncio.run(fetch())
+    assert response.status_code == 200
+    assert metrics.counter("ai.http.connections_opened").value == opened + 1
+
+
+def test_sync_client_request_against_stub():
+    base_url = ai_stub.start_in_background()
+    with ai_backends._make_http_client() as client:
+        assert client.get(f"{base_url}/models").status_code == 200
@@ -0,0 +1,32 @@
+import json
+
+import ai_client
+
+
+def _speech(text):
+    return ai_client.parse_partial_json(text).get("speech_text")
+
+
+def test_surrogate_pair_decoded():
+    text = json.dumps({"speech_text": "cat \U0001F431"})
+    assert _speech(text) == ("cat \U0001F431", True)
+
+
+def test_escape_cut_at_chunk_boundary_waits_for_more_input():
+    text = json.dumps({"speech_text": "\U0001F431!"})
+    cut = text.index("\\u") + 9  # inside the low surrogate escape
+    for end in range(text.index("\\u"), cut + 1):
+        value, done = _speech(text[:end])
+        assert value == "" and not done
+    assert _speech(text) == ("\U0001F431!", True)
+
+
+def test_malformed_escape_does_not_raise():
+    assert _speech('{"speech_text": "a\\uZZZZb"}') == ("a\ufffdb", True)
+    assert _speech('{"speech_text": "a\\ud83dxyz"}') == ("a\ufffdxyz", True)
+    assert _speech('{"speech_text": "a\\udc31b"}') == ("a\ufffdb", True)
+
+
+def test_decoded_text_is_utf8_encodable():
+    text = json.dumps({"speech_text": "\U0001F600 smile"})
+    _speech(text)[0].encode("utf-8")
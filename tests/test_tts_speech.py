@@ -0,0 +1,34 @@
+import pytest
+
+pytest.importorskip("openai")
+
+import ai_async
+import ai_backends
+import ai_client
+import tts_cache
+
+
+@pytest.fixture
+def stub_router(monkeypatch):
+    monkeypatch.setattr(ai_client, "router", ai_backends.BackendRouter([ai_backends.Backend("offline", kind="stub")]))
+
+
+@pytest.fixture
+def broken_cache(monkeypatch, tmp_path):
+    def _put(*args, **kwargs):
+        raise OSError(28, "No space left on device")
+
+    monkeypatch.setattr(tts_cache.audio_cache, "get", lambda *args, **kwargs: None)
+    monkeypatch.setattr(tts_cache.audio_cache, "put", _put)
+
+
+def test_generate_speech_survives_cache_write_failure(stub_router, broken_cache):
+    path = ai_client.generate_speech("cache is full")
+    assert path is not None
+    with open(path, "rb") as f:
+        assert f.read()
+
+
+def test_generate_speech_async_survives_cache_write_failure(stub_router, broken_cache):
+    path = ai_async.submit(ai_async.generate_speech_async("cache is full")).result(10)
+    assert path is not None
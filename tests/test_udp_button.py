@@ -0,0 +1,42 @@
+from KeyEvent.udp_button import RESTART_IDLE, SEQ_WINDOW, SequenceTracker
+
+
+def test_duplicate_dropped():
+    tracker = SequenceTracker()
+    assert tracker.accept(5, now=0.0)
+    assert not tracker.accept(5, now=0.01)
+    assert tracker.duplicates == 1
+
+
+def test_same_seq_after_idle_is_a_restart():
+    tracker = SequenceTracker()
+    assert tracker.accept(0, now=0.0)
+    assert tracker.accept(0, now=RESTART_IDLE + 10.0)
+    assert tracker.restarts == 1
+    assert tracker.duplicates == 0
+
+
+def test_older_seq_after_idle_is_a_restart():
+    tracker = SequenceTracker()
+    for seq in range(10):
+        assert tracker.accept(seq, now=0.0)
+    assert tracker.accept(0, now=RESTART_IDLE + 1.0)
+    assert tracker.accept(1, now=RESTART_IDLE + 1.1)
+    assert tracker.restarts == 1
+
+
+def test_far_behind_is_a_restart():
+    tracker = SequenceTracker()
+    for seq in range(SEQ_WINDOW + 10):
+        tracker.accept(seq, now=0.0)
+    assert tracker.accept(0, now=0.1)
+    assert tracker.restarts == 1
+
+
+def test_reordered_packet_delivered():
+    tracker = SequenceTracker()
+    assert tracker.accept(1, now=0.0)
+    assert tracker.accept(3, now=0.0)
+    assert tracker.lost == 1
+    assert tracker.accept(2, now=0.0)
+    assert tracker.lost == 0 and tracker.reordered == 1
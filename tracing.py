@@ -0,0 +1,117 @@
+"""End-to-end input-to-photon traces.
+
+Every input event gets a `Trace` with an id and a perf_counter timestamp
+taken where it enters the process (GPIO callback, TCP/UDP receive, Qt key
+event). Each hop marks the trace as it passes:
+
+    input -> emit (InputListener.emit_key) -> gui (signal delivered)
+          -> apply (dequeued by InputDispatcher, after any animation)
+          -> switch / capture -> first_paint -> animation_done -> paint
+
+Finished traces go into a ring buffer; per-kind ('nav', 'capture', 'page', 'key')
+latencies are recorded as `trace.<kind>.<stage>` histograms (time since
+input) so the slow hop stands out. Dump the buffer with percentiles:
+
+    kill -USR2 <pid>      # writes traces.json
+"""
+import itertools
+import json
+import threading
+import time
+from collections import deque
+from typing import Optional
+
+import metrics
+
+RING_SIZE = 512
+
+_ids = itertools.count(1)
+_ring = deque(maxlen=RING_SIZE)
+_lock = threading.Lock()
+
+
+class Trace:
+    __slots__ = ("id", "source", "key", "t0", "marks", "kind")
+
+    def __init__(self, source, key, t0: Optional[float] = None):
+        self.id = next(_ids)
+        self.source = source
+        self.key = int(key)
+        self.t0 = time.perf_counter() if t0 is None else t0
+        self.marks = {}  # stage -> seconds since t0 (first occurrence only)
+        self.kind = None
+
+    def mark(self, stage, t: Optional[float] = None):
+        if stage not in self.marks:
+            self.marks[stage] = (time.perf_counter() if t is None else t) - self.t0
+
+    def finish(self, kind):
+        """Record the trace as complete (once) and add it to the ring buffer."""
+        if self.kind is not None:
+            return
+        self.kind = kind
+        self.mark("done")
+        for stage, dt in self.marks.items():
+            metrics.observe(f"trace.{kind}.{stage}", dt)
+        with _lock:
+            _ring.append(self)
+
+    def to_dict(self) -> dict:
+        return {"id": self.id, "source": self.source, "key": self.key, "kind": self.kind,
+                "marks_ms": {k: round(v * 1000.0, 3) for k, v in self.marks.items()}}
+
+
+def start(source, key, t0: Optional[float] = None) -> Trace:
+    """New trace for one input event; `t0` defaults to now (perf_counter)."""
+    metrics.counter(f"trace.started.{source}").inc()
+    return Trace(source, key, t0)
+
+
+def recent(kind=None) -> list:
+    with _lock:
+        traces = list(_ring)
+    return [t for t in traces if kind is None or t.kind == kind]
+
+
+def _percentiles(values):
+    s = sorted(values)
+    n = len(s)
+
+    def pct(p):
+        return round(s[min(n - 1, int(round(p / 100.0 * (n - 1))))] * 1000.0, 3)
+
+    return {"count": n, "p50_ms": pct(50), "p90_ms": pct(90), "p99_ms": pct(99), "max_ms": pct(100)}
+
+
+def summary() -> dict:
+    """Exact percentiles per kind and stage over the traces in the ring buffer."""
+    by_stage = {}
+    for t in recent():
+        for stage, dt in t.marks.items():
+            by_stage.setdefault(t.kind, {}).setdefault(stage, []).append(dt)
+    return {kind: {stage: _percentiles(v) for stage, v in stages.items()}
+            for kind, stages in by_stage.items()}
+
+
+def dump(path="traces.json"):
+    """Write the summary and the buffered traces to `path` as JSON and return the path."""
+    data = {"summary": summary(), "traces": [t.to_dict() for t in recent()]}
+    with open(path, "w") as f:
+        json.dump(data, f, indent=2)
+    return path
+
+
+def install_dump_signal(path="traces.json"):
+    """Dump traces to `path` whenever the process receives SIGUSR2.
+
+    Like metrics.install_dump_signal, the handler only schedules the dump:
+    `Trace.finish` holds `_lock` on the GUI thread, where the handler runs.
+    """
+    import signal
+    if not hasattr(signal, "SIGUSR2"):
+        return
+
+    def _dump():
+        print(f"Traces written to {dump(path)}")
+
+    signal.signal(signal.SIGUSR2, lambda s, f: metrics.defer_from_signal(_dump))
@@ -0,0 +1,142 @@
+"""Content-addressed, size-bounded disk cache for synthesized speech.
+
+Files are named by sha256(model, voice, format, text) under CACHE_DIR and
+evicted least-recently-used first once the directory exceeds MAX_BYTES.
+SYSTEM_PHRASES live in the PINNED_DIR subdirectory and are never evicted:
+they are the prompts played when the network is down.
+Writes go to a temp file that is renamed into place, so concurrent requests
+never see or clobber a partial file.
+
+Pre-synthesize the common system phrases (run by install.sh):
+    python3 tts_cache.py --warm
+"""
+import os
+import stat
+import hashlib
+import tempfile
+import threading
+from typing import Optional
+
+import metrics
+
+CACHE_DIR = os.environ.get(
+    "TTS_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache", "tts"))
+MAX_BYTES = int(os.environ.get("TTS_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+
+# Phrases spoken by the app itself; pre-synthesized so they play without network
+SYSTEM_PHRASES = {
+    "analysis_error": "Sorry, I could not analyze the view.",
+    "timeout": "Sorry, the analysis took too long.",
+    "no_camera": "The camera is not available.",
+}
+PINNED_DIR = "system"  # 不参与 LRU 淘汰
+
+
+class AudioCache:
+    def __init__(self, directory=CACHE_DIR, max_bytes=MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(text, voice, model, fmt) -> str:
+        h = hashlib.sha256()
+        for part in (model, voice, fmt, text):
+            h.update(part.encode("utf-8"))
+            h.update(b"\0")
+        return h.hexdigest()
+
+    def path_for(self, text, voice, model, fmt) -> str:
+        directory = self.directory
+        if text in SYSTEM_PHRASES.values():
+            directory = os.path.join(directory, PINNED_DIR)
+        return os.path.join(directory, f"{self.key(text, voice, model, fmt)}.{fmt}")
+
+    def get(self, text, voice, model, fmt) -> Optional[str]:
+        """Return the cached file path (and mark it recently used), or None."""
+        path = self.path_for(text, voice, model, fmt)
+        try:
+            os.utime(path)  # mtime doubles as the LRU timestamp
+        except OSError:
+            metrics.counter("tts_cache.misses").inc()
+            return None
+        metrics.counter("tts_cache.hits").inc()
+        return path
+
+    def put(self, text, voice, model, fmt, data: bytes) -> str:
+        """Atomically store `data` and return its path."""
+        path = self.path_for(text, voice, model, fmt)
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+        except BaseException:
+            try:
+                os.unlink(tmp)
+            except OSError:
+                pass
+            raise
+        self.evict()
+        return path
+
+    def evict(self):
+        """Delete least-recently-used files until the cache fits in max_bytes.
+
+        Only the top-level files count; the pinned system phrases are kept.
+        """
+        with self._lock:
+            try:
+                names = os.listdir(self.directory)
+            except OSError:
+                return
+            files = []
+            total = 0
+            for name in names:
+                if name.endswith(".tmp"):
+                    continue
+                try:
+                    st = os.stat(os.path.join(self.directory, name))
+                except OSError:
+                    continue
+                if not stat.S_ISREG(st.st_mode):
+                    continue
+                files.append((st.st_mtime, st.st_size, name))
+                total += st.st_size
+            files.sort()
+            while total > self.max_bytes and files:
+                _, size, name = files.pop(0)
+                try:
+                    os.unlink(os.path.join(self.directory, name))
+                    total -= size
+                    metrics.counter("tts_cache.evictions").inc()
+                except OSError:
+                    pass
+            metrics.gauge("tts_cache.bytes").set(total)
+
+
+audio_cache = AudioCache()
+
+
+def warm(phrases=None):
+    """Synthesize `phrases` (default: SYSTEM_PHRASES) into the cache."""
+    import ai_client
+
+    for text in (phrases or SYSTEM_PHRASES.values()):
+        try:
+            for _ in ai_client.iter_speech(text):
+                pass
+            print(f"TTS cache: {text!r}")
+        except Exception as e:
+            print(f"TTS cache: failed to synthesize {text!r}: {e}")
+
+
+if __name__ == "__main__":
+    import sys
+
+    if "--warm" in sys.argv:
+        warm()
+    else:
+        print(__doc__)